@@ -0,0 +1,235 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+小区基线模块 - 按小区(CGI)在线维护指标的均值和方差，用z值识别突发
+
+每个小区每个指标保存样本数、均值和离差平方和（Welford累加器），
+导入时只对本批数据分组求出同样的三个量，再按并行合并公式与已有基线合并；
+删除数据前从基线中扣减被删除的记录，基线始终对应表中保留的数据。
+突发判定为当前值相对小区自身历史的z值超过阈值。
+"""
+import math
+from typing import Any, Dict, List, Optional
+import pandas as pd
+import table_meta
+
+BASELINE_TABLE = '_mh_cell_baseline'
+STATE_TABLE = '_mh_cell_baseline_state'
+
+CELL_FIELD = 'CGI'
+TIME_FIELD = '开始时间'
+FLAG_FIELD = '是否高负荷小区'
+FLAG_VALUE = '是'
+
+# 指标键与字段名
+METRICS = {
+    'users': '最大用户数',
+    'ul': '上行利用率',
+    'dl': '下行利用率',
+}
+
+
+def ensure_baseline_tables(conn):
+    """创建基线表（如果不存在）"""
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {BASELINE_TABLE} (
+            table_name TEXT NOT NULL,
+            cgi TEXT NOT NULL,
+            metric TEXT NOT NULL,
+            n INTEGER NOT NULL,
+            mean REAL NOT NULL,
+            m2 REAL NOT NULL,
+            PRIMARY KEY (table_name, cgi, metric)
+        ) WITHOUT ROWID
+    """)
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {STATE_TABLE} (
+            table_name TEXT PRIMARY KEY,
+            built_at REAL
+        )
+    """)
+
+
+def supports_baseline(columns: List[str]) -> bool:
+    """判断表是否包含基线和突发查询所需的字段"""
+    return all(field in columns for field in [CELL_FIELD, TIME_FIELD, FLAG_FIELD] + list(METRICS.values()))
+
+
+def _table_columns(conn, table_name: str) -> List[str]:
+    return [row[1] for row in conn.execute(f"PRAGMA table_info([{table_name}])")]
+
+
+def _aggregate(conn, table_name: str, field: str, where_clause: str = "", params: List[Any] = None) -> List[tuple]:
+    """按小区聚合指标的 (cgi, n, mean, m2)（两遍计算，避免平方和相减的精度损失）"""
+    table_meta.register_functions(conn)
+    where_sql = f"AND {where_clause}" if where_clause else ""
+    return conn.execute(f"""
+        WITH v AS (
+            SELECT [{CELL_FIELD}] AS cgi, mh_num([{field}]) AS x
+            FROM [{table_name}]
+            WHERE [{CELL_FIELD}] IS NOT NULL {where_sql}
+        ),
+        a AS (
+            SELECT cgi, COUNT(x) AS n, AVG(x) AS mean FROM v GROUP BY cgi HAVING COUNT(x) > 0
+        )
+        SELECT a.cgi, a.n, a.mean, TOTAL((v.x - a.mean) * (v.x - a.mean))
+        FROM a JOIN v ON v.cgi = a.cgi
+        GROUP BY a.cgi
+    """, list(params or [])).fetchall()
+
+
+def _merge(conn, table_name: str, metric: str, rows):
+    """按并行Welford公式把分组结果 (cgi, n, mean, m2) 合并到基线（SET中引用的均为更新前的值）"""
+    conn.executemany(f"""
+        INSERT INTO {BASELINE_TABLE} (table_name, cgi, metric, n, mean, m2)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT(table_name, cgi, metric) DO UPDATE SET
+            n = n + excluded.n,
+            mean = mean + (excluded.mean - mean) * excluded.n / (n + excluded.n),
+            m2 = m2 + excluded.m2 + (excluded.mean - mean) * (excluded.mean - mean) * n * excluded.n / (n + excluded.n)
+    """, [(table_name, str(cgi), metric, int(n), float(mean), float(m2)) for cgi, n, mean, m2 in rows])
+
+
+def rebuild(conn, table_name: str):
+    """全表重建基线"""
+    ensure_baseline_tables(conn)
+    conn.execute(f"DELETE FROM {BASELINE_TABLE} WHERE table_name = ?", (table_name,))
+    for metric, field in METRICS.items():
+        _merge(conn, table_name, metric, _aggregate(conn, table_name, field))
+    conn.execute(
+        f"INSERT OR REPLACE INTO {STATE_TABLE} (table_name, built_at) VALUES (?, strftime('%s', 'now'))",
+        (table_name,)
+    )
+
+
+def is_built(conn, table_name: str) -> bool:
+    """基线是否已建立"""
+    ensure_baseline_tables(conn)
+    return conn.execute(
+        f"SELECT 1 FROM {STATE_TABLE} WHERE table_name = ?", (table_name,)
+    ).fetchone() is not None
+
+
+def ensure_baseline(conn, table_name: str) -> bool:
+    """
+    已有数据的表首次建立基线（表不包含所需字段时跳过）
+    
+    Returns:
+        是否执行了重建
+    """
+    if not supports_baseline(_table_columns(conn, table_name)) or is_built(conn, table_name):
+        return False
+    rebuild(conn, table_name)
+    return True
+
+
+def on_batch_ingested(conn, table_name: str, df: pd.DataFrame):
+    """数据导入后按本批数据更新基线（在导入所用的同一连接中调用）"""
+    if not supports_baseline(list(df.columns)):
+        return
+    if not is_built(conn, table_name):
+        # 首次建立时直接全表聚合（已包含本批数据）
+        rebuild(conn, table_name)
+        return
+    
+    for metric, field in METRICS.items():
+        values = pd.DataFrame({
+            'cgi': df[CELL_FIELD],
+            'x': pd.to_numeric(df[field], errors='coerce')
+        }).dropna()
+        if values.empty:
+            continue
+        grouped = values.groupby('cgi', sort=False)['x'].agg(['count', 'mean', 'var'])
+        # 离差平方和 = 总体方差 * n = 样本方差 * (n - 1)
+        grouped['m2'] = grouped['var'].fillna(0.0) * (grouped['count'] - 1)
+        _merge(conn, table_name, metric, zip(grouped.index, grouped['count'], grouped['mean'], grouped['m2']))
+
+
+def subtract_range(conn, table_name: str, where_clause: str, params: List[Any]):
+    """在删除数据前（与删除在同一事务中），从基线中扣减将被删除的记录（并行Welford公式的逆运算）"""
+    if not is_built(conn, table_name) or not supports_baseline(_table_columns(conn, table_name)):
+        return
+    for metric, field in METRICS.items():
+        for cgi, n_b, mean_b, m2_b in _aggregate(conn, table_name, field, where_clause, params):
+            stored = conn.execute(
+                f"SELECT n, mean, m2 FROM {BASELINE_TABLE} WHERE table_name = ? AND cgi = ? AND metric = ?",
+                (table_name, str(cgi), metric)
+            ).fetchone()
+            if stored is None:
+                continue
+            n, mean, m2 = stored
+            n_a = n - n_b
+            if n_a <= 0:
+                conn.execute(
+                    f"DELETE FROM {BASELINE_TABLE} WHERE table_name = ? AND cgi = ? AND metric = ?",
+                    (table_name, str(cgi), metric)
+                )
+                continue
+            mean_a = (n * mean - n_b * mean_b) / n_a
+            m2_a = max(0.0, m2 - m2_b - (mean_b - mean_a) ** 2 * n_a * n_b / n)
+            conn.execute(
+                f"UPDATE {BASELINE_TABLE} SET n = ?, mean = ?, m2 = ? WHERE table_name = ? AND cgi = ? AND metric = ?",
+                (n_a, mean_a, m2_a, table_name, str(cgi), metric)
+            )
+
+
+def reset_table(conn, table_name: str):
+    """删除表的全部基线（表被清空或派生列回填时调用，在下次导入时重新建立）"""
+    ensure_baseline_tables(conn)
+    conn.execute(f"DELETE FROM {BASELINE_TABLE} WHERE table_name = ?", (table_name,))
+    conn.execute(f"DELETE FROM {STATE_TABLE} WHERE table_name = ?", (table_name,))
+
+
+def query_bursts(conn, table_name: str, start_time: str, end_time: str, threshold: float = 3.0,
+                 min_samples: int = 96) -> Optional[List[Dict[str, Any]]]:
+    """
+    查询时间范围内相对小区基线突发的高负荷记录
+    
+    只检查高负荷记录（按 是否高负荷小区 与 开始时间 的索引定位），
+    任一指标的z值达到阈值即判为突发；样本数不足 min_samples 的小区不参与判定。
+    基线尚未建立时返回None（由后台维护线程构建，不在请求中全表扫描）。
+    """
+    if not is_built(conn, table_name):
+        return None
+    table_meta.register_functions(conn)
+    
+    joins = []
+    selects = []
+    conditions = []
+    params: List[Any] = []
+    for metric, field in METRICS.items():
+        alias = f"b_{metric}"
+        joins.append(
+            f"LEFT JOIN {BASELINE_TABLE} {alias} ON {alias}.table_name = ? "
+            f"AND {alias}.cgi = t.[{CELL_FIELD}] AND {alias}.metric = '{metric}'"
+        )
+        params.append(table_name)
+        value = f"mh_num(t.[{field}])"
+        selects.append(f"{value}, {alias}.n, {alias}.mean, {alias}.m2")
+        # z >= 阈值 等价于 偏差为正 且 偏差^2 * (n-1) >= 阈值^2 * m2（无需开方）
+        conditions.append(
+            f"({alias}.n >= ? AND {alias}.m2 > 0 AND {value} > {alias}.mean AND "
+            f"({value} - {alias}.mean) * ({value} - {alias}.mean) * ({alias}.n - 1) >= ? * {alias}.m2)"
+        )
+    condition_params = []
+    for _ in METRICS:
+        condition_params.extend([max(min_samples, 2), threshold * threshold])
+    
+    rows = conn.execute(f"""
+        SELECT t.[{CELL_FIELD}], t.[{TIME_FIELD}], {", ".join(selects)}
+        FROM [{table_name}] t
+        {" ".join(joins)}
+        WHERE t.[{FLAG_FIELD}] = ? AND t.[{TIME_FIELD}] >= ? AND t.[{TIME_FIELD}] < ?
+          AND ({" OR ".join(conditions)})
+    """, params + [FLAG_VALUE, start_time, end_time] + condition_params).fetchall()
+    
+    bursts = []
+    for row in rows:
+        item = {"table": table_name, "cgi": row[0], "time": row[1]}
+        for index, metric in enumerate(METRICS):
+            value, n, mean, m2 = row[2 + index * 4: 6 + index * 4]
+            std = math.sqrt(m2 / (n - 1)) if n and n > 1 and m2 else None
+            item[metric] = value
+            item[f"z_{metric}"] = round((value - mean) / std, 3) if std and value is not None else None
+        bursts.append(item)
+    return bursts
@@ -0,0 +1,216 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+响应压缩模块 - 按浏览器的 Accept-Encoding 用brotli或gzip压缩文本响应
+
+- 只压缩文本类响应（JSON、NDJSON、CSV、HTML、JS、CSS等），小于最小字节数的响应原样返回
+- 已设置 Content-Encoding、部分内容（206）以及声明支持 Range 的文件响应不压缩，
+  避免字节范围与压缩后的内容不一致
+- 流式响应逐块压缩并立即刷新，不缓冲完整数据
+- brotli 为可选依赖，未安装时只使用gzip
+"""
+import re
+import zlib
+from typing import Optional
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# 压缩的内容类型（前缀匹配）
+COMPRESSIBLE_TYPES = (
+    "text/html",
+    "text/plain",
+    "text/css",
+    "text/csv",
+    "text/javascript",
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+)
+
+# 超过该大小的完整响应在线程池中压缩，避免阻塞事件循环
+THREAD_MINIMUM_SIZE = 256 * 1024
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """根据 Accept-Encoding 选择压缩方式（优先brotli，q=0 表示不接受）"""
+    accepted = set()
+    for item in accept_encoding.lower().split(','):
+        parts = item.strip().split(';')
+        name = parts[0].strip()
+        quality = 1.0
+        for param in parts[1:]:
+            match = re.fullmatch(r"\s*q=([0-9.]+)\s*", param)
+            if match:
+                try:
+                    quality = float(match.group(1))
+                except ValueError:
+                    quality = 0.0
+        if name and quality > 0:
+            accepted.add(name)
+    if brotli is not None and 'br' in accepted:
+        return 'br'
+    if 'gzip' in accepted:
+        return 'gzip'
+    return None
+
+
+class _Compressor:
+    """统一brotli和gzip的流式压缩接口"""
+    
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int):
+        self.encoding = encoding
+        if encoding == 'br':
+            self._brotli = brotli.Compressor(quality=brotli_quality)
+        else:
+            self._zlib = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)
+    
+    def compress(self, data: bytes, flush: bool = True) -> bytes:
+        """压缩一块数据（flush 为 True 时输出到目前为止的全部压缩数据）"""
+        if self.encoding == 'br':
+            output = self._brotli.process(data)
+            return output + self._brotli.flush() if flush else output
+        output = self._zlib.compress(data)
+        return output + self._zlib.flush(zlib.Z_SYNC_FLUSH) if flush else output
+    
+    def finish(self) -> bytes:
+        """结束压缩流"""
+        if self.encoding == 'br':
+            return self._brotli.finish()
+        return self._zlib.flush()
+    
+    def compress_all(self, data: bytes) -> bytes:
+        """一次性压缩完整数据"""
+        return self.compress(data, flush=False) + self.finish()
+
+
+class CompressionMiddleware:
+    """响应压缩中间件（ASGI）"""
+    
+    def __init__(self, app, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4):
+        """
+        Args:
+            app: ASGI 应用
+            minimum_size: 压缩的最小字节数，0表示不压缩
+            gzip_level: gzip压缩级别
+            brotli_quality: brotli压缩质量（0-11，越大越慢）
+        """
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self.minimum_size <= 0:
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        responder = _CompressionResponder(
+            send, self.minimum_size, _Compressor(encoding, self.gzip_level, self.brotli_quality)
+        )
+        await self.app(scope, receive, responder.send)
+
+
+class _CompressionResponder:
+    """拦截单个响应的发送过程，决定是否压缩"""
+    
+    def __init__(self, send, minimum_size: int, compressor: _Compressor):
+        self._send = send
+        self.minimum_size = minimum_size
+        self.compressor = compressor
+        self.start_message = None
+        # None: 尚未决定；True: 压缩；False: 原样发送
+        self.compressing = None
+        self.pending = []
+        self.pending_size = 0
+    
+    @staticmethod
+    def _eligible(message) -> bool:
+        """响应类型和状态是否允许压缩"""
+        headers = Headers(raw=message["headers"])
+        if message["status"] in (204, 206, 304) or "content-encoding" in headers:
+            return False
+        if "content-range" in headers or headers.get("accept-ranges", "none").lower() != "none":
+            return False
+        content_type = headers.get("content-type", "").split(';')[0].strip().lower()
+        return content_type.startswith(COMPRESSIBLE_TYPES)
+    
+    def _compressed_headers(self):
+        """改写响应头：设置 Content-Encoding，删除原长度，强ETag改为弱ETag"""
+        headers = MutableHeaders(raw=self.start_message["headers"])
+        headers["Content-Encoding"] = self.compressor.encoding
+        headers.add_vary_header("Accept-Encoding")
+        if "content-length" in headers:
+            del headers["content-length"]
+        etag = headers.get("etag")
+        if etag and not etag.startswith("W/"):
+            headers["ETag"] = f"W/{etag}"
+        return headers
+    
+    async def _send_start(self, headers: MutableHeaders):
+        """发送响应头（删除响应头时 MutableHeaders 会重建列表，需要写回消息）"""
+        self.start_message["headers"] = headers.raw
+        await self._send(self.start_message)
+    
+    async def _send_identity(self):
+        """小于最小字节数的响应原样发送"""
+        self.compressing = False
+        headers = MutableHeaders(raw=self.start_message["headers"])
+        headers.add_vary_header("Accept-Encoding")
+        await self._send_start(headers)
+        await self._send({"type": "http.response.body", "body": b"".join(self.pending), "more_body": False})
+        self.pending = []
+    
+    async def send(self, message):
+        message_type = message["type"]
+        if message_type == "http.response.start":
+            self.start_message = message
+            if not self._eligible(message):
+                self.compressing = False
+                await self._send(message)
+            return
+        if message_type != "http.response.body" or self.compressing is False:
+            await self._send(message)
+            return
+        
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        
+        if self.compressing:
+            data = self.compressor.compress(body) if more_body else self.compressor.compress_all(body)
+            await self._send({"type": "http.response.body", "body": data, "more_body": more_body})
+            return
+        
+        # 尚未决定：缓冲到达到最小字节数或响应结束
+        self.pending.append(body)
+        self.pending_size += len(body)
+        if self.pending_size < self.minimum_size:
+            if not more_body:
+                await self._send_identity()
+            return
+        
+        self.compressing = True
+        headers = self._compressed_headers()
+        data = b"".join(self.pending)
+        self.pending = []
+        if more_body:
+            await self._send_start(headers)
+            await self._send({"type": "http.response.body", "body": self.compressor.compress(data), "more_body": True})
+            return
+        
+        if len(data) >= THREAD_MINIMUM_SIZE:
+            compressed = await run_in_threadpool(self.compressor.compress_all, data)
+        else:
+            compressed = self.compressor.compress_all(data)
+        headers["Content-Length"] = str(len(compressed))
+        await self._send_start(headers)
+        await self._send({"type": "http.response.body", "body": compressed, "more_body": False})
@@ -87,6 +87,16 @@ class ConfigManager:
         
         # 解析服务器配置
         self._parse_server()
+        
+        # 解析数据保留和后台维护配置
+        self._parse_retention()
+        self._parse_maintenance()
+        
+        # 解析查询结果缓存配置
+        self._parse_cache()
+        
+        # 解析后台导出配置
+        self._parse_export()
     
     def _create_default_config(self):
         """创建默认配置文件"""
@@ -121,6 +131,38 @@ Port = 8000
 # 设置为 critical 或 error 可减少日志输出，默认不输出（critical）
 # 如果需要查看详细日志，可以设置为 info 或 debug
 LogLevel = critical
+
+# 响应压缩的最小字节数（浏览器支持时使用brotli或gzip压缩JSON、CSV等文本响应）
+# 小于该大小的响应不压缩，0表示不压缩
+CompressMinSize = 1024
+
+[Retention]
+# 数据保留策略：表名 = 保留天数（按"开始时间"字段判断）
+# 超过保留天数的数据会在后台分批删除，未配置或为0表示永久保留
+# 例如：4G指标 = 90
+
+[Maintenance]
+# 后台维护间隔（分钟），每次执行保留策略清理和增量空间回收
+Interval = 60
+# 保留策略清理时每批删除的行数（批次之间释放写锁，避免长时间阻塞查询）
+DeleteBatchSize = 5000
+# 每次增量回收的最大页数（0表示回收全部空闲页）
+VacuumPages = 2000
+# 是否把已有数据的数据库切换为增量回收模式（auto_vacuum=INCREMENTAL）
+# 切换需要执行一次完整的VACUUM，期间独占数据库，大数据库可能耗时较长，建议在空闲时开启后重启程序
+# 新建的空数据库总是直接切换
+ConvertIncrementalVacuum = false
+
+[Cache]
+# 查询结果缓存占用的最大内存（MB），同一脚本和参数的查询、统计和导出共用一份结果，0表示不缓存
+MaxMemoryMB = 256
+# 查询结果缓存的有效期（秒），数据导入或删除后缓存会立即失效
+TTL = 600
+
+[Export]
+# 后台导出文件的保留时间（小时），文件保存在数据库目录下的Exports文件夹
+# 相同的导出请求在表数据未变化时直接复用已生成的文件
+KeepHours = 24
 """
         with open(self.config_file, 'w', encoding='utf-8') as f:
             f.write(default_config)
@@ -169,6 +211,92 @@ LogLevel = critical
             self.log_level = 'critical'
         else:
             self.log_level = log_level
+        
+        try:
+            self.compress_min_size = max(0, self.config.getint('Server', 'CompressMinSize', fallback=1024))
+        except ValueError:
+            self.compress_min_size = 1024
+    
+    def _parse_retention(self):
+        """解析数据保留策略配置（表名区分大小写，单独读取）"""
+        self.retention = {}
+        
+        # ConfigParser默认会将键名转为小写，表名需要保持原样
+        parser = configparser.ConfigParser()
+        parser.optionxform = str
+        parser.read(self.config_file, encoding='utf-8')
+        
+        if not parser.has_section('Retention'):
+            return
+        
+        for table_name, value in parser.items('Retention'):
+            try:
+                keep_days = int(value)
+            except ValueError:
+                print(f"警告：表 {table_name} 的保留天数 {value} 无效，已忽略")
+                continue
+            if keep_days > 0:
+                self.retention[table_name] = keep_days
+    
+    def _parse_maintenance(self):
+        """解析后台维护配置"""
+        if 'Maintenance' not in self.config:
+            self.config.add_section('Maintenance')
+        
+        try:
+            self.maintenance_interval = self.config.getint('Maintenance', 'Interval', fallback=60)
+            if self.maintenance_interval < 1:
+                self.maintenance_interval = 60
+        except ValueError:
+            self.maintenance_interval = 60
+        
+        try:
+            self.delete_batch_size = self.config.getint('Maintenance', 'DeleteBatchSize', fallback=5000)
+            if self.delete_batch_size < 1:
+                self.delete_batch_size = 5000
+        except ValueError:
+            self.delete_batch_size = 5000
+        
+        try:
+            self.vacuum_pages = max(0, self.config.getint('Maintenance', 'VacuumPages', fallback=2000))
+        except ValueError:
+            self.vacuum_pages = 2000
+        
+        try:
+            self.convert_incremental_vacuum = self.config.getboolean(
+                'Maintenance', 'ConvertIncrementalVacuum', fallback=False
+            )
+        except ValueError:
+            self.convert_incremental_vacuum = False
+    
+    def _parse_cache(self):
+        """解析查询结果缓存配置"""
+        if 'Cache' not in self.config:
+            self.config.add_section('Cache')
+        
+        try:
+            self.cache_max_memory = max(0, self.config.getint('Cache', 'MaxMemoryMB', fallback=256))
+        except ValueError:
+            self.cache_max_memory = 256
+        
+        try:
+            self.cache_ttl = self.config.getint('Cache', 'TTL', fallback=600)
+            if self.cache_ttl < 1:
+                self.cache_ttl = 600
+        except ValueError:
+            self.cache_ttl = 600
+    
+    def _parse_export(self):
+        """解析后台导出配置"""
+        if 'Export' not in self.config:
+            self.config.add_section('Export')
+        
+        try:
+            self.export_keep_hours = self.config.getint('Export', 'KeepHours', fallback=24)
+            if self.export_keep_hours < 1:
+                self.export_keep_hours = 24
+        except ValueError:
+            self.export_keep_hours = 24
     
     def get_data_path(self) -> Path:
         """获取数据文件目录路径"""
@@ -198,13 +326,54 @@ LogLevel = critical
         """获取日志级别"""
         return self.log_level
     
+    def get_compress_min_size(self) -> int:
+        """获取响应压缩的最小字节数（0表示不压缩）"""
+        return self.compress_min_size
+    
+    def get_retention(self) -> dict:
+        """获取数据保留策略（表名 -> 保留天数）"""
+        return self.retention
+    
+    def get_maintenance_interval(self) -> int:
+        """获取后台维护间隔（分钟）"""
+        return self.maintenance_interval
+    
+    def get_delete_batch_size(self) -> int:
+        """获取分批删除的每批行数"""
+        return self.delete_batch_size
+    
+    def get_vacuum_pages(self) -> int:
+        """获取每次增量回收的最大页数"""
+        return self.vacuum_pages
+    
+    def get_convert_incremental_vacuum(self) -> bool:
+        """获取是否允许对已有数据的数据库执行VACUUM切换为增量回收模式"""
+        return self.convert_incremental_vacuum
+    
+    def get_cache_max_bytes(self) -> int:
+        """获取查询结果缓存占用的最大内存（字节）"""
+        return self.cache_max_memory * 1024 * 1024
+    
+    def get_cache_ttl(self) -> int:
+        """获取查询结果缓存的有效期（秒）"""
+        return self.cache_ttl
+    
+    def get_exports_path(self) -> Path:
+        """获取后台导出文件目录路径"""
+        return self.db_path / "Exports"
+    
+    def get_export_keep_seconds(self) -> int:
+        """获取后台导出文件的保留时间（秒）"""
+        return self.export_keep_hours * 3600
+    
     def ensure_directories(self):
         """确保所有必要的目录存在"""
         directories = [
             self.data_path,
             self.db_path,
             self.models_path,
-            self.scripts_path
+            self.scripts_path,
+            self.get_exports_path()
         ]
         
         for directory in directories:
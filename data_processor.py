@@ -4,6 +4,12 @@ import sqlite3
 from pathlib import Path
 import pandas as pd
 import warnings
+import table_meta
+import derived_columns
+import rollups
+import overload_episodes
+import cell_baseline
+from database import BUSY_TIMEOUT
 
 warnings.filterwarnings('ignore', category=UserWarning, module='openpyxl')
 
@@ -72,18 +78,32 @@ class DataProcessor:
             if not isinstance(self.config['Columns'], list) or len(self.config['Columns']) == 0:
                 return False, "配置文件中 'Columns' 必须是非空数组"
             
-            return True, ""
+            # 检查派生列声明（可选）
+            if 'Derived' in self.config:
+                targets = [col.get('Target') for col in self.config['Columns']]
+                is_valid, error_message = derived_columns.validate_derived(self.config['Derived'], targets)
+                if not is_valid:
+                    return False, error_message
             
+            return True, ""
+        
         except Exception as e:
             return False, f"验证配置文件时出错: {str(e)}"
+    
+    def process(self, on_progress=None):
+        """
+        处理所有匹配的文件并导入数据库
         
-    def process(self):
-        """处理所有匹配的文件并导入数据库"""
+        Args:
+            on_progress: 进度回调，参数为进度说明（读取每个文件、写入数据库时调用）
+        """
         files = self._get_files()
         all_data = []
         processed_files = []  # 记录已处理的文件
         
-        for file in files:
+        for index, file in enumerate(files, 1):
+            if on_progress:
+                on_progress(f"读取文件 {index}/{len(files)}: {Path(file).name}")
             data = self._read_file(file)
             if data is not None and not data.empty:
                 all_data.append(data)
@@ -91,6 +111,9 @@ class DataProcessor:
         
         if all_data:
             merged_data = pd.concat(all_data, ignore_index=True)
+            merged_data = self._apply_derived(merged_data)
+            if on_progress:
+                on_progress(f"写入数据库: {len(merged_data)} 行")
             self._save_to_db(merged_data)
             
             # 如果配置了删除文件，在处理完数据后删除
@@ -164,16 +187,71 @@ class DataProcessor:
         
         return pd.DataFrame(mapped_data)
     
+    def _apply_derived(self, df):
+        """计算模型配置中声明的派生列"""
+        derived = self.config.get('Derived')
+        if not derived:
+            return df
+        return derived_columns.apply_derived(df, derived)
+    
+    def prepare_table(self):
+        """
+        按模型配置升级已存在的表：补充缺失的派生列并回填历史数据，创建派生列索引
+        
+        Returns:
+            bool: 是否回填了数据
+        """
+        derived = self.config.get('Derived')
+        if not derived:
+            return False
+        
+        db_path = Path(self.db_path)
+        if not db_path.exists():
+            return False
+        
+        with sqlite3.connect(str(db_path), timeout=BUSY_TIMEOUT) as conn:
+            changed = derived_columns.ensure_derived_columns(conn, self.table_name, derived)
+            if changed:
+                # 表结构和数据发生变化，元数据在下次读取时重新构建
+                table_meta.ensure_meta_tables(conn)
+                table_meta.reset_table(conn, self.table_name)
+                table_meta.bump_generation(conn, self.table_name)
+                rollups.reset_table(conn, self.table_name)
+                overload_episodes.reset_table(conn, self.table_name)
+                cell_baseline.reset_table(conn, self.table_name)
+                conn.commit()
+            # 已有数据的表首次建立小时/天汇总、连续高负荷段和小区基线
+            if rollups.ensure_rollups(conn, self.table_name):
+                conn.commit()
+            if overload_episodes.ensure_episodes(conn, self.table_name):
+                conn.commit()
+            if cell_baseline.ensure_baseline(conn, self.table_name):
+                conn.commit()
+            return changed
+    
     def _save_to_db(self, df):
         """保存数据到SQLite数据库"""
         db_path = Path(self.db_path)
         db_dir = db_path.parent
         db_dir.mkdir(parents=True, exist_ok=True)
         
+        # 已存在的表先补齐派生列，避免追加数据时缺少字段
+        self.prepare_table()
+        
         # 使用上下文管理器管理数据库连接
-        with sqlite3.connect(str(db_path)) as conn:
+        with sqlite3.connect(str(db_path), timeout=BUSY_TIMEOUT) as conn:
+            # to_sql 单独提交数据，先标记表正在导入：后续派生数据的更新失败时标记保留，
+            # 由后台维护线程重置并重新构建该表的派生数据
+            table_meta.ensure_meta_tables(conn)
+            table_meta.mark_dirty(conn, self.table_name)
+            conn.commit()
             df.to_sql(self.table_name, conn, if_exists='append', index=False)
             
+            # 创建派生列索引
+            derived = self.config.get('Derived')
+            if derived:
+                derived_columns.create_indexes(conn, self.table_name, derived)
+            
             # 如果有"开始时间"字段，创建索引
             if '开始时间' in df.columns:
                 index_name = f'idx_{self.table_name}_开始时间'
@@ -183,6 +261,18 @@ class DataProcessor:
                     conn.commit()
                 except sqlite3.OperationalError:
                     pass
+            
+            # 增量更新表元数据（列取值草图、写入代数）
+            table_meta.on_batch_ingested(conn, self.table_name, df)
+            # 增量合并小时/天汇总
+            rollups.on_batch_ingested(conn, self.table_name, df)
+            # 合并本批的连续高负荷段
+            overload_episodes.on_batch_ingested(conn, self.table_name, df)
+            # 按本批数据更新小区基线
+            cell_baseline.on_batch_ingested(conn, self.table_name, df)
+            # 派生数据与导入标记的清除在同一事务中提交
+            table_meta.clear_dirty(conn, self.table_name)
+            conn.commit()
     
     def _delete_files(self, file_paths):
         """删除已处理的文件"""
@@ -214,16 +304,38 @@ def validate_config(config_path, db_path):
         return False, f"验证配置文件失败: {str(e)}"
 
 
-def process_config(config_path, db_path):
+def config_table(config_path):
+    """获取配置文件导入的目标表名"""
+    with open(config_path, 'r', encoding='utf-8') as f:
+        return json.load(f)['Export']['Table']
+
+
+def process_config(config_path, db_path, on_progress=None):
     """
     处理单个配置文件
     
+    Args:
+        config_path: JSON配置文件路径
+        db_path: 数据库文件路径（从config.ini读取）
+        on_progress: 进度回调，参数为进度说明
+    """
+    processor = DataProcessor(config_path, db_path)
+    return processor.process(on_progress)
+
+
+def prepare_config(config_path, db_path):
+    """
+    按单个配置文件升级已存在的表（补充派生列、回填历史数据、创建索引）
+    
     Args:
         config_path: JSON配置文件路径
         db_path: 数据库文件路径（从config.ini读取）
     """
     processor = DataProcessor(config_path, db_path)
-    return processor.process()
+    is_valid, error_message = processor.validate()
+    if not is_valid:
+        return False
+    return processor.prepare_table()
 
 
 def process_multiple_configs(config_paths, db_path):
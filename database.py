@@ -1,33 +1,79 @@
 import sqlite3
 from typing import List, Dict, Any, Optional
+from collections import OrderedDict
+import heapq
+import json
 import math
+import re
+import threading
+import time
 from pathlib import Path
+import table_meta
+import rollups
+import overload_episodes
+import cell_baseline
+from script_engine import ScriptEngine, CompiledScript
+from result_cache import ResultCache, MaterializedResult, ResultTooLarge, OVERSIZED
+
+# 分批删除时记录本批rowid的临时表
+DELETE_BATCH_TABLE = '_mh_delete_batch'
+# 不超过该页数的数据库视为空数据库，切换增量回收模式时直接执行VACUUM
+SMALL_DATABASE_PAGES = 1024
+# 写锁被占用时等待的秒数（导入、派生列回填和后台维护可能同时写入）
+BUSY_TIMEOUT = 60
+# 列草图尚未建立时，取值分布最多统计的行数（结果不精确）
+FACET_SAMPLE_ROWS = 100000
+# float64能精确表示的最大整数，超过时统计存储类型记为 bigint
+FLOAT_EXACT_INT = 2 ** 53
 
 
 class DatabaseManager:
-    def __init__(self, db_path: str):
+    def __init__(self, db_path: str, cache_max_bytes: int = 256 * 1024 * 1024, cache_ttl: int = 600):
         """
         初始化数据库管理器
         
         Args:
             db_path: 数据库文件完整路径
+            cache_max_bytes: 脚本结果缓存占用的最大内存（字节）
+            cache_ttl: 脚本结果缓存的有效期（秒）
         """
         self.db_path = db_path
         # 确保数据库目录存在
         Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
-        
+        # 确保元数据表存在
+        with self.get_connection() as conn:
+            # WAL模式（持久保存在数据库文件中）：导出等长时间的读事务不阻塞导入和保留策略清理的写入
+            conn.execute("PRAGMA journal_mode = WAL")
+            table_meta.ensure_meta_tables(conn)
+            rollups.ensure_rollup_tables(conn)
+            overload_episodes.ensure_episode_tables(conn)
+            cell_baseline.ensure_baseline_tables(conn)
+        # 带筛选条件的取值分布缓存（按表写入代数失效）
+        self._facet_cache = OrderedDict()
+        self._facet_cache_lock = threading.Lock()
+        self._facet_cache_size = 256
+        # SQL脚本引擎（脚本缓存 + 参数绑定 + 预编译语句复用）
+        self.scripts = ScriptEngine(self.db_path)
+        # 脚本物化结果缓存（按脚本版本、参数和依赖表写入代数区分）
+        self.result_cache = ResultCache(cache_max_bytes, cache_ttl)
+    
     def get_connection(self):
         """获取数据库连接（返回上下文管理器）"""
-        return sqlite3.connect(self.db_path)
+        return sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT)
     
     def get_tables(self) -> List[str]:
-        """获取所有表名"""
+        """获取所有表名（不含内部元数据表）"""
         with self.get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
-            tables = [row[0] for row in cursor.fetchall()]
+            tables = [row[0] for row in cursor.fetchall() if not table_meta.is_internal_table(row[0])]
             return tables
     
+    def get_generation(self, table_name: str) -> int:
+        """获取表的写入代数（数据每次导入或删除后递增）"""
+        with self.get_connection() as conn:
+            return table_meta.get_generation(conn, table_name)
+    
     def get_table_columns(self, table_name: str) -> List[str]:
         """获取表的所有列名"""
         with self.get_connection() as conn:
@@ -36,92 +82,132 @@ class DatabaseManager:
             columns = [row[1] for row in cursor.fetchall()]
             return columns
     
+    def _build_where(self, search_field: Optional[str] = None, search_value: Optional[str] = None,
+                     filters: Optional[Dict[str, Any]] = None, table_name: Optional[str] = None):
+        """
+        根据单字段查询和多字段筛选条件构建WHERE子句
+        
+        指定table_name时，根据列统计信息估计每个筛选条件的选择性，
+        并用 likelihood() 提示给SQLite查询规划器。
+        
+        Returns:
+            (where_clause, params)，where_clause为空字符串或以 " WHERE " 开头
+        """
+        # 有筛选条件时读取统计信息估计选择性，连接在异常时也会关闭
+        hint_conn = self.get_connection() if table_name and filters else None
+        try:
+            return self._build_conditions(search_field, search_value, filters, table_name, hint_conn)
+        finally:
+            if hint_conn is not None:
+                hint_conn.close()
+    
+    @staticmethod
+    def _build_conditions(search_field: Optional[str], search_value: Optional[str],
+                          filters: Optional[Dict[str, Any]], table_name: Optional[str], hint_conn):
+        """构建WHERE子句（hint_conn 不为空时附加选择性提示）"""
+        # 构建查询条件
+        where_conditions = []
+        params = []
+        
+        # 兼容旧的单字段查询方式
+        if search_field and search_value:
+            where_conditions.append(f"[{search_field}] LIKE ?")
+            params.append(f"%{search_value}%")
+        
+        # 支持多字段筛选（filters是字典，key为字段名，value是{rule: 'contains', value: 'xxx'}）
+        if filters:
+            for field, filter_obj in filters.items():
+                if isinstance(filter_obj, dict):
+                    rule = filter_obj.get('rule', 'contains')
+                    value = filter_obj.get('value', '')
+                else:
+                    # 兼容旧格式（直接是字符串值）
+                    rule = 'contains'
+                    value = filter_obj
+                
+                if value and str(value).strip():
+                    value_str = str(value).strip()
+                    condition_count = len(where_conditions)
+                    if rule == 'contains':
+                        where_conditions.append(f"[{field}] LIKE ?")
+                        params.append(f"%{value_str}%")
+                    elif rule == 'equals':
+                        where_conditions.append(f"[{field}] = ?")
+                        params.append(value_str)
+                    elif rule == 'starts':
+                        where_conditions.append(f"[{field}] LIKE ?")
+                        params.append(f"{value_str}%")
+                    elif rule == 'ends':
+                        where_conditions.append(f"[{field}] LIKE ?")
+                        params.append(f"%{value_str}")
+                    elif rule == 'greater':
+                        # 尝试转换为数字进行比较
+                        try:
+                            num_value = float(value_str)
+                            where_conditions.append(f"CAST([{field}] AS REAL) > ?")
+                            params.append(num_value)
+                        except ValueError:
+                            # 如果不是数字，按字符串比较
+                            where_conditions.append(f"[{field}] > ?")
+                            params.append(value_str)
+                    elif rule == 'greater_equal':
+                        # 尝试转换为数字进行比较
+                        try:
+                            num_value = float(value_str)
+                            where_conditions.append(f"CAST([{field}] AS REAL) >= ?")
+                            params.append(num_value)
+                        except ValueError:
+                            # 如果不是数字，按字符串比较
+                            where_conditions.append(f"[{field}] >= ?")
+                            params.append(value_str)
+                    elif rule == 'less':
+                        # 尝试转换为数字进行比较
+                        try:
+                            num_value = float(value_str)
+                            where_conditions.append(f"CAST([{field}] AS REAL) < ?")
+                            params.append(num_value)
+                        except ValueError:
+                            # 如果不是数字，按字符串比较
+                            where_conditions.append(f"[{field}] < ?")
+                            params.append(value_str)
+                    elif rule == 'less_equal':
+                        # 尝试转换为数字进行比较
+                        try:
+                            num_value = float(value_str)
+                            where_conditions.append(f"CAST([{field}] AS REAL) <= ?")
+                            params.append(num_value)
+                        except ValueError:
+                            # 如果不是数字，按字符串比较
+                            where_conditions.append(f"[{field}] <= ?")
+                            params.append(value_str)
+                    
+                    # 附加选择性提示
+                    if hint_conn is not None and len(where_conditions) > condition_count:
+                        selectivity = table_meta.estimate_selectivity(hint_conn, table_name, field, rule, value_str)
+                        if selectivity is not None:
+                            where_conditions[-1] = f"likelihood({where_conditions[-1]}, {selectivity:.4f})"
+        
+        where_clause = ""
+        if where_conditions:
+            where_clause = " WHERE " + " AND ".join(where_conditions)
+        return where_clause, params
+    
     def get_table_data(self, table_name: str, page: int = 1, page_size: int = 50, 
                       search_field: Optional[str] = None, search_value: Optional[str] = None,
                       filters: Optional[Dict[str, str]] = None, 
-                      sort_field: Optional[str] = None, sort_order: Optional[str] = None) -> Dict[str, Any]:
-        """分页获取表数据，支持多字段筛选和排序"""
+                      sort_field: Optional[str] = None, sort_order: Optional[str] = None,
+                      compact: bool = False) -> Dict[str, Any]:
+        """
+        分页获取表数据，支持多字段筛选和排序
+        
+        compact 为 True 时返回紧凑格式：rows 为与 columns 顺序一致的值数组，不在每行中重复列名；
+        否则返回 data（每行一个字典）
+        """
         with self.get_connection() as conn:
             cursor = conn.cursor()
             
             # 构建查询条件
-            where_conditions = []
-            params = []
-            
-            # 兼容旧的单字段查询方式
-            if search_field and search_value:
-                where_conditions.append(f"[{search_field}] LIKE ?")
-                params.append(f"%{search_value}%")
-            
-            # 支持多字段筛选（filters是字典，key为字段名，value是{rule: 'contains', value: 'xxx'}）
-            if filters:
-                for field, filter_obj in filters.items():
-                    if isinstance(filter_obj, dict):
-                        rule = filter_obj.get('rule', 'contains')
-                        value = filter_obj.get('value', '')
-                    else:
-                        # 兼容旧格式（直接是字符串值）
-                        rule = 'contains'
-                        value = filter_obj
-                    
-                    if value and str(value).strip():
-                        value_str = str(value).strip()
-                        if rule == 'contains':
-                            where_conditions.append(f"[{field}] LIKE ?")
-                            params.append(f"%{value_str}%")
-                        elif rule == 'equals':
-                            where_conditions.append(f"[{field}] = ?")
-                            params.append(value_str)
-                        elif rule == 'starts':
-                            where_conditions.append(f"[{field}] LIKE ?")
-                            params.append(f"{value_str}%")
-                        elif rule == 'ends':
-                            where_conditions.append(f"[{field}] LIKE ?")
-                            params.append(f"%{value_str}")
-                        elif rule == 'greater':
-                            # 尝试转换为数字进行比较
-                            try:
-                                num_value = float(value_str)
-                                where_conditions.append(f"CAST([{field}] AS REAL) > ?")
-                                params.append(num_value)
-                            except ValueError:
-                                # 如果不是数字，按字符串比较
-                                where_conditions.append(f"[{field}] > ?")
-                                params.append(value_str)
-                        elif rule == 'greater_equal':
-                            # 尝试转换为数字进行比较
-                            try:
-                                num_value = float(value_str)
-                                where_conditions.append(f"CAST([{field}] AS REAL) >= ?")
-                                params.append(num_value)
-                            except ValueError:
-                                # 如果不是数字，按字符串比较
-                                where_conditions.append(f"[{field}] >= ?")
-                                params.append(value_str)
-                        elif rule == 'less':
-                            # 尝试转换为数字进行比较
-                            try:
-                                num_value = float(value_str)
-                                where_conditions.append(f"CAST([{field}] AS REAL) < ?")
-                                params.append(num_value)
-                            except ValueError:
-                                # 如果不是数字，按字符串比较
-                                where_conditions.append(f"[{field}] < ?")
-                                params.append(value_str)
-                        elif rule == 'less_equal':
-                            # 尝试转换为数字进行比较
-                            try:
-                                num_value = float(value_str)
-                                where_conditions.append(f"CAST([{field}] AS REAL) <= ?")
-                                params.append(num_value)
-                            except ValueError:
-                                # 如果不是数字，按字符串比较
-                                where_conditions.append(f"[{field}] <= ?")
-                                params.append(value_str)
-            
-            where_clause = ""
-            if where_conditions:
-                where_clause = " WHERE " + " AND ".join(where_conditions)
+            where_clause, params = self._build_where(search_field, search_value, filters, table_name)
             
             # 构建排序
             order_clause = ""
@@ -148,10 +234,9 @@ class DatabaseManager:
             
             columns = [desc[0] for desc in cursor.description]
             rows = cursor.fetchall()
-            data = [dict(zip(columns, row)) for row in rows]
             
             return {
-                "data": data,
+                **self._page_rows(columns, rows, compact),
                 "total_count": total_count,
                 "total_pages": total_pages,
                 "current_page": page,
@@ -159,15 +244,512 @@ class DatabaseManager:
                 "columns": columns
             }
     
+    @staticmethod
+    def _page_rows(columns: List[str], rows: List[tuple], compact: bool) -> Dict[str, Any]:
+        """分页数据：紧凑格式为 rows（值数组），否则为 data（字典）"""
+        if compact:
+            return {"rows": rows}
+        return {"data": [dict(zip(columns, row)) for row in rows]}
+    
+    def stream_table_rows(self, table_name: str,
+                          search_field: Optional[str] = None, search_value: Optional[str] = None,
+                          filters: Optional[Dict[str, Any]] = None,
+                          sort_field: Optional[str] = None, sort_order: Optional[str] = None,
+                          batch_size: int = 1000, with_types: bool = False):
+        """
+        流式读取表数据（用于导出）
+        
+        查询在调用时立即执行（表、字段错误直接抛出），返回的生成器按批次从游标读取，
+        内存占用与表大小无关。总行数与数据在同一个读事务中查询，两者一致。
+        计数和首次读取（有排序时需要完成排序）耗时与表大小相关，路由中应在线程池中调用；
+        数据库为WAL模式，读事务持续到读取结束也不会阻塞写入。
+        
+        Args:
+            with_types: 是否在计数时一并统计各列实际出现的存储类型（Parquet/Arrow导出确定列类型）
+        
+        Returns:
+            (columns, rows生成器, 总行数, 各列存储类型集合或None)，每行为元组
+        """
+        columns = self.get_table_columns(table_name)
+        if not columns:
+            raise ValueError(f"表 {table_name} 不存在")
+        if sort_field and sort_field not in columns:
+            raise ValueError(f"表 {table_name} 中不存在字段 {sort_field}")
+        
+        where_clause, params = self._build_where(search_field, search_value, filters, table_name)
+        sql = f"SELECT * FROM [{table_name}]{where_clause}{self._order_clause(sort_field, sort_order)}"
+        
+        # 流式响应可能在不同线程中迭代，使用独立连接
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        try:
+            conn.execute("BEGIN")
+            select = "COUNT(*)"
+            if with_types:
+                select += ", " + self._storage_types_select(columns)
+            counts = conn.execute(f"SELECT {select} FROM [{table_name}]{where_clause}", params).fetchone()
+            total_count = counts[0]
+            column_types = self._storage_types(counts[1:]) if with_types else None
+            cursor = conn.execute(sql, params)
+        except Exception:
+            conn.close()
+            raise
+        
+        def stream_rows():
+            try:
+                while True:
+                    batch = cursor.fetchmany(batch_size)
+                    if not batch:
+                        break
+                    yield from batch
+            finally:
+                conn.close()
+        
+        return columns, stream_rows(), total_count, column_types
+    
+    def get_facets(self, table_name: str, column: str, limit: int = 20,
+                   search_field: Optional[str] = None, search_value: Optional[str] = None,
+                   filters: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        获取列的高频取值及计数（用于筛选下拉）
+        
+        无筛选条件时直接读取导入时增量维护的列草图（草图由后台维护线程构建，
+        尚未建立时只统计前 FACET_SAMPLE_ROWS 行，返回 exact 为 false）；
+        有筛选条件时执行有界的分组查询，结果按表写入代数缓存。
+        """
+        if column not in self.get_table_columns(table_name):
+            raise ValueError(f"表 {table_name} 中不存在字段 {column}")
+        
+        # 当前列自身的筛选条件不参与计算，便于切换取值
+        other_filters = {k: v for k, v in (filters or {}).items() if k != column}
+        if search_field == column:
+            search_field, search_value = None, None
+        
+        with self.get_connection() as conn:
+            if not other_filters and not (search_field and search_value):
+                sketch = table_meta.get_sketch(conn, table_name, column, limit)
+                if sketch is None:
+                    cursor = conn.execute(
+                        f"SELECT value, COUNT(*) AS cnt FROM ("
+                        f"SELECT [{column}] AS value FROM [{table_name}] WHERE [{column}] IS NOT NULL LIMIT ?"
+                        f") GROUP BY value ORDER BY cnt DESC LIMIT ?",
+                        (FACET_SAMPLE_ROWS, limit)
+                    )
+                    return {
+                        "column": column,
+                        "values": [{"value": str(value), "count": count} for value, count in cursor.fetchall()],
+                        "exact": False,
+                        "source": "sample"
+                    }
+                rows, exact = sketch
+                return {
+                    "column": column,
+                    "values": [{"value": value, "count": count} for value, count in rows],
+                    "exact": exact,
+                    "source": "sketch"
+                }
+            
+            generation = table_meta.get_generation(conn, table_name)
+            cache_key = (
+                table_name, column, limit, generation, search_field, search_value,
+                json.dumps(other_filters, ensure_ascii=False, sort_keys=True)
+            )
+            with self._facet_cache_lock:
+                if cache_key in self._facet_cache:
+                    self._facet_cache.move_to_end(cache_key)
+                    return self._facet_cache[cache_key]
+            
+            where_clause, params = self._build_where(search_field, search_value, other_filters, table_name)
+            null_filter = f"[{column}] IS NOT NULL"
+            where_clause = f"{where_clause} AND {null_filter}" if where_clause else f" WHERE {null_filter}"
+            cursor = conn.execute(
+                f"SELECT [{column}], COUNT(*) AS cnt FROM [{table_name}]{where_clause} "
+                f"GROUP BY [{column}] ORDER BY cnt DESC LIMIT ?",
+                params + [limit]
+            )
+            result = {
+                "column": column,
+                "values": [{"value": str(value), "count": count} for value, count in cursor.fetchall()],
+                "exact": True,
+                "source": "query"
+            }
+        
+        with self._facet_cache_lock:
+            self._facet_cache[cache_key] = result
+            while len(self._facet_cache) > self._facet_cache_size:
+                self._facet_cache.popitem(last=False)
+        return result
+    
+    def repair_tables(self) -> List[str]:
+        """
+        重置导入中途失败的表（带有导入标记）的派生数据：列草图、统计信息、汇总、
+        连续高负荷段和小区基线，随后由 refresh_stats 和 build_summaries 全表重新构建
+        （由后台维护线程调用）
+        
+        Returns:
+            重置的表名列表
+        """
+        with self.get_connection() as conn:
+            tables = table_meta.dirty_tables(conn)
+            for table_name in tables:
+                table_meta.reset_table(conn, table_name)
+                table_meta.bump_generation(conn, table_name)
+                rollups.reset_table(conn, table_name)
+                overload_episodes.reset_table(conn, table_name)
+                cell_baseline.reset_table(conn, table_name)
+                table_meta.clear_dirty(conn, table_name)
+            conn.commit()
+        return tables
+    
+    def refresh_stats(self) -> List[str]:
+        """
+        为所有表构建尚未建立的列统计信息和列草图，并重新计算失效的最值
+        （由后台维护线程调用，避免首次读取统计信息或取值分布时在请求中全表扫描）
+        
+        Returns:
+            执行了扫描的表名列表
+        """
+        refreshed = []
+        for table_name in self.get_tables():
+            with self.get_connection() as conn:
+                scanned = table_meta.refresh_stats(conn, table_name)
+                conn.commit()
+                if table_meta.build_sketches(conn, table_name):
+                    scanned = True
+                    conn.commit()
+                if scanned:
+                    refreshed.append(table_name)
+        return refreshed
+    
+    def build_summaries(self) -> List[str]:
+        """
+        为已有数据的表首次建立小时/天汇总、连续高负荷段和小区基线（由后台维护线程调用，避免在查询请求中全表扫描）
+        
+        Returns:
+            执行了构建的表名列表
+        """
+        built = []
+        for table_name in self.get_tables():
+            with self.get_connection() as conn:
+                changed = rollups.ensure_rollups(conn, table_name)
+                conn.commit()
+                if overload_episodes.ensure_episodes(conn, table_name):
+                    changed = True
+                    conn.commit()
+                if cell_baseline.ensure_baseline(conn, table_name):
+                    changed = True
+                    conn.commit()
+                if changed:
+                    built.append(table_name)
+        return built
+    
+    def get_column_stats(self, table_name: str) -> Dict[str, Any]:
+        """获取表的列统计信息（导入时增量维护，首次读取时全表构建）"""
+        if table_name not in self.get_tables():
+            raise ValueError(f"表 {table_name} 不存在")
+        with self.get_connection() as conn:
+            columns = table_meta.get_stats(conn, table_name)
+            conn.commit()
+        order = {name: i for i, name in enumerate(self.get_table_columns(table_name))}
+        columns.sort(key=lambda item: order.get(item["column"], len(order)))
+        return {
+            "table": table_name,
+            "row_count": columns[0]["row_count"] if columns else 0,
+            "columns": columns
+        }
+    
+    def get_timeseries(self, table_name: str, cgi: str, start_time: str, end_time: str,
+                       resolution: str = '1h') -> Dict[str, Any]:
+        """
+        查询单个小区的指标趋势（按粒度选择小时/天汇总表或原始数据）
+        
+        Args:
+            table_name: 表名
+            cgi: 小区CGI
+            start_time: 开始时间（包含）
+            end_time: 结束时间（不包含）
+            resolution: 时间粒度，如 15m、1h、1d
+        """
+        if table_name not in self.get_tables():
+            raise ValueError(f"表 {table_name} 不存在")
+        with self.get_connection() as conn:
+            return rollups.query_timeseries(conn, table_name, cgi, start_time, end_time, resolution)
+    
+    def get_top_cells(self, start_time: str, end_time: str, metric: str = 'dl_avg', n: int = 50,
+                      table_name: Optional[str] = None) -> Dict[str, Any]:
+        """
+        按指标查询时间范围内最差的N个小区
+        
+        按小区汇总来自小时汇总表（首尾不足一小时的部分来自原始数据），
+        再用大小为N的堆选出前N个，不对全部小区排序。汇总尚未建立的表不参与排名，
+        表名在返回的 building 中列出（由后台维护线程构建）。
+        
+        Args:
+            metric: 排名指标，见 rollups.TOP_METRICS
+            n: 返回的小区数
+            table_name: 表名，为空时在所有包含汇总字段的表中排名
+        """
+        if metric not in rollups.TOP_METRICS:
+            raise ValueError(f"不支持的排名指标 {metric}，可选: {', '.join(rollups.TOP_METRICS)}")
+        tables = self.get_tables()
+        if table_name:
+            if table_name not in tables:
+                raise ValueError(f"表 {table_name} 不存在")
+            tables = [table_name]
+        tables = [table for table in tables if rollups.supports_rollup(self.get_table_columns(table))]
+        compute = rollups.TOP_METRICS[metric][1]
+        
+        building = []
+        with self.get_connection() as conn:
+            def candidates():
+                for table in tables:
+                    aggregates = rollups.cell_aggregates(conn, table, start_time, end_time)
+                    if aggregates is None:
+                        building.append(table)
+                        continue
+                    for cgi, values in aggregates.items():
+                        value = compute(values)
+                        if value is not None:
+                            yield value, table, cgi, values
+            
+            top = heapq.nlargest(n, candidates(), key=lambda item: item[0])
+            
+            cells = []
+            for rank, (value, table, cgi, values) in enumerate(top, 1):
+                name = None
+                if '小区名称' in self.get_table_columns(table):
+                    row = conn.execute(f"SELECT [小区名称] FROM [{table}] WHERE [CGI] = ? LIMIT 1", (cgi,)).fetchone()
+                    name = row[0] if row else None
+                cells.append({
+                    "rank": rank,
+                    "table": table,
+                    "cgi": cgi,
+                    "cell_name": name,
+                    "value": value,
+                    "samples": values['samples'],
+                    "max_users": values['max_users'],
+                    "ul_avg": rollups.TOP_METRICS['ul_avg'][1](values),
+                    "ul_max": values['ul_max'],
+                    "dl_avg": rollups.TOP_METRICS['dl_avg'][1](values),
+                    "dl_max": values['dl_max']
+                })
+        
+        return {
+            "metric": metric,
+            "metric_name": rollups.TOP_METRICS[metric][0],
+            "start_time": start_time,
+            "end_time": end_time,
+            "cells": cells,
+            "building": building
+        }
+    
     def clear_table(self, table_name: str) -> int:
-        """清空表数据"""
+        """
+        清空表数据
+        
+        通过删除并按原结构重建表（含索引和触发器）实现快速清空，
+        避免在大表上逐行DELETE导致长时间持有写锁和日志文件膨胀。
+        """
         with self.get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute(f"DELETE FROM [{table_name}]")
-            affected_rows = cursor.rowcount
-            conn.commit()
+            cursor.execute("SELECT sql FROM sqlite_master WHERE type='table' AND name=?", (table_name,))
+            row = cursor.fetchone()
+            if row is None:
+                raise ValueError(f"表 {table_name} 不存在")
+            table_sql = row[0]
+            
+            # 收集表上的索引和触发器定义（自动索引的sql为NULL，会随建表语句重建）
+            cursor.execute(
+                "SELECT sql FROM sqlite_master WHERE type IN ('index', 'trigger') AND tbl_name=? AND sql IS NOT NULL",
+                (table_name,)
+            )
+            dependent_sqls = [r[0] for r in cursor.fetchall()]
+            
+            # 在同一个事务中完成计数、删除和重建
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                # 行数优先取自列统计信息，避免在大表上全表计数；尚未建立统计信息时在事务内计数
+                affected_rows = table_meta.get_row_count(conn, table_name)
+                if affected_rows is None:
+                    cursor.execute(f"SELECT COUNT(*) FROM [{table_name}]")
+                    affected_rows = cursor.fetchone()[0]
+                cursor.execute(f"DROP TABLE [{table_name}]")
+                cursor.execute(table_sql)
+                for sql in dependent_sqls:
+                    cursor.execute(sql)
+                table_meta.reset_table(conn, table_name)
+                table_meta.bump_generation(conn, table_name)
+                rollups.reset_table(conn, table_name)
+                overload_episodes.reset_table(conn, table_name)
+                cell_baseline.reset_table(conn, table_name)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            self.invalidate_results(table_name)
             return affected_rows
     
+    def _delete_in_batches(self, conn, table_name: str, where_clause: str, params: List[Any],
+                           batch_size: int = 5000, pause: float = 0.05) -> int:
+        """
+        按rowid分批删除满足条件的记录，每批单独提交
+        
+        每批先把要删除的rowid写入临时表，在同一个事务中从列草图、统计信息和
+        小区基线中扣减这些记录后再删除，扣减与删除同时生效：中途失败时已提交的
+        批次元数据与数据一致，未提交的批次整体回滚。
+        批次之间释放写锁并短暂休眠，让读请求有机会执行，
+        同时避免单个大事务导致日志文件膨胀。
+        
+        Returns:
+            删除的总行数
+        """
+        batch_clause = f"rowid IN (SELECT id FROM temp.{DELETE_BATCH_TABLE})"
+        conn.execute(f"CREATE TEMP TABLE IF NOT EXISTS {DELETE_BATCH_TABLE} (id INTEGER PRIMARY KEY)")
+        total_deleted = 0
+        try:
+            while True:
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    conn.execute(f"DELETE FROM temp.{DELETE_BATCH_TABLE}")
+                    conn.execute(
+                        f"INSERT INTO temp.{DELETE_BATCH_TABLE} (id) "
+                        f"SELECT rowid FROM [{table_name}] WHERE {where_clause} LIMIT ?",
+                        list(params) + [batch_size]
+                    )
+                    table_meta.subtract_range(conn, table_name, batch_clause, [])
+                    cell_baseline.subtract_range(conn, table_name, batch_clause, [])
+                    deleted = conn.execute(f"DELETE FROM [{table_name}] WHERE {batch_clause}").rowcount
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+                total_deleted += deleted
+                if deleted < batch_size:
+                    break
+                time.sleep(pause)
+        finally:
+            conn.execute(f"DROP TABLE IF EXISTS temp.{DELETE_BATCH_TABLE}")
+        return total_deleted
+    
+    def delete_range(self, table_name: str, start_time: Optional[str] = None, end_time: Optional[str] = None,
+                     time_field: str = '开始时间', batch_size: int = 5000) -> int:
+        """
+        按时间范围分批删除数据
+        
+        Args:
+            table_name: 表名
+            start_time: 开始时间（包含），为空表示不限
+            end_time: 结束时间（不包含），为空表示不限
+            time_field: 时间字段名
+            batch_size: 每批删除的行数
+        
+        Returns:
+            删除的总行数
+        """
+        if time_field not in self.get_table_columns(table_name):
+            raise ValueError(f"表 {table_name} 中不存在字段 {time_field}")
+        
+        where_conditions = []
+        params = []
+        if start_time:
+            where_conditions.append(f"[{time_field}] >= ?")
+            params.append(start_time)
+        if end_time:
+            where_conditions.append(f"[{time_field}] < ?")
+            params.append(end_time)
+        if not where_conditions:
+            raise ValueError("开始时间和结束时间不能同时为空，清空整表请使用清空操作")
+        
+        where_clause = " AND ".join(where_conditions)
+        with self.get_connection() as conn:
+            # 分批删除，每批在同一事务中扣减元数据
+            deleted = self._delete_in_batches(conn, table_name, where_clause, params, batch_size)
+            if deleted:
+                table_meta.bump_generation(conn, table_name)
+                # 重算受影响时间桶的汇总和连续高负荷段（按其他时间字段删除时整表重建）
+                if time_field == rollups.TIME_FIELD:
+                    rollups.rebuild_range(conn, table_name, start_time, end_time)
+                    overload_episodes.rebuild_range(conn, table_name, start_time, end_time)
+                else:
+                    if rollups.is_built(conn, table_name):
+                        rollups.rebuild(conn, table_name)
+                    if overload_episodes.is_built(conn, table_name):
+                        overload_episodes.rebuild(conn, table_name)
+                conn.commit()
+                self.invalidate_results(table_name)
+            return deleted
+    
+    def apply_retention(self, table_name: str, keep_days: int, time_field: str = '开始时间',
+                        batch_size: int = 5000) -> int:
+        """
+        按保留天数清理过期数据（分批删除）
+        
+        Args:
+            table_name: 表名
+            keep_days: 保留天数，早于 当前时间 - keep_days 的记录会被删除
+            time_field: 时间字段名
+            batch_size: 每批删除的行数
+        
+        Returns:
+            删除的总行数
+        """
+        if keep_days <= 0:
+            return 0
+        if table_name not in self.get_tables():
+            return 0
+        if time_field not in self.get_table_columns(table_name):
+            return 0
+        
+        cutoff = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(time.time() - keep_days * 86400))
+        return self.delete_range(table_name, end_time=cutoff, time_field=time_field, batch_size=batch_size)
+    
+    def ensure_incremental_vacuum(self, allow_vacuum: bool = False) -> Optional[bool]:
+        """
+        确保数据库启用增量自动回收（auto_vacuum=INCREMENTAL）
+        
+        已存在的数据库切换模式需要执行一次完整的VACUUM，之后即可通过
+        incremental_vacuum 分批回收空闲页，不再需要长时间的独占锁。
+        VACUUM 期间独占数据库，因此只对空数据库（不超过 SMALL_DATABASE_PAGES 页）
+        自动执行，已有数据的数据库需要 allow_vacuum 显式开启。
+        
+        Args:
+            allow_vacuum: 是否允许对已有数据的数据库执行VACUUM
+        
+        Returns:
+            True 表示执行了模式切换，False 表示已是增量模式，None 表示需要切换但未开启
+        """
+        with self.get_connection() as conn:
+            mode = conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+            if mode == 2:
+                return False
+            page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+            if not allow_vacuum and page_count > SMALL_DATABASE_PAGES:
+                return None
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            conn.execute("VACUUM")
+            return True
+    
+    def incremental_vacuum(self, max_pages: int = 0) -> int:
+        """
+        增量回收空闲页
+        
+        Args:
+            max_pages: 本次最多回收的页数，0表示回收全部空闲页
+        
+        Returns:
+            回收的页数
+        """
+        with self.get_connection() as conn:
+            before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            if before == 0:
+                return 0
+            # incremental_vacuum每执行一步只回收一页，需要用executescript执行到结束
+            if max_pages > 0:
+                conn.executescript(f"PRAGMA incremental_vacuum({int(max_pages)});")
+            else:
+                conn.executescript("PRAGMA incremental_vacuum;")
+            after = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            return before - after
+    
     def get_table_count(self, table_name: str) -> int:
         """获取表记录数"""
         with self.get_connection() as conn:
@@ -176,31 +758,349 @@ class DatabaseManager:
             count = cursor.fetchone()[0]
             return count
     
-    def execute_sql_file(self, sql_file_path: str, params: Dict[str, Any] = None) -> List[Dict[str, Any]]:
-        """执行SQL文件，支持参数替换"""
-        # 读取SQL文件
-        sql = ""
-        with open(sql_file_path, 'r', encoding='utf-8') as f:
-            sql = f.read()
+    def script_tables(self, script: CompiledScript) -> List[str]:
+        """
+        获取脚本读取的表
         
-        # 替换参数（转义单引号以防止SQL注入）
-        if params:
-            for key, value in params.items():
-                # 转义单引号，防止SQL注入
-                escaped_value = str(value).replace("'", "''")
-                sql = sql.replace(f'{{{{{key}}}}}', escaped_value)
+        优先使用脚本头部 @tables 声明；未声明时按数据库中的表名在脚本文本中匹配。
+        """
+        if script.tables is not None:
+            return script.tables
+        return [
+            table for table in self.get_tables()
+            if re.search(rf"(?<!\w){re.escape(table)}(?!\w)", script.sql)
+        ]
+    
+    def script_version(self, sql_file_path: str) -> Dict[str, Any]:
+        """
+        脚本的数据版本：脚本文本版本与依赖表的写入代数
         
-        # 使用上下文管理器执行查询
+        脚本修改或依赖表导入、删除数据后版本随之变化，用于结果缓存键和HTTP ETag。
+        """
+        script = self.scripts.load(sql_file_path)
+        tables = self.script_tables(script)
         with self.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute(sql)
-            
-            # 检查是否有结果
-            if cursor.description is None:
-                return []
-            
-            columns = [desc[0] for desc in cursor.description]
-            rows = cursor.fetchall()
-            data = [dict(zip(columns, row)) for row in rows]
-            
-            return data
\ No newline at end of file
+            generations = {table: table_meta.get_generation(conn, table) for table in tables}
+        return {"script": script.path, "version": script.version, "generations": generations}
+    
+    def materialize_script(self, sql_file_path: str, params: Dict[str, Any] = None) -> Optional[MaterializedResult]:
+        """
+        执行脚本并物化结果（带缓存）
+        
+        同一脚本、参数和依赖表写入代数只执行一次，分页查询、统计和导出共用这份结果；
+        依赖表导入或删除数据后写入代数递增，缓存键随之变化。
+        
+        Returns:
+            物化结果；结果超过缓存内存上限时返回None，调用方直接在数据库上查询
+        """
+        script = self.scripts.load(sql_file_path)
+        bound = script.bind(params)
+        tables = self.script_tables(script)
+        
+        key = json.dumps({
+            **self.script_version(sql_file_path),
+            "params": bound
+        }, ensure_ascii=False, sort_keys=True, default=str)
+        
+        def compute():
+            cursor = self.scripts.run(script.sql, bound)
+            try:
+                result = MaterializedResult(cursor, max_bytes=self.result_cache.max_bytes)
+            except ResultTooLarge:
+                # 记录超限结果，有效期内同样的查询直接走数据库
+                return OVERSIZED, 0
+            finally:
+                # 及时结束语句，避免未读完的游标持有读锁
+                cursor.close()
+            return result, result.nbytes
+        
+        result = self.result_cache.get_or_compute(key, compute, tables)
+        return None if result is OVERSIZED else result
+    
+    def invalidate_results(self, table_name: Optional[str] = None):
+        """使依赖指定表的脚本结果缓存失效（不指定表时清空）"""
+        self.result_cache.invalidate(table_name)
+    
+    @staticmethod
+    def _check_result_fields(columns: List[str], search_field: Optional[str], search_value: Optional[str],
+                             filters: Optional[Dict[str, Any]], sort_field: Optional[str]):
+        """校验筛选和排序字段都在结果列中"""
+        referenced = list((filters or {}).keys())
+        if search_field and search_value:
+            referenced.append(search_field)
+        if sort_field:
+            referenced.append(sort_field)
+        unknown = [field for field in referenced if field not in columns]
+        if unknown:
+            raise ValueError(f"查询结果中不存在字段: {', '.join(unknown)}")
+    
+    @staticmethod
+    def _storage_types_select(columns: List[str]) -> str:
+        """统计各列实际出现的存储类型（typeof）的选择列表，超过float64精度的整数记为 bigint"""
+        return ", ".join(
+            f"group_concat(DISTINCT CASE WHEN typeof([{column}]) = 'integer' "
+            f"AND [{column}] NOT BETWEEN -{FLOAT_EXACT_INT} AND {FLOAT_EXACT_INT} "
+            f"THEN 'bigint' ELSE typeof([{column}]) END)"
+            for column in columns
+        )
+    
+    @staticmethod
+    def _storage_types(values) -> List[set]:
+        """解析存储类型统计结果为每列一个集合"""
+        return [set(value.split(',')) if value else set() for value in values]
+    
+    @staticmethod
+    def _order_clause(sort_field: Optional[str], sort_order: Optional[str]) -> str:
+        """构建排序子句"""
+        if not sort_field:
+            return ""
+        direction = "DESC" if sort_order and sort_order.upper() == "DESC" else "ASC"
+        return f" ORDER BY [{sort_field}] {direction}"
+    
+    def _materialized_query(self, result: MaterializedResult,
+                            search_field: Optional[str] = None, search_value: Optional[str] = None,
+                            filters: Optional[Dict[str, Any]] = None,
+                            sort_field: Optional[str] = None, sort_order: Optional[str] = None):
+        """
+        构建在物化结果上筛选和排序的查询
+        
+        Returns:
+            (sql, params)
+        """
+        self._check_result_fields(result.columns, search_field, search_value, filters, sort_field)
+        where_clause, where_params = self._build_where(search_field, search_value, filters)
+        order_clause = self._order_clause(sort_field, sort_order)
+        return f"SELECT * FROM {result.TABLE}{where_clause}{order_clause}", where_params
+    
+    def _script_result_query(self, sql_file_path: str, params: Dict[str, Any] = None,
+                             search_field: Optional[str] = None, search_value: Optional[str] = None,
+                             filters: Optional[Dict[str, Any]] = None,
+                             sort_field: Optional[str] = None, sort_order: Optional[str] = None):
+        """
+        构建直接在数据库上筛选和排序的查询（脚本作为子查询，用于超出缓存上限的结果）
+        
+        Returns:
+            (sql, bound_params, columns)
+        """
+        script = self.scripts.load(sql_file_path)
+        bound = script.bind(params)
+        
+        # 获取结果列（LIMIT 0 只准备语句，不产生数据）
+        cursor = self.scripts.run(f"SELECT * FROM ({script.sql}\n) LIMIT 0", bound)
+        columns = [desc[0] for desc in cursor.description]
+        self._check_result_fields(columns, search_field, search_value, filters, sort_field)
+        
+        # 筛选条件的位置参数改写为命名参数，与脚本参数一起绑定
+        where_clause, where_params = self._build_where(search_field, search_value, filters)
+        segments = where_clause.split('?')
+        where_clause = segments[0] + "".join(f":_w{i}{segment}" for i, segment in enumerate(segments[1:]))
+        bound.update({f"_w{i}": value for i, value in enumerate(where_params)})
+        
+        order_clause = self._order_clause(sort_field, sort_order)
+        return f"SELECT * FROM ({script.sql}\n){where_clause}{order_clause}", bound, columns
+    
+    def get_script_page(self, sql_file_path: str, params: Dict[str, Any] = None,
+                        page: int = 1, page_size: int = 100,
+                        search_field: Optional[str] = None, search_value: Optional[str] = None,
+                        filters: Optional[Dict[str, Any]] = None,
+                        sort_field: Optional[str] = None, sort_order: Optional[str] = None,
+                        compact: bool = False) -> Dict[str, Any]:
+        """分页获取脚本结果，支持多字段筛选和排序（返回结构与 get_table_data 一致，含紧凑格式）"""
+        offset = (page - 1) * page_size
+        result = self.materialize_script(sql_file_path, params)
+        
+        if result is not None:
+            columns = result.columns
+            sql, where_params = self._materialized_query(
+                result, search_field, search_value, filters, sort_field, sort_order
+            )
+            total_count = result.fetchall(f"SELECT COUNT(*) FROM ({sql})", where_params)[0][0]
+            rows = result.fetchall(f"{sql} LIMIT ? OFFSET ?", where_params + [page_size, offset])
+        else:
+            sql, bound, columns = self._script_result_query(
+                sql_file_path, params, search_field, search_value, filters, sort_field, sort_order
+            )
+            total_count = self.scripts.run(f"SELECT COUNT(*) FROM ({sql})", bound).fetchone()[0]
+            rows = self.scripts.run(
+                f"{sql} LIMIT :_limit OFFSET :_offset",
+                dict(bound, _limit=page_size, _offset=offset)
+            ).fetchall()
+        
+        return {
+            **self._page_rows(columns, rows, compact),
+            "total_count": total_count,
+            "total_pages": math.ceil(total_count / page_size),
+            "current_page": page,
+            "page_size": page_size,
+            "columns": columns
+        }
+    
+    def stream_script_rows(self, sql_file_path: str, params: Dict[str, Any] = None,
+                           search_field: Optional[str] = None, search_value: Optional[str] = None,
+                           filters: Optional[Dict[str, Any]] = None,
+                           sort_field: Optional[str] = None, sort_order: Optional[str] = None,
+                           batch_size: int = 1000, with_types: bool = False):
+        """
+        流式读取脚本结果
+        
+        查询在调用时立即校验（参数、字段错误直接抛出），返回的生成器按批次读取，
+        不在内存中构建完整的行列表。
+        
+        Args:
+            with_types: 是否统计各列实际出现的存储类型（Parquet导出确定列类型）
+        
+        Returns:
+            (columns, rows生成器, 各列存储类型集合或None)，每行为字典
+        """
+        result = self.materialize_script(sql_file_path, params)
+        if result is not None:
+            sql, where_params = self._materialized_query(
+                result, search_field, search_value, filters, sort_field, sort_order
+            )
+            columns = result.columns
+            column_types = None
+            if with_types:
+                column_types = self._storage_types(
+                    result.fetchall(f"SELECT {self._storage_types_select(columns)} FROM ({sql})", where_params)[0]
+                )
+            rows = (dict(zip(columns, row)) for row in result.iter_rows(sql, where_params, batch_size))
+            return columns, rows, column_types
+        
+        sql, bound, columns = self._script_result_query(
+            sql_file_path, params, search_field, search_value, filters, sort_field, sort_order
+        )
+        
+        # 流式响应可能在不同线程中迭代，使用独立连接；存储类型与数据在同一个读事务中统计
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        try:
+            conn.execute("BEGIN")
+            column_types = None
+            if with_types:
+                column_types = self._storage_types(
+                    conn.execute(f"SELECT {self._storage_types_select(columns)} FROM ({sql})", bound).fetchone()
+                )
+            cursor = conn.execute(sql, bound)
+        except Exception:
+            conn.close()
+            raise
+        
+        def stream_rows():
+            try:
+                while True:
+                    batch = cursor.fetchmany(batch_size)
+                    if not batch:
+                        break
+                    for row in batch:
+                        yield dict(zip(columns, row))
+            finally:
+                conn.close()
+        
+        return columns, stream_rows(), column_types
+    
+    def get_overload_episodes(self, start_time: str, end_time: str, min_intervals: int = 4,
+                              table_name: Optional[str] = None, cgi: Optional[str] = None,
+                              limit: int = 1000) -> Dict[str, Any]:
+        """
+        查询持续高负荷事件（同一小区连续 min_intervals 个及以上时段为高负荷）
+        
+        Returns:
+            {"episodes": [{table, cgi, start_time, end_time, intervals, peak_users, peak_ul, peak_dl}], "total_count",
+             "building": 连续段尚未建立（由后台维护线程构建）的表名列表}
+        """
+        if min_intervals < 1:
+            raise ValueError("最少连续时段数必须大于0")
+        tables = self.get_tables()
+        if table_name:
+            if table_name not in tables:
+                raise ValueError(f"表 {table_name} 不存在")
+            tables = [table_name]
+        with self.get_connection() as conn:
+            result = overload_episodes.query_episodes(conn, start_time, end_time, min_intervals, table_name, cgi, limit)
+            result["building"] = [
+                table for table in tables
+                if overload_episodes.supports_episodes(self.get_table_columns(table))
+                and not overload_episodes.is_built(conn, table)
+            ]
+            return result
+    
+    def get_burst_cells(self, start_time: str, end_time: str, threshold: float = 3.0, min_samples: int = 96,
+                        table_name: Optional[str] = None, limit: int = 1000) -> Dict[str, Any]:
+        """
+        查询相对小区自身基线突发的高负荷记录（任一指标z值达到阈值），按最大z值降序
+        
+        Args:
+            threshold: z值阈值
+            min_samples: 小区基线的最少样本数
+            table_name: 表名，为空时检查所有包含基线字段的表
+        
+        Returns:
+            {"bursts": [{table, cgi, time, users, ul, dl, z_users, z_ul, z_dl}], "total_count",
+             "building": 基线尚未建立（由后台维护线程构建）的表名列表}
+        """
+        tables = self.get_tables()
+        if table_name:
+            if table_name not in tables:
+                raise ValueError(f"表 {table_name} 不存在")
+            tables = [table_name]
+        
+        bursts = []
+        building = []
+        with self.get_connection() as conn:
+            for table in tables:
+                if not cell_baseline.supports_baseline(self.get_table_columns(table)):
+                    continue
+                found = cell_baseline.query_bursts(conn, table, start_time, end_time, threshold, min_samples)
+                if found is None:
+                    building.append(table)
+                else:
+                    bursts.extend(found)
+        
+        z_keys = [f"z_{metric}" for metric in cell_baseline.METRICS]
+        bursts.sort(key=lambda item: max((item[key] for key in z_keys if item[key] is not None), default=0),
+                    reverse=True)
+        return {"bursts": bursts[:limit], "total_count": len(bursts), "building": building}
+    
+    def get_overload_stats(self, sql_file_path: str, params: Dict[str, Any] = None) -> Dict[str, Any]:
+        """
+        在SQLite中按制式分组统计高负荷小区数（按CGI去重），不返回明细行
+        
+        Returns:
+            {"stats": {制式: {total, burst, total_important, burst_important}}, "total_count": 明细行数}
+        """
+        important = """("重要区域" IS NOT NULL AND TRIM("重要区域") <> '')"""
+        burst = """("是否突发高负荷" = '是')"""
+        select_clause = f"""
+            SELECT
+                "制式",
+                COUNT(*),
+                COUNT(DISTINCT "CGI"),
+                COUNT(DISTINCT CASE WHEN {burst} THEN "CGI" END),
+                COUNT(DISTINCT CASE WHEN {important} THEN "CGI" END),
+                COUNT(DISTINCT CASE WHEN {burst} AND {important} THEN "CGI" END)
+        """
+        
+        result = self.materialize_script(sql_file_path, params)
+        if result is not None:
+            rows = result.fetchall(f'{select_clause} FROM {result.TABLE} GROUP BY "制式"')
+        else:
+            script = self.scripts.load(sql_file_path)
+            rows = self.scripts.run(
+                f'{select_clause} FROM ({script.sql}\n) GROUP BY "制式"', script.bind(params)
+            ).fetchall()
+        
+        stats = {
+            system: {"total": 0, "burst": 0, "total_important": 0, "burst_important": 0}
+            for system in ("4G", "5G")
+        }
+        total_count = 0
+        for system, row_count, total, burst_count, total_important, burst_important in rows:
+            total_count += row_count
+            if system in stats:
+                stats[system] = {
+                    "total": total,
+                    "burst": burst_count,
+                    "total_important": total_important,
+                    "burst_important": burst_important
+                }
+        
+        return {"stats": stats, "total_count": total_count}
\ No newline at end of file
@@ -0,0 +1,286 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+派生列模块 - 根据模型配置中的 Derived 声明在导入时计算派生列
+
+支持两类派生列：
+- Concat: 多个字段按分隔符拼接（如 CGI = PLMN-eNodeB-CellID）
+- Condition: 按阈值条件输出标记值（如 是否高负荷小区）
+
+同一份声明既用于导入时的向量化计算（pandas），也用于对已有数据回填（SQL），
+两者按同一规则（mh_num）转换数值，空值和非数值在任何比较中都按不满足处理，保证口径一致。已完成回填的派生列记录在 _mh_derived_backfill 中，
+之后不再扫描（拼接结果在任一部分为空时本身为空，不能用是否为空判断是否需要回填）。
+"""
+from typing import Any, Dict, List, Tuple
+import pandas as pd
+import table_meta
+
+# 已完成回填的派生列
+BACKFILL_TABLE = '_mh_derived_backfill'
+
+# 条件运算符：pandas实现与SQL运算符
+OPERATORS = {
+    '>': (lambda s, v: s > v, '>'),
+    '>=': (lambda s, v: s >= v, '>='),
+    '<': (lambda s, v: s < v, '<'),
+    '<=': (lambda s, v: s <= v, '<='),
+    '=': (lambda s, v: s == v, '='),
+    '!=': (lambda s, v: s != v, '<>'),
+}
+
+
+def _condition_fields(condition: Dict[str, Any]) -> List[str]:
+    """获取条件中引用的所有字段"""
+    if 'All' in condition:
+        return [f for sub in condition['All'] for f in _condition_fields(sub)]
+    if 'Any' in condition:
+        return [f for sub in condition['Any'] for f in _condition_fields(sub)]
+    return [condition['Field']]
+
+
+def _validate_condition(condition: Any) -> str:
+    """校验条件结构，返回错误信息（空字符串表示有效）"""
+    if not isinstance(condition, dict):
+        return "条件必须是对象"
+    for key in ('All', 'Any'):
+        if key in condition:
+            if not isinstance(condition[key], list) or len(condition[key]) == 0:
+                return f"'{key}' 必须是非空数组"
+            for sub in condition[key]:
+                error = _validate_condition(sub)
+                if error:
+                    return error
+            return ""
+    if 'Field' not in condition or 'Op' not in condition or 'Value' not in condition:
+        return "条件必须包含 'Field'、'Op'、'Value' 或 'All'/'Any'"
+    if condition['Op'] not in OPERATORS:
+        return f"不支持的运算符 '{condition['Op']}'，可选: {', '.join(OPERATORS)}"
+    return ""
+
+
+def validate_derived(derived: Any, source_fields: List[str]) -> Tuple[bool, str]:
+    """
+    校验派生列声明
+    
+    Args:
+        derived: 模型配置中的 Derived 配置
+        source_fields: 可引用的字段（Columns 中的 Target 以及前面已声明的派生列）
+    
+    Returns:
+        tuple: (is_valid: bool, error_message: str)
+    """
+    if not isinstance(derived, list):
+        return False, "配置文件中 'Derived' 必须是数组"
+    
+    available = list(source_fields)
+    for item in derived:
+        if not isinstance(item, dict) or 'Target' not in item:
+            return False, "'Derived' 中的每一项都必须包含 'Target'"
+        target = item['Target']
+        
+        if 'Concat' in item:
+            fields = item['Concat']
+            if not isinstance(fields, list) or len(fields) == 0:
+                return False, f"派生列 {target} 的 'Concat' 必须是非空数组"
+        elif 'Condition' in item:
+            error = _validate_condition(item['Condition'])
+            if error:
+                return False, f"派生列 {target} 的条件无效: {error}"
+            fields = _condition_fields(item['Condition'])
+        else:
+            return False, f"派生列 {target} 必须配置 'Concat' 或 'Condition'"
+        
+        missing = [f for f in fields if f not in available]
+        if missing:
+            return False, f"派生列 {target} 引用了不存在的字段: {', '.join(missing)}"
+        
+        index = item.get('Index', False)
+        if isinstance(index, list):
+            missing = [f for f in index if f not in available and f != target]
+            if missing:
+                return False, f"派生列 {target} 的索引引用了不存在的字段: {', '.join(missing)}"
+        
+        available.append(target)
+    
+    return True, ""
+
+
+def _evaluate_condition(df: pd.DataFrame, condition: Dict[str, Any]) -> pd.Series:
+    """向量化计算条件（非数值按不满足处理）"""
+    if 'All' in condition:
+        result = pd.Series(True, index=df.index)
+        for sub in condition['All']:
+            result &= _evaluate_condition(df, sub)
+        return result
+    if 'Any' in condition:
+        result = pd.Series(False, index=df.index)
+        for sub in condition['Any']:
+            result |= _evaluate_condition(df, sub)
+        return result
+    
+    compare, _ = OPERATORS[condition['Op']]
+    values = table_meta.to_numeric(df[condition['Field']])
+    # NaN != v 为真，需要与空值掩码相与（SQL中与NULL比较的结果为NULL）
+    return (compare(values, condition['Value']) & values.notna()).astype(bool)
+
+
+def apply_derived(df: pd.DataFrame, derived: List[Dict[str, Any]]) -> pd.DataFrame:
+    """
+    在DataFrame上计算派生列（向量化，不逐行处理）
+    
+    Returns:
+        追加了派生列的DataFrame
+    """
+    for item in derived:
+        target = item['Target']
+        if 'Concat' in item:
+            separator = item.get('Separator', '-')
+            parts = [df[field] for field in item['Concat']]
+            result = parts[0].astype(str)
+            for part in parts[1:]:
+                result = result + separator + part.astype(str)
+            # 与SQL拼接保持一致：任一部分为空时结果为空
+            has_null = pd.concat([part.isna() for part in parts], axis=1).any(axis=1)
+            df[target] = result.mask(has_null)
+        else:
+            flags = _evaluate_condition(df, item['Condition'])
+            df[target] = flags.map({True: item.get('True', '是'), False: item.get('False', '否')})
+    return df
+
+
+def _quote_literal(value: Any) -> str:
+    """生成SQL字面量"""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return repr(value)
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def _condition_to_sql(condition: Dict[str, Any]) -> str:
+    """将条件编译为SQL表达式（数值按 mh_num 转换，与导入时的计算口径一致；需要先注册 mh_num 函数）"""
+    if 'All' in condition:
+        return "(" + " AND ".join(_condition_to_sql(sub) for sub in condition['All']) + ")"
+    if 'Any' in condition:
+        return "(" + " OR ".join(_condition_to_sql(sub) for sub in condition['Any']) + ")"
+    _, sql_op = OPERATORS[condition['Op']]
+    return f"(mh_num([{condition['Field']}]) {sql_op} {_quote_literal(condition['Value'])})"
+
+
+def to_sql_expression(item: Dict[str, Any]) -> str:
+    """将派生列声明编译为SQL表达式，用于回填已有数据"""
+    if 'Concat' in item:
+        separator = _quote_literal(item.get('Separator', '-'))
+        return f" || {separator} || ".join(f"[{field}]" for field in item['Concat'])
+    return (
+        f"CASE WHEN {_condition_to_sql(item['Condition'])} "
+        f"THEN {_quote_literal(item.get('True', '是'))} ELSE {_quote_literal(item.get('False', '否'))} END"
+    )
+
+
+def index_columns(item: Dict[str, Any]) -> List[str]:
+    """获取派生列声明的索引字段（未声明索引时返回空列表）"""
+    index = item.get('Index', False)
+    if index is True:
+        return [item['Target']]
+    if isinstance(index, list):
+        return index
+    return []
+
+
+def _ensure_backfill_table(conn):
+    """创建回填记录表（如果不存在）"""
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {BACKFILL_TABLE} (
+            table_name TEXT NOT NULL,
+            column_name TEXT NOT NULL,
+            backfilled_at REAL,
+            PRIMARY KEY (table_name, column_name)
+        )
+    """)
+
+
+def _is_backfilled(conn, table_name: str, column_name: str) -> bool:
+    """派生列是否已完成回填"""
+    return conn.execute(
+        f"SELECT 1 FROM {BACKFILL_TABLE} WHERE table_name = ? AND column_name = ?",
+        (table_name, column_name)
+    ).fetchone() is not None
+
+
+def _backfill(conn, table_name: str, item: Dict[str, Any], batch_size: int) -> int:
+    """
+    按rowid范围分批回填尚未计算的行
+    
+    Returns:
+        实际写入了非空值的行数（计算结果仍为空的行不计入）
+    """
+    target = item['Target']
+    bounds = conn.execute(
+        f"SELECT MIN(rowid), MAX(rowid) FROM [{table_name}] WHERE [{target}] IS NULL"
+    ).fetchone()
+    if bounds[0] is None:
+        return 0
+    expression = to_sql_expression(item)
+    updated = 0
+    for start in range(bounds[0], bounds[1] + 1, batch_size):
+        cursor = conn.execute(
+            f"UPDATE [{table_name}] SET [{target}] = {expression} "
+            f"WHERE rowid BETWEEN ? AND ? AND [{target}] IS NULL AND ({expression}) IS NOT NULL",
+            (start, start + batch_size - 1)
+        )
+        updated += cursor.rowcount
+        conn.commit()
+    return updated
+
+
+def ensure_derived_columns(conn, table_name: str, derived: List[Dict[str, Any]], batch_size: int = 20000) -> bool:
+    """
+    确保已存在的表包含派生列：缺失的列先添加，再按rowid分批回填，最后创建索引
+    
+    每个派生列只回填一次，完成后记录在回填记录表中；之后导入的数据在导入时计算派生列。
+    
+    Returns:
+        是否新增了列或实际回填了数据（调用方据此重置表元数据）
+    """
+    existing = [row[1] for row in conn.execute(f"PRAGMA table_info([{table_name}])")]
+    if not existing:
+        return False
+    
+    _ensure_backfill_table(conn)
+    table_meta.register_functions(conn)
+    changed = False
+    for item in derived:
+        target = item['Target']
+        if target not in existing:
+            conn.execute(f"ALTER TABLE [{table_name}] ADD COLUMN [{target}] TEXT")
+            conn.execute(
+                f"DELETE FROM {BACKFILL_TABLE} WHERE table_name = ? AND column_name = ?", (table_name, target)
+            )
+            existing.append(target)
+            conn.commit()
+            changed = True
+        
+        if _is_backfilled(conn, table_name, target):
+            continue
+        if _backfill(conn, table_name, item, batch_size):
+            changed = True
+        conn.execute(
+            f"INSERT OR REPLACE INTO {BACKFILL_TABLE} (table_name, column_name, backfilled_at) "
+            f"VALUES (?, ?, strftime('%s', 'now'))",
+            (table_name, target)
+        )
+        conn.commit()
+    
+    create_indexes(conn, table_name, derived)
+    return changed
+
+
+def create_indexes(conn, table_name: str, derived: List[Dict[str, Any]]):
+    """创建派生列声明的索引"""
+    for item in derived:
+        columns = index_columns(item)
+        if not columns:
+            continue
+        index_name = f"idx_{table_name}_{'_'.join(columns)}"
+        column_list = ", ".join(f"[{column}]" for column in columns)
+        conn.execute(f"CREATE INDEX IF NOT EXISTS [{index_name}] ON [{table_name}] ({column_list})")
+    conn.commit()
@@ -0,0 +1,232 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+后台导出任务模块 - 在后台线程中把表数据导出为文件并缓存
+
+- 导出文件写入导出目录，先写临时文件，完成后原子重命名，不会读到写了一半的文件
+- 任务进度记录在与模型执行任务共用的任务状态字典中
+- 任务ID由 表名、格式、筛选排序条件 和 表的写入代数 计算得出：相同的导出请求
+  复用同一个任务和文件，表数据变化（导入、删除）后写入代数改变，生成新的文件
+- 超过保留时间的导出文件在提交新任务时清理
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+from exporter import iter_csv_chunks, iter_gzip, write_xlsx, write_parquet, require_pyarrow, sheet_count
+
+MEDIA_TYPES = {
+    'csv': "text/csv",
+    'csv.gz': "application/gzip",
+    'xlsx': "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    'parquet': "application/vnd.apache.parquet",
+}
+
+
+class ExportJobs:
+    """后台导出任务管理"""
+    
+    def __init__(self, db, export_dir: Path, task_status: Dict[str, Dict[str, Any]],
+                 keep_seconds: float = 24 * 3600, progress_rows: int = 5000):
+        """
+        初始化导出任务管理
+        
+        Args:
+            db: DatabaseManager 实例
+            export_dir: 导出文件目录
+            task_status: 任务状态字典（与模型执行任务共用）
+            keep_seconds: 导出文件的保留时间（秒）
+            progress_rows: 每写入多少行更新一次进度
+        """
+        self.db = db
+        self.export_dir = Path(export_dir)
+        self.export_dir.mkdir(parents=True, exist_ok=True)
+        self.task_status = task_status
+        self.keep_seconds = keep_seconds
+        self.progress_rows = progress_rows
+        self._lock = threading.Lock()
+    
+    def _paths(self, task_id: str, table_format: str) -> Tuple[Path, Path]:
+        """导出文件和描述文件的路径"""
+        return self.export_dir / f"{task_id}.{table_format}", self.export_dir / f"{task_id}.json"
+    
+    def submit(self, table_name: str, table_format: str, options: Dict[str, Any]) -> Tuple[str, bool]:
+        """
+        提交导出任务（相同请求且表数据未变化时复用已有任务或文件）
+        
+        Args:
+            table_name: 表名
+            table_format: csv、csv.gz、xlsx 或 parquet
+            options: 筛选和排序条件（search_field、search_value、filters、sort_field、sort_order）
+        
+        Returns:
+            (task_id, 是否直接复用了已完成的文件)
+        """
+        if table_format not in MEDIA_TYPES:
+            raise ValueError(f"不支持的导出格式 {table_format}")
+        if table_format == 'parquet':
+            require_pyarrow()
+        if table_name not in self.db.get_tables():
+            raise ValueError(f"表 {table_name} 不存在")
+        
+        generation = self.db.get_generation(table_name)
+        identity = json.dumps(
+            {"table": table_name, "format": table_format, "options": options, "generation": generation},
+            ensure_ascii=False, sort_keys=True
+        )
+        task_id = hashlib.sha1(identity.encode('utf-8')).hexdigest()
+        
+        with self._lock:
+            self.cleanup()
+            if self.restore(task_id):
+                return task_id, True
+            status = self.task_status.get(task_id)
+            if status and status["status"] == "running":
+                return task_id, False
+            
+            self.task_status[task_id] = {
+                "status": "running",
+                "progress": 0,
+                "total": 0,
+                "current": "正在准备导出",
+                "result": None,
+                "error": None,
+                "start_time": time.time()
+            }
+        
+        thread = threading.Thread(
+            target=self._run, args=(task_id, table_name, table_format, options), daemon=True
+        )
+        thread.start()
+        return task_id, False
+    
+    def _run(self, task_id: str, table_name: str, table_format: str, options: Dict[str, Any]):
+        """执行导出：写入临时文件后原子重命名"""
+        status = self.task_status[task_id]
+        path, meta_path = self._paths(task_id, table_format)
+        part_path = path.with_name(path.name + ".part")
+        try:
+            columns, rows, total_count, column_types = self.db.stream_table_rows(
+                table_name, with_types=table_format == 'parquet', **options
+            )
+            status["total"] = total_count
+            if total_count == 0:
+                # 读完空结果，释放读事务
+                next(rows, None)
+                raise ValueError("没有数据可下载")
+            status["current"] = f"正在导出: {table_name}"
+            
+            def counted(source):
+                for index, row in enumerate(source, 1):
+                    yield row
+                    if index % self.progress_rows == 0:
+                        status["progress"] = index
+            
+            if table_format in ('csv', 'csv.gz'):
+                chunks = iter_csv_chunks(columns, counted(rows))
+                if table_format == 'csv.gz':
+                    chunks = iter_gzip(chunks)
+                with open(part_path, 'wb') as f:
+                    for chunk in chunks:
+                        f.write(chunk)
+                row_count = total_count
+            elif table_format == 'parquet':
+                row_count = write_parquet(str(part_path), columns, counted(rows), column_types=column_types)
+            else:
+                row_count = write_xlsx(str(part_path), columns, counted(rows), table_name)
+            os.replace(part_path, path)
+            
+            result = {
+                "table": table_name,
+                "format": table_format,
+                "filename": f"{table_name}_{time.strftime('%Y%m%d_%H%M%S')}.{table_format}",
+                "rows": row_count,
+                "size": path.stat().st_size,
+                "download_url": f"/api/exports/{task_id}/download"
+            }
+            if table_format == 'xlsx':
+                result["sheets"] = sheet_count(row_count)
+            with open(meta_path, 'w', encoding='utf-8') as f:
+                json.dump(result, f, ensure_ascii=False)
+            
+            # 结束状态一次性更新，订阅者不会看到状态已完成但结果、结束时间未更新的中间状态
+            status.update({
+                "result": result,
+                "progress": row_count,
+                "current": "导出完成",
+                "status": "completed",
+                "end_time": time.time()
+            })
+        except Exception as err:
+            if part_path.exists():
+                part_path.unlink()
+            status.update({
+                "status": "failed",
+                "error": str(err),
+                "end_time": time.time()
+            })
+    
+    def restore(self, task_id: str) -> bool:
+        """已完成的导出文件存在时，确保任务状态为已完成（程序重启后从描述文件恢复）"""
+        if not re.fullmatch(r'[0-9a-f]{40}', task_id):
+            return False
+        status = self.task_status.get(task_id)
+        if status and status["status"] == "completed" and status.get("result"):
+            path, _ = self._paths(task_id, status["result"]["format"])
+            if path.exists():
+                return True
+            del self.task_status[task_id]
+            return False
+        
+        meta_path = self.export_dir / f"{task_id}.json"
+        if not meta_path.exists():
+            return False
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                result = json.load(f)
+        except (OSError, ValueError):
+            return False
+        path, _ = self._paths(task_id, result.get("format", ""))
+        if not path.exists():
+            return False
+        
+        created = meta_path.stat().st_mtime
+        self.task_status[task_id] = {
+            "status": "completed",
+            "progress": result["rows"],
+            "total": result["rows"],
+            "current": "导出完成",
+            "result": result,
+            "error": None,
+            "start_time": created,
+            "end_time": created
+        }
+        return True
+    
+    def artifact(self, task_id: str) -> Optional[Tuple[Path, Dict[str, Any]]]:
+        """获取已完成任务的导出文件路径和描述（未完成或不存在时返回None）"""
+        if not self.restore(task_id):
+            return None
+        result = self.task_status[task_id]["result"]
+        path, _ = self._paths(task_id, result["format"])
+        return path, result
+    
+    def cleanup(self):
+        """删除超过保留时间的导出文件（正在写入的临时文件除外）"""
+        cutoff = time.time() - self.keep_seconds
+        for path in self.export_dir.iterdir():
+            task_id = path.name.split('.', 1)[0]
+            status = self.task_status.get(task_id)
+            if status and status["status"] == "running":
+                continue
+            try:
+                if path.stat().st_mtime < cutoff or path.name.endswith('.part'):
+                    path.unlink()
+                    if status and status["status"] == "completed":
+                        del self.task_status[task_id]
+            except OSError:
+                pass
@@ -0,0 +1,306 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+导出模块 - 从游标流式生成CSV、Excel、Parquet文件和Arrow IPC流
+
+- CSV：逐批编码为字节块，直接作为流式响应输出；csv.gz 在同一流式路径上逐块压缩
+- Excel：使用openpyxl只写模式（write_only）逐行写入，内存占用与数据量无关；
+  超过单个工作表的行数上限（1,048,576行，含表头）时自动写入新的工作表
+- Parquet：按批次转换为Arrow记录批写入（需要安装可选依赖 pyarrow）；列类型按导出结果集中
+  实际出现的存储类型确定，值不会因类型不符被写为空
+- Arrow IPC：同样的记录批按流格式逐批输出字节块，供分析脚本批量读取
+"""
+import csv
+import io
+import math
+import re
+import zlib
+from typing import Iterable, List, Optional
+from openpyxl import Workbook
+from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+# Excel单个工作表的最大行数（含表头）
+EXCEL_MAX_ROWS = 1048576
+# Excel工作表名称的最大长度
+SHEET_NAME_MAX_LENGTH = 31
+
+
+def safe_sheet_name(name: str) -> str:
+    """移除工作表名称中不允许的字符，并限制长度"""
+    name = re.sub(r'[\\/*?:\[\]]', '_', name).strip("'") or "Sheet"
+    return name[:SHEET_NAME_MAX_LENGTH]
+
+
+def sheet_count(row_count: int, max_rows_per_sheet: int = EXCEL_MAX_ROWS) -> int:
+    """写入指定行数的数据需要的工作表数"""
+    return max(1, math.ceil(row_count / (max_rows_per_sheet - 1)))
+
+
+def iter_csv_chunks(columns: List[str], rows: Iterable, first_row=None, rows_per_chunk: int = 1000):
+    """
+    逐批把行编码为CSV字节块（UTF-8带BOM，便于Excel识别中文）
+    
+    Args:
+        columns: 表头
+        rows: 行迭代器（元组）
+        first_row: 调用方已预读的第一行
+        rows_per_chunk: 每个字节块包含的行数
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    writer.writerow(columns)
+    if first_row is not None:
+        writer.writerow(first_row)
+    yield buffer.getvalue().encode('utf-8-sig')
+    
+    count = 0
+    buffer.seek(0)
+    buffer.truncate()
+    for row in rows:
+        writer.writerow(row)
+        count += 1
+        if count >= rows_per_chunk:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+            count = 0
+    if count:
+        yield buffer.getvalue().encode('utf-8')
+
+
+def _clean(value):
+    """移除字符串中Excel不允许的控制字符"""
+    if isinstance(value, str):
+        return ILLEGAL_CHARACTERS_RE.sub('', value)
+    return value
+
+
+def write_xlsx(target, columns: List[str], rows: Iterable, sheet_name: str = "Sheet",
+               first_row=None, max_rows_per_sheet: int = EXCEL_MAX_ROWS) -> int:
+    """
+    以只写模式把行写入Excel文件，超过工作表行数上限时自动分页
+    
+    分页的工作表依次命名为 名称、名称_2、名称_3 ...
+    
+    Args:
+        target: 文件路径或可写的二进制文件对象
+        columns: 表头
+        rows: 行迭代器（元组）
+        sheet_name: 工作表名称
+        first_row: 调用方已预读的第一行
+        max_rows_per_sheet: 每个工作表的最大行数（含表头）
+    
+    Returns:
+        写入的数据行数
+    """
+    base_name = safe_sheet_name(sheet_name)
+    workbook = Workbook(write_only=True)
+    
+    def new_sheet(number: int):
+        if number == 1:
+            title = base_name
+        else:
+            suffix = f"_{number}"
+            title = base_name[:SHEET_NAME_MAX_LENGTH - len(suffix)] + suffix
+        sheet = workbook.create_sheet(title=title)
+        sheet.append(list(columns))
+        return sheet
+    
+    sheets = 1
+    sheet = new_sheet(sheets)
+    sheet_rows = 1
+    total = 0
+    
+    def all_rows():
+        if first_row is not None:
+            yield first_row
+        yield from rows
+    
+    for row in all_rows():
+        if sheet_rows >= max_rows_per_sheet:
+            sheets += 1
+            sheet = new_sheet(sheets)
+            sheet_rows = 1
+        sheet.append([_clean(value) for value in row])
+        sheet_rows += 1
+        total += 1
+    
+    workbook.save(target)
+    return total
+
+
+def iter_gzip(chunks: Iterable[bytes], level: int = 6):
+    """逐块gzip压缩字节流（不缓冲完整数据）"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def require_pyarrow():
+    """
+    检查可选依赖 pyarrow
+    
+    Raises:
+        ValueError: 未安装 pyarrow
+    """
+    if pa is None:
+        raise ValueError("Parquet/Arrow 格式需要安装 pyarrow（pip install pyarrow）")
+
+
+def arrow_type_for(storage_types):
+    """
+    按列中出现的SQLite存储类型（typeof）确定Arrow类型，保证每个值都能无损写入
+    
+    只有整数为int64，整数和浮点数为float64，只有二进制为binary，其余为字符串；
+    超过float64精度的整数记为 bigint，与浮点数同列时写为字符串
+    """
+    present = set(storage_types) - {'null'}
+    if present and present <= {'integer', 'bigint'}:
+        return pa.int64()
+    if present and present <= {'integer', 'real'}:
+        return pa.float64()
+    if present == {'blob'}:
+        return pa.binary()
+    return pa.string()
+
+
+def _infer_arrow_type(values: List):
+    """按首批数据推断列类型：全为整数为int64，全为数值为float64，其余为字符串"""
+    present = [value for value in values if value is not None]
+    if present and all(isinstance(value, int) for value in present):
+        return pa.int64()
+    if present and all(isinstance(value, (int, float)) for value in present):
+        return pa.float64()
+    return pa.string()
+
+
+def _to_arrow_value(value, field):
+    """
+    把值转换为列类型
+    
+    Raises:
+        ValueError: 值无法无损转换为列类型（不会写为空值）
+    """
+    if value is None:
+        return None
+    arrow_type = field.type
+    if arrow_type == pa.string():
+        return value if isinstance(value, str) else str(value)
+    if arrow_type == pa.binary():
+        if isinstance(value, bytes):
+            return value
+    elif isinstance(value, (int, float)):
+        if arrow_type == pa.int64():
+            if isinstance(value, int) or value.is_integer():
+                return int(value)
+        elif isinstance(value, float) or float(value) == value:
+            # 超过float64精度的整数不能无损转换
+            return float(value)
+    raise ValueError(f"列 {field.name} 的值 {value!r} 无法写入 {arrow_type} 类型")
+
+
+def iter_record_batches(columns: List[str], rows: Iterable, first_row=None, batch_size: int = 50000,
+                        column_types: Optional[List] = None):
+    """
+    逐批把行转换为Arrow记录批
+    
+    Args:
+        column_types: 各列的SQLite存储类型集合（见 arrow_type_for），由导出的结果集统计得到；
+            未提供时按首批数据推断，之后出现无法转换的值时抛出 ValueError
+    
+    Yields:
+        pyarrow.RecordBatch
+    """
+    require_pyarrow()
+    
+    def all_rows():
+        if first_row is not None:
+            yield first_row
+        yield from rows
+    
+    schema = None
+    if column_types is not None:
+        schema = pa.schema([
+            pa.field(name, arrow_type_for(storage_types))
+            for name, storage_types in zip(columns, column_types)
+        ])
+    batch = []
+    source = all_rows()
+    first = True
+    while True:
+        batch.clear()
+        for row in source:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                break
+        if not batch and not first:
+            break
+        first = False
+        
+        values_by_column = list(zip(*batch)) if batch else [() for _ in columns]
+        if schema is None:
+            schema = pa.schema([
+                pa.field(name, _infer_arrow_type(list(values)))
+                for name, values in zip(columns, values_by_column)
+            ])
+        arrays = [
+            pa.array([_to_arrow_value(value, field) for value in values], type=field.type)
+            for field, values in zip(schema, values_by_column)
+        ]
+        yield pa.RecordBatch.from_arrays(arrays, schema=schema)
+        if len(batch) < batch_size:
+            break
+
+
+def write_parquet(target, columns: List[str], rows: Iterable, first_row=None, batch_size: int = 50000,
+                  column_types: Optional[List] = None) -> int:
+    """
+    按批次写入Parquet文件（每批一个行组，内存占用与批大小成正比，列类型见 iter_record_batches）
+    
+    Returns:
+        写入的数据行数
+    """
+    total = 0
+    writer = None
+    try:
+        for record_batch in iter_record_batches(columns, rows, first_row, batch_size, column_types):
+            if writer is None:
+                writer = pq.ParquetWriter(target, record_batch.schema, compression='zstd')
+            writer.write_batch(record_batch)
+            total += record_batch.num_rows
+    finally:
+        if writer is not None:
+            writer.close()
+    return total
+
+
+def iter_arrow_stream(columns: List[str], rows: Iterable, first_row=None, batch_size: int = 50000,
+                      column_types: Optional[List] = None):
+    """
+    逐批输出Arrow IPC流格式的字节块（每个记录批输出一次，不缓冲完整数据，列类型见 iter_record_batches）
+    
+    Yields:
+        bytes
+    """
+    sink = io.BytesIO()
+    writer = None
+    for record_batch in iter_record_batches(columns, rows, first_row, batch_size, column_types):
+        if writer is None:
+            writer = pa.ipc.new_stream(sink, record_batch.schema)
+        writer.write_batch(record_batch)
+        yield sink.getvalue()
+        sink.seek(0)
+        sink.truncate()
+    if writer is not None:
+        writer.close()
+        yield sink.getvalue()
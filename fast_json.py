@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+JSON序列化模块 - 大结果集使用的快速JSON编码
+
+- 安装了 orjson 时使用 orjson 编码（元组直接编码为数组，不经过 jsonable_encoder）
+- 未安装时回退到标准库 json（紧凑分隔符、不转义中文）
+- 无法直接编码的值（如BLOB字段的bytes）转为字符串
+"""
+import json
+from typing import Any
+from fastapi import Response
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _default(value):
+    """无法直接编码的值转为字符串"""
+    if isinstance(value, bytes):
+        return value.decode('utf-8', errors='replace')
+    return str(value)
+
+
+def dumps(content: Any) -> bytes:
+    """编码为UTF-8 JSON字节串"""
+    if orjson is not None:
+        return orjson.dumps(content, default=_default)
+    return json.dumps(
+        content, ensure_ascii=False, separators=(',', ':'), default=_default
+    ).encode('utf-8')
+
+
+class FastJSONResponse(JSONResponse):
+    """使用快速编码的JSON响应"""
+    
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def fast_json_response(content: Any, response: Response = None) -> FastJSONResponse:
+    """
+    直接返回快速编码的JSON响应
+    
+    Args:
+        content: 响应内容
+        response: 路由注入的 Response（复制其中已设置的响应头，如 ETag）
+    """
+    headers = None
+    if response is not None:
+        headers = {key: value for key, value in response.headers.items() if key != "content-length"}
+    return FastJSONResponse(content, headers=headers)
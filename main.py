@@ -1,24 +1,38 @@
 # noinspection PyUnresolvedReferences,PyBroadException
-from fastapi import FastAPI, HTTPException, Query, UploadFile, File
+from fastapi import FastAPI, HTTPException, Query, UploadFile, File, Request, Response
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse, StreamingResponse
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import ClientDisconnect
 from starlette.middleware.base import BaseHTTPMiddleware
 from typing import Optional, List
 from contextlib import asynccontextmanager
 from database import DatabaseManager
-from data_processor import process_config, validate_config
+from data_processor import process_config, validate_config, prepare_config, config_table
 from config_manager import ConfigManager
+from maintenance import MaintenanceWorker
 from resource_extractor import extract_resources
+from compression import CompressionMiddleware
+from static_assets import StaticAssets
+from fast_json import fast_json_response
+from task_events import TaskStore
+from exporter import (iter_csv_chunks, iter_gzip, iter_arrow_stream, write_xlsx, write_parquet,
+                      require_pyarrow, sheet_count)
+from export_jobs import ExportJobs, MEDIA_TYPES
+from uploads import Uploads, UploadConflict
 from updater import Updater
 from pathlib import Path
 from urllib.parse import quote
+import asyncio
+import hashlib
 import json
+import os
 import re
 import threading
 import time
 import uuid
-import pandas as pd
-import io
+import tempfile
 import uvicorn
 import webbrowser
 import sys
@@ -223,8 +237,12 @@ DB_PATH = config.get_db_file_path()
 SERVER_PORT = config.get_port()
 LOG_LEVEL = config.get_log_level()
 
-# 任务状态存储
-task_status = {}
+# 任务状态存储（状态变化时唤醒SSE订阅者）
+task_status = TaskStore()
+
+# SSE心跳间隔（秒），以及两次进度推送之间的最小间隔（秒），合并高频更新
+TASK_EVENT_HEARTBEAT = 15
+TASK_EVENT_MIN_INTERVAL = 0.2
 
 @asynccontextmanager
 async def lifespan(_app: FastAPI):
@@ -241,34 +259,135 @@ async def lifespan(_app: FastAPI):
     thread.daemon = True
     thread.start()
     
+    # 启动后台维护（先按模型配置升级已有表，再执行保留策略清理 + 增量回收）
+    maintenance_worker.start()
+    
     yield  # 应用运行期间
     
-    # 关闭时执行（如果需要清理资源，可以在这里添加）
+    # 关闭时执行
+    maintenance_worker.stop()
+
+def prepare_tables():
+    """按模型配置升级已有表（补充派生列并回填历史数据），在后台维护线程中执行，避免阻塞启动"""
+    for model_path in sorted(Path(MODELS_PATH).glob("*.json")):
+        try:
+            if prepare_config(str(model_path), str(DB_PATH)):
+                print(f"模型 {model_path.name} 的派生列已回填")
+        except Exception as e:
+            print(f"警告: 模型 {model_path.name} 派生列回填失败: {e}")
 
 app = FastAPI(title="MetricHandel API", version="1.0.0", lifespan=lifespan)
-db = DatabaseManager(db_path=str(DB_PATH))
+db = DatabaseManager(
+    db_path=str(DB_PATH),
+    cache_max_bytes=config.get_cache_max_bytes(),
+    cache_ttl=config.get_cache_ttl()
+)
+maintenance_worker = MaintenanceWorker(
+    db,
+    retention=config.get_retention(),
+    interval_minutes=config.get_maintenance_interval(),
+    batch_size=config.get_delete_batch_size(),
+    vacuum_pages=config.get_vacuum_pages(),
+    convert_vacuum=config.get_convert_incremental_vacuum(),
+    prepare=prepare_tables
+)
+# 后台导出任务（与模型执行任务共用任务状态）
+export_jobs = ExportJobs(
+    db,
+    export_dir=config.get_exports_path(),
+    task_status=task_status,
+    keep_seconds=config.get_export_keep_seconds()
+)
+# 上传文件管理（分块写入磁盘，支持断点续传）
+uploads = Uploads(DATA_PATH)
+# 一次性上传时每次读取的字节数
+UPLOAD_CHUNK_SIZE = 1024 * 1024
 
-# 中间件：为静态文件添加禁用缓存响应头（开发环境）
+# 禁用缓存的响应头（首页不缓存，保证总是引用最新的带哈希资源地址）
+NO_STORE_HEADERS = {
+    "Cache-Control": "no-cache, no-store, must-revalidate",
+    "Pragma": "no-cache",
+    "Expires": "0"
+}
+
+# 中间件：/static 下不带哈希的地址每次使用前向服务器验证（文件未修改时返回304），首页不缓存
 class NoCacheMiddleware(BaseHTTPMiddleware):
     async def dispatch(self, request, call_next):
         response = await call_next(request)
-        # 如果是静态文件请求，添加禁用缓存头
-        if request.url.path.startswith("/static/"):
-            response.headers["Cache-Control"] = "no-cache, no-store, must-revalidate"
-            response.headers["Pragma"] = "no-cache"
-            response.headers["Expires"] = "0"
+        if request.url.path == "/static/index.html":
+            response.headers.update(NO_STORE_HEADERS)
+        elif request.url.path.startswith("/static/"):
+            response.headers["Cache-Control"] = "no-cache"
         return response
 
 app.add_middleware(NoCacheMiddleware)
+# 响应压缩（brotli/gzip），放在最外层，压缩所有路由和中间件的输出
+app.add_middleware(CompressionMiddleware, minimum_size=config.get_compress_min_size())
+
+
+def check_not_modified(request: Request, response: Response, version) -> Optional[Response]:
+    """
+    为数据接口设置ETag，浏览器缓存仍然有效时返回304响应
+    
+    ETag 由请求路径、查询参数和数据版本（表的写入代数或脚本版本）计算，
+    数据导入或删除后写入代数变化，ETag 随之变化。
+    
+    Returns:
+        If-None-Match 与ETag匹配时返回304响应，否则返回None（调用方继续生成数据）
+    """
+    identity = json.dumps({
+        "path": request.url.path,
+        "query": sorted(request.query_params.multi_items()),
+        "version": version
+    }, ensure_ascii=False, sort_keys=True, default=str)
+    digest = hashlib.sha1(identity.encode('utf-8')).hexdigest()
+    etag = f'W/"{digest}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    
+    # 弱比较：忽略 W/ 前缀
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        if "*" in candidates or etag.removeprefix("W/") in candidates:
+            return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
 
 # 静态文件服务
 app.mount("/static", StaticFiles(directory=str(STATIC_PATH)), name="static")
+# 带内容哈希的静态资源（首页中的资源地址改写为 /assets/...）
+static_assets = StaticAssets(STATIC_PATH)
 
 @app.get("/")
 async def read_root():
-    """返回主页"""
-    index_path = STATIC_PATH / "index.html"
-    return FileResponse(str(index_path))
+    """返回主页（资源地址改写为带哈希的地址，主页本身不缓存）"""
+    content = static_assets.index()
+    if content is None:
+        raise HTTPException(status_code=404, detail="主页文件不存在")
+    return Response(content, media_type="text/html; charset=utf-8", headers=NO_STORE_HEADERS)
+
+@app.get("/assets/{asset_name:path}")
+async def get_asset(asset_name: str, request: Request):
+    """返回带哈希的静态资源（长期缓存；浏览器支持时返回预压缩版本）"""
+    found = static_assets.lookup(asset_name, request.headers.get("accept-encoding", ""))
+    if found is None:
+        raise HTTPException(status_code=404, detail="资源不存在")
+    
+    asset, encoding = found
+    etag = asset.etag(encoding)
+    headers = {
+        "Cache-Control": "public, max-age=31536000, immutable",
+        "ETag": etag,
+        "Vary": "Accept-Encoding"
+    }
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    if encoding is None:
+        return Response(asset.content, media_type=asset.media_type, headers=headers)
+    
+    headers["Content-Encoding"] = encoding
+    content = await run_in_threadpool(asset.encoded, encoding)
+    return Response(content, media_type=asset.media_type, headers=headers)
 
 @app.get("/.well-known/appspecific/com.chrome.devtools.json")
 async def chrome_devtools_config():
@@ -276,7 +395,7 @@ async def chrome_devtools_config():
     return {"status": "ok"}
 
 @app.get("/api/tables")
-async def get_tables():
+def get_tables():
     """获取所有表名"""
     try:
         tables = db.get_tables()
@@ -285,7 +404,7 @@ async def get_tables():
         raise HTTPException(status_code=500, detail=str(err))
 
 @app.get("/api/tables/{table_name}/columns")
-async def get_table_columns(table_name: str):
+def get_table_columns(table_name: str):
     """获取表的列名"""
     try:
         columns = db.get_table_columns(table_name)
@@ -294,18 +413,25 @@ async def get_table_columns(table_name: str):
         raise HTTPException(status_code=500, detail=str(err))
 
 @app.get("/api/tables/{table_name}/data")
-async def get_table_data(
+def get_table_data(
     table_name: str,
+    request: Request,
+    response: Response,
     page: int = Query(1, ge=1),
     page_size: int = Query(50, ge=1, le=1000),
     search_field: Optional[str] = None,
     search_value: Optional[str] = None,
     filters: Optional[str] = Query(None, description="JSON格式的多字段筛选条件"),
     sort_field: Optional[str] = None,
-    sort_order: Optional[str] = Query(None, pattern="^(asc|desc|ASC|DESC)$")
+    sort_order: Optional[str] = Query(None, pattern="^(asc|desc|ASC|DESC)$"),
+    compact: bool = Query(False, description="紧凑格式：columns 加值数组 rows，不在每行中重复列名")
 ):
-    """获取表数据（分页），支持多字段筛选和排序"""
+    """获取表数据（分页），支持多字段筛选和排序（数据未变化时返回304）"""
     try:
+        not_modified = check_not_modified(request, response, db.get_generation(table_name))
+        if not_modified:
+            return not_modified
+        
         # 解析filters JSON字符串
         filters_dict = None
         if filters:
@@ -317,25 +443,114 @@ async def get_table_data(
         result = db.get_table_data(
             table_name, page, page_size, 
             search_field, search_value,
-            filters_dict, sort_field, sort_order
+            filters_dict, sort_field, sort_order,
+            compact=compact
         )
-        return result
+        # 紧凑格式直接快速编码（行为元组，不经过逐值转换）
+        return fast_json_response(result, response) if compact else result
+    except Exception as err:
+        raise HTTPException(status_code=500, detail=str(err))
+
+@app.get("/api/tables/{table_name}/facets/{column}")
+def get_column_facets(
+    table_name: str,
+    column: str,
+    request: Request,
+    response: Response,
+    limit: int = Query(20, ge=1, le=200),
+    search_field: Optional[str] = None,
+    search_value: Optional[str] = None,
+    filters: Optional[str] = Query(None, description="JSON格式的多字段筛选条件")
+):
+    """获取列的高频取值及计数（当前筛选条件下），用于筛选下拉（同步路由，首次构建草图时不阻塞其他请求）"""
+    try:
+        not_modified = check_not_modified(request, response, db.get_generation(table_name))
+        if not_modified:
+            return not_modified
+        
+        filters_dict = None
+        if filters:
+            try:
+                filters_dict = json.loads(filters)
+            except json.JSONDecodeError:
+                filters_dict = None
+        
+        return db.get_facets(table_name, column, limit, search_field, search_value, filters_dict)
+    except ValueError as err:
+        raise HTTPException(status_code=400, detail=str(err))
+    except Exception as err:
+        raise HTTPException(status_code=500, detail=str(err))
+
+@app.get("/api/tables/{table_name}/stats")
+def get_table_stats(table_name: str, request: Request, response: Response):
+    """获取表的列统计信息（行数、空值数、最小/最大/平均值；同步路由，在线程池中执行）"""
+    try:
+        not_modified = check_not_modified(request, response, db.get_generation(table_name))
+        if not_modified:
+            return not_modified
+        
+        return db.get_column_stats(table_name)
+    except ValueError as err:
+        raise HTTPException(status_code=404, detail=str(err))
+    except Exception as err:
+        raise HTTPException(status_code=500, detail=str(err))
+
+@app.get("/api/tables/{table_name}/timeseries")
+def get_table_timeseries(
+    table_name: str,
+    request: Request,
+    response: Response,
+    cgi: str = Query(..., description="小区CGI"),
+    start_time: str = Query(..., description="开始时间（包含）"),
+    end_time: str = Query(..., description="结束时间（不包含）"),
+    resolution: str = Query("1h", description="时间粒度，如 15m、1h、1d")
+):
+    """获取单个小区的指标趋势（小时/天粒度从汇总表读取）"""
+    try:
+        not_modified = check_not_modified(request, response, db.get_generation(table_name))
+        if not_modified:
+            return not_modified
+        
+        return db.get_timeseries(table_name, cgi, start_time, end_time, resolution)
+    except ValueError as err:
+        raise HTTPException(status_code=400, detail=str(err))
     except Exception as err:
         raise HTTPException(status_code=500, detail=str(err))
 
 @app.delete("/api/tables/{table_name}/data")
-async def clear_table_data(table_name: str):
-    """清空表数据"""
+def clear_table_data(table_name: str):
+    """清空表数据（同步路由，在线程池中执行，不阻塞其他请求）"""
     try:
         affected_rows = db.clear_table(table_name)
         return {"message": f"已清空表 {table_name}", "affected_rows": affected_rows}
     except Exception as err:
         raise HTTPException(status_code=500, detail=str(err))
 
+@app.delete("/api/tables/{table_name}/data/range")
+def delete_table_data_range(
+    table_name: str,
+    start_time: Optional[str] = Query(None, description="开始时间（包含）"),
+    end_time: Optional[str] = Query(None, description="结束时间（不包含）"),
+    time_field: str = Query("开始时间", description="时间字段"),
+    batch_size: int = Query(5000, ge=100, le=100000)
+):
+    """按时间范围分批删除表数据（同步路由，在线程池中执行，不阻塞其他请求）"""
+    try:
+        affected_rows = db.delete_range(table_name, start_time, end_time, time_field, batch_size)
+        return {"message": f"已删除表 {table_name} 中 {affected_rows} 条数据", "affected_rows": affected_rows}
+    except ValueError as err:
+        raise HTTPException(status_code=400, detail=str(err))
+    except Exception as err:
+        raise HTTPException(status_code=500, detail=str(err))
+
 @app.get("/api/tables/{table_name}/count")
-async def get_table_count(table_name: str):
+def get_table_count(table_name: str, request: Request, response: Response):
     """获取表记录数"""
     try:
+        not_modified = check_not_modified(request, response, db.get_generation(table_name))
+        if not_modified:
+            return not_modified
+        
         count = db.get_table_count(table_name)
         return {"table": table_name, "count": count}
     except Exception as err:
@@ -364,38 +579,46 @@ async def get_models():
         raise HTTPException(status_code=500, detail=str(err))
 
 def execute_models_task(task_id: str, model_paths: List[str], db_path: str):
-    """后台执行模型配置的任务"""
+    """后台执行模型配置的任务（任务状态在启动线程前已初始化）"""
     try:
-        task_status[task_id] = {
-            "status": "running",
-            "progress": 0,
-            "total": len(model_paths),
-            "current": "",
-            "results": {},
-            "error": None,
-            "start_time": time.time()
-        }
-        
         results = {}
         for i, model_path in enumerate(model_paths):
             task_status[task_id]["current"] = f"正在处理: {Path(model_path).name}"
             task_status[task_id]["progress"] = i
             
+            def on_progress(message: str, name: str = Path(model_path).name):
+                task_status[task_id]["current"] = f"正在处理: {name}，{message}"
+            
             # 处理单个配置文件，传入数据库路径
-            result = process_config(model_path, db_path)
+            table_name = config_table(model_path)
+            try:
+                result = process_config(model_path, db_path, on_progress=on_progress)
+            except Exception:
+                # 中途失败时数据可能已经写入
+                db.invalidate_results(table_name)
+                raise
             results[model_path] = result
             
+            # 导入了新数据，只使依赖该表的脚本结果缓存失效
+            if result:
+                db.invalidate_results(table_name)
+            
             task_status[task_id]["results"] = results
         
-        task_status[task_id]["status"] = "completed"
-        task_status[task_id]["progress"] = len(model_paths)
-        task_status[task_id]["current"] = "执行完成"
-        task_status[task_id]["end_time"] = time.time()
-        
+        # 结束状态一次性更新，订阅者不会看到状态已完成但进度、结束时间未更新的中间状态
+        task_status[task_id].update({
+            "status": "completed",
+            "progress": len(model_paths),
+            "current": "执行完成",
+            "end_time": time.time()
+        })
+    
     except Exception as err:
-        task_status[task_id]["status"] = "failed"
-        task_status[task_id]["error"] = str(err)
-        task_status[task_id]["end_time"] = time.time()
+        task_status[task_id].update({
+            "status": "failed",
+            "error": str(err),
+            "end_time": time.time()
+        })
 
 @app.post("/api/models/execute")
 async def execute_models(model_paths: List[str]):
@@ -422,6 +645,17 @@ async def execute_models(model_paths: List[str]):
         # 所有验证通过，启动任务
         task_id = str(uuid.uuid4())
         
+        # 启动线程前初始化任务状态，返回 task_id 后立即订阅进度也能找到任务
+        task_status[task_id] = {
+            "status": "running",
+            "progress": 0,
+            "total": len(model_paths),
+            "current": "",
+            "results": {},
+            "error": None,
+            "start_time": time.time()
+        }
+        
         # 在后台线程中执行任务，传入数据库路径
         thread = threading.Thread(target=execute_models_task, args=(task_id, model_paths, str(DB_PATH)))
         thread.daemon = True
@@ -433,13 +667,12 @@ async def execute_models(model_paths: List[str]):
     except Exception as err:
         raise HTTPException(status_code=500, detail=str(err))
 
-@app.get("/api/models/execute/{task_id}")
-async def get_task_status(task_id: str):
-    """获取任务执行状态"""
-    if task_id not in task_status:
-        raise HTTPException(status_code=404, detail="任务不存在")
-    
-    status = task_status[task_id].copy()
+def task_snapshot(task_id: str) -> Optional[dict]:
+    """任务状态的副本（含执行时间），任务不存在时返回None"""
+    state = task_status.get(task_id)
+    if state is None:
+        return None
+    status = state.copy()
     
     # 计算执行时间
     if "start_time" in status:
@@ -450,20 +683,187 @@ async def get_task_status(task_id: str):
     
     return status
 
+@app.get("/api/models/execute/{task_id}")
+async def get_task_status(task_id: str):
+    """获取任务执行状态"""
+    status = task_snapshot(task_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    return status
+
+@app.get("/api/tasks/{task_id}/events")
+async def task_events(task_id: str):
+    """
+    以SSE推送任务进度（模型执行和后台导出任务通用）
+    
+    状态变化时推送任务状态（与状态查询接口相同），任务结束后推送最终状态并关闭连接；
+    没有变化时定期发送心跳。浏览器不支持SSE时使用状态查询接口轮询。
+    """
+    export_jobs.restore(task_id)
+    if task_id not in task_status:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    
+    async def generate():
+        yield "retry: 3000\n\n"
+        seen = None
+        while True:
+            version = task_status.version(task_id)
+            if version != seen:
+                seen = version
+                status = task_snapshot(task_id)
+                if status is None:
+                    return
+                yield f"data: {json.dumps(status, ensure_ascii=False, default=str)}\n\n"
+                if status["status"] != "running":
+                    return
+                await asyncio.sleep(TASK_EVENT_MIN_INTERVAL)
+                continue
+            if await task_status.wait(task_id, seen, TASK_EVENT_HEARTBEAT) == seen:
+                yield ": keep-alive\n\n"
+    
+    return StreamingResponse(
+        generate(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+def csv_response(columns: List[str], rows, first_row, filename: str, compress: bool = False,
+                 headers: Optional[dict] = None) -> StreamingResponse:
+    """
+    流式输出CSV（compress 为 True 时输出 csv.gz，在同一流式路径上逐块压缩，不额外缓冲）
+    """
+    chunks = iter_csv_chunks(columns, rows, first_row)
+    if compress:
+        chunks = iter_gzip(chunks)
+    # 使用URL编码处理中文文件名
+    filename_encoded = quote(filename.encode('utf-8'))
+    return StreamingResponse(
+        chunks,
+        media_type=MEDIA_TYPES['csv.gz' if compress else 'csv'],
+        headers={
+            "Content-Disposition": f"attachment; filename*=UTF-8''{filename_encoded}",
+            **(headers or {})
+        }
+    )
+
+
+async def temp_file_response(write, suffix: str, media_type: str, filename: str, headers_for=None) -> FileResponse:
+    """
+    在线程池中调用 write(path) 生成临时文件，发送完成后删除
+    
+    Args:
+        write: 写入函数，返回写入的数据行数
+        headers_for: 根据写入行数生成附加响应头的函数
+    """
+    fd, path = tempfile.mkstemp(suffix=suffix)
+    os.close(fd)
+    try:
+        row_count = await run_in_threadpool(write, path)
+    except Exception:
+        os.remove(path)
+        raise
+    
+    # 使用URL编码处理中文文件名
+    filename_encoded = quote(filename.encode('utf-8'))
+    return FileResponse(
+        path,
+        media_type=media_type,
+        headers={
+            "Content-Disposition": f"attachment; filename*=UTF-8''{filename_encoded}",
+            "X-Total-Count": str(row_count),
+            **(headers_for(row_count) if headers_for else {})
+        },
+        background=BackgroundTask(os.remove, path)
+    )
+
+
+async def xlsx_response(columns: List[str], rows, first_row, sheet_name: str, filename: str) -> FileResponse:
+    """
+    以只写模式生成临时Excel文件
+    
+    响应头 X-Total-Count 为写入的数据行数，X-Sheet-Count 为工作表数（超过单表行数上限时自动分页）
+    """
+    return await temp_file_response(
+        lambda path: write_xlsx(path, columns, rows, sheet_name, first_row),
+        '.xlsx', MEDIA_TYPES['xlsx'], filename,
+        lambda row_count: {"X-Sheet-Count": str(sheet_count(row_count))}
+    )
+
+
+async def parquet_response(columns: List[str], rows, first_row, filename: str,
+                           column_types: Optional[List] = None) -> FileResponse:
+    """按批次生成临时Parquet文件（需要安装 pyarrow，column_types 为各列存储类型集合）"""
+    return await temp_file_response(
+        lambda path: write_parquet(path, columns, rows, first_row, column_types=column_types),
+        '.parquet', MEDIA_TYPES['parquet'], filename
+    )
+
+
+def iter_file_range(path: Path, start: int, length: int, chunk_size: int = 256 * 1024):
+    """按字节范围读取文件"""
+    with open(path, 'rb') as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(chunk_size, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def ranged_file_response(request: Request, path: Path, media_type: str, filename: str):
+    """
+    发送文件，支持单个 Range 请求（断点续传）
+    
+    If-Range 与文件的 ETag 不一致时（文件已重新生成）返回完整文件。
+    """
+    stat = path.stat()
+    size = stat.st_size
+    etag = f'"{stat.st_mtime_ns:x}-{size:x}"'
+    filename_encoded = quote(filename.encode('utf-8'))
+    headers = {
+        "Accept-Ranges": "bytes",
+        "ETag": etag,
+        "Content-Disposition": f"attachment; filename*=UTF-8''{filename_encoded}"
+    }
+    
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    match = re.fullmatch(r"\s*bytes=(\d*)-(\d*)\s*", range_header or "")
+    if match and (match.group(1) or match.group(2)) and (not if_range or if_range == etag):
+        if match.group(1):
+            start = int(match.group(1))
+            end = min(int(match.group(2)), size - 1) if match.group(2) else size - 1
+        else:
+            start = max(0, size - int(match.group(2)))
+            end = size - 1
+        if start >= size or start > end:
+            raise HTTPException(status_code=416, detail="请求的范围无效",
+                                headers={"Content-Range": f"bytes */{size}"})
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+        headers["Content-Length"] = str(end - start + 1)
+        return StreamingResponse(iter_file_range(path, start, end - start + 1),
+                                 status_code=206, media_type=media_type, headers=headers)
+    
+    return FileResponse(path, media_type=media_type, headers=headers)
+
 
-# noinspection PyTypeChecker
 @app.get("/api/tables/{table_name}/download")
 async def download_table_data(
     table_name: str,
-    table_format: str = Query(..., pattern="^(csv|xlsx)$"),
+    table_format: str = Query(..., pattern=r"^(csv|csv\.gz|xlsx|parquet)$"),
     search_field: Optional[str] = None,
     search_value: Optional[str] = None,
     filters: Optional[str] = Query(None, description="JSON格式的多字段筛选条件"),
     sort_field: Optional[str] = None,
     sort_order: Optional[str] = Query(None, pattern="^(asc|desc|ASC|DESC)$")
 ):
-    """下载表数据为CSV或Excel格式，支持多字段筛选和排序"""
+    """下载表数据为CSV、csv.gz、Excel或Parquet格式，支持多字段筛选和排序"""
     try:
+        if table_format == 'parquet':
+            require_pyarrow()
+        
         # 解析filters JSON字符串
         filters_dict = None
         if filters:
@@ -472,65 +872,139 @@ async def download_table_data(
             except json.JSONDecodeError:
                 filters_dict = None
         
-        # 获取所有数据（不分页）
-        result = db.get_table_data(
-            table_name, page=1, page_size=999999, 
-            search_field=search_field, search_value=search_value,
-            filters=filters_dict, sort_field=sort_field, sort_order=sort_order
+        # 逐批读取游标输出（不限制行数），内存占用与表大小无关；
+        # 计数和首次读取（可能包含排序）在线程池中执行，不阻塞其他请求；
+        # Parquet按结果集中实际出现的存储类型确定列类型
+        columns, rows, total_count, column_types = await run_in_threadpool(
+            db.stream_table_rows,
+            table_name, search_field=search_field, search_value=search_value,
+            filters=filters_dict, sort_field=sort_field, sort_order=sort_order,
+            with_types=table_format == 'parquet'
         )
-        
-        if not result['data']:
+        first_row = await run_in_threadpool(next, rows, None)
+        if first_row is None:
             raise HTTPException(status_code=404, detail="没有数据可下载")
         
-        # 转换为DataFrame
-        df = pd.DataFrame(result['data'])
-        
         # 生成文件名
         # 创建时间戳
         timestamp = time.strftime('%Y%m%d_%H%M%S')
+        filename = f"{table_name}_{timestamp}.{table_format}"
         
-        if table_format == 'csv':
-            # 生成CSV
-            output = io.StringIO()
-            df.to_csv(output, index=False, encoding='utf-8-sig')  # 使用utf-8-sig支持中文
-            output.seek(0)
-            
-            # 使用URL编码处理中文文件名
-            filename_encoded = quote(f"{table_name}_{timestamp}.csv".encode('utf-8'))
-            
-            return StreamingResponse(
-                io.BytesIO(output.getvalue().encode('utf-8-sig')),
-                media_type="text/csv",
-                headers={
-                    "Content-Disposition": f"attachment; filename*=UTF-8''{filename_encoded}"
-                }
-            )
+        if table_format in ('csv', 'csv.gz'):
+            # 总行数在输出数据前通过响应头返回
+            return csv_response(columns, rows, first_row, filename, compress=table_format == 'csv.gz',
+                                headers={"X-Total-Count": str(total_count)})
         
-        elif table_format == 'xlsx':
-            # 生成Excel
-            output = io.BytesIO()
-            # Excel sheet名称处理（移除特殊字符，限制长度）
-            # noinspection RegExpRedundantEscape
-            safe_sheet_name = re.sub(r'[^\w\u4e00-\u9fff\-_\.]', '_', table_name)[:31]
-            
-            with pd.ExcelWriter(output, engine='openpyxl') as writer:
-                df.to_excel(writer, sheet_name=safe_sheet_name, index=False)
-            output.seek(0)
-            
-            # 使用URL编码处理中文文件名
-            filename_encoded = quote(f"{table_name}_{timestamp}.xlsx".encode('utf-8'))
-            
-            return StreamingResponse(
-                output,
-                media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                headers={
-                    "Content-Disposition": f"attachment; filename*=UTF-8''{filename_encoded}"
-                }
-            )
-            
+        if table_format == 'parquet':
+            return await parquet_response(columns, rows, first_row, filename, column_types)
+        
+        # 生成Excel（只写模式，超过单表行数上限时自动分页）
+        return await xlsx_response(columns, rows, first_row, table_name, filename)
+    
+    except HTTPException:
+        raise
+    except ValueError as err:
+        raise HTTPException(status_code=400, detail=str(err))
     except Exception as err:
         raise HTTPException(status_code=500, detail=str(err))
 
+@app.get("/api/tables/{table_name}/arrow")
+async def stream_table_arrow(
+    table_name: str,
+    search_field: Optional[str] = None,
+    search_value: Optional[str] = None,
+    filters: Optional[str] = Query(None, description="JSON格式的多字段筛选条件"),
+    sort_field: Optional[str] = None,
+    sort_order: Optional[str] = Query(None, pattern="^(asc|desc|ASC|DESC)$"),
+    batch_size: int = Query(50000, ge=1000, le=1000000, description="每个记录批的行数")
+):
+    """
+    以Arrow IPC流格式批量读取表数据（筛选和排序参数与分页接口相同，需要安装 pyarrow）
+    
+    直接从游标逐批转换为记录批输出，不经过JSON编码；响应头 X-Total-Count 为总行数。
+    列类型按结果集中实际出现的存储类型确定，每个值都按原值输出。
+    """
+    try:
+        require_pyarrow()
+        
+        # 解析filters JSON字符串
+        filters_dict = None
+        if filters:
+            try:
+                filters_dict = json.loads(filters)
+            except json.JSONDecodeError:
+                filters_dict = None
+        
+        # 计数和各列存储类型统计在线程池中执行；记录批由 StreamingResponse 在线程池中逐批生成
+        columns, rows, total_count, column_types = await run_in_threadpool(
+            db.stream_table_rows,
+            table_name, search_field=search_field, search_value=search_value,
+            filters=filters_dict, sort_field=sort_field, sort_order=sort_order,
+            batch_size=min(batch_size, 10000), with_types=True
+        )
+        return StreamingResponse(
+            iter_arrow_stream(columns, rows, batch_size=batch_size, column_types=column_types),
+            media_type="application/vnd.apache.arrow.stream",
+            headers={"X-Total-Count": str(total_count)}
+        )
+    except ValueError as err:
+        raise HTTPException(status_code=400, detail=str(err))
+    except Exception as err:
+        raise HTTPException(status_code=500, detail=str(err))
+
+@app.post("/api/tables/{table_name}/export")
+async def export_table_data(
+    table_name: str,
+    table_format: str = Query(..., pattern=r"^(csv|csv\.gz|xlsx|parquet)$"),
+    search_field: Optional[str] = None,
+    search_value: Optional[str] = None,
+    filters: Optional[str] = Query(None, description="JSON格式的多字段筛选条件"),
+    sort_field: Optional[str] = None,
+    sort_order: Optional[str] = Query(None, pattern="^(asc|desc|ASC|DESC)$")
+):
+    """提交后台导出任务（相同请求在表数据未变化时复用已生成的文件）"""
+    try:
+        # 解析filters JSON字符串
+        filters_dict = None
+        if filters:
+            try:
+                filters_dict = json.loads(filters)
+            except json.JSONDecodeError:
+                filters_dict = None
+        
+        options = {
+            "search_field": search_field,
+            "search_value": search_value,
+            "filters": filters_dict,
+            "sort_field": sort_field,
+            "sort_order": sort_order
+        }
+        task_id, cached = export_jobs.submit(table_name, table_format, options)
+        return {"task_id": task_id, "cached": cached, "message": "导出文件已生成" if cached else "导出任务已启动"}
+    except ValueError as err:
+        raise HTTPException(status_code=400, detail=str(err))
+    except Exception as err:
+        raise HTTPException(status_code=500, detail=str(err))
+
+@app.get("/api/exports/{task_id}")
+async def get_export_status(task_id: str):
+    """获取导出任务状态（完成后 result 中包含行数、文件大小和下载地址）"""
+    export_jobs.restore(task_id)
+    return await get_task_status(task_id)
+
+@app.get("/api/exports/{task_id}/download")
+async def download_export(task_id: str, request: Request):
+    """下载导出文件（支持 Range 断点续传）"""
+    artifact = export_jobs.artifact(task_id)
+    if artifact is None:
+        status = task_status.get(task_id)
+        if status and status["status"] == "running":
+            raise HTTPException(status_code=409, detail="导出尚未完成")
+        raise HTTPException(status_code=404, detail="导出文件不存在或已过期")
+    
+    path, result = artifact
+    return ranged_file_response(request, path, MEDIA_TYPES[result["format"]], result["filename"])
+
 @app.get("/api/files")
 async def get_data_files():
     """获取Data目录下的文件列表"""
@@ -555,67 +1029,93 @@ async def get_data_files():
 
 @app.post("/api/files/upload")
 async def upload_file(file: UploadFile = File(...)):
-    """上传文件到Data目录"""
+    """上传文件到Data目录（分块写入临时文件，完成后重命名，返回内容的SHA-256）"""
     try:
-        if not file.filename:
-            raise HTTPException(status_code=400, detail="文件名不能为空")
-        
-        data_dir = DATA_PATH
-        data_dir.mkdir(parents=True, exist_ok=True)
-        
-        # 检查文件类型
-        allowed_extensions = {'.xlsx', '.xls', '.csv'}
-        file_extension = Path(file.filename).suffix.lower()
-        
-        if file_extension not in allowed_extensions:
-            raise HTTPException(
-                status_code=400, 
-                detail=f"不支持的文件类型。仅支持: {', '.join(allowed_extensions)}"
-            )
-        
-        # 防止路径遍历攻击：只使用文件名，移除路径部分
-        safe_filename = Path(file.filename).name
-        
-        # 移除路径遍历字符（../ 和 ..\）
-        # 注意：这里不删除中文字符，因为用户可能需要上传中文文件名的文件
-        # 由于我们已经使用了 Path().name 和 resolve() 检查，所以只需要移除明显的危险字符即可
-        if '..' in safe_filename or '/' in safe_filename or '\\' in safe_filename:
-            # 如果包含路径分隔符，只保留文件名部分（再次确保）
-            safe_filename = Path(safe_filename).name
-        
-        if not safe_filename or safe_filename.strip() == '':
-            raise HTTPException(status_code=400, detail="文件名无效")
-        
-        # 读取文件内容（不限制大小，由操作系统和磁盘空间决定）
-        content = await file.read()
-        
-        # 处理文件名冲突
-        file_path = data_dir / safe_filename
-        counter = 1
-        original_stem = file_path.stem
-        
-        while file_path.exists():
-            file_path = data_dir / f"{original_stem}_{counter}{file_extension}"
-            counter += 1
-        
-        # 确保最终路径在DATA_PATH目录内（双重检查）
-        file_path_resolved = file_path.resolve()
-        data_path_resolved = data_dir.resolve()
-        if not str(file_path_resolved).startswith(str(data_path_resolved)):
-            raise HTTPException(status_code=403, detail="禁止访问该文件路径")
-        
-        # 保存文件
-        with open(file_path, "wb") as buffer:
-            buffer.write(content)
-        
-        return {
-            "message": f"文件 {file_path.name} 上传成功",
-            "filename": file_path.name,
-            "size": len(content)
-        }
+        async def chunks():
+            while True:
+                chunk = await file.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
         
+        result = await uploads.save(file.filename, chunks())
+        return {"message": f"文件 {result['filename']} 上传成功", **result}
+    
     except HTTPException:
         raise
+    except ValueError as err:
+        raise HTTPException(status_code=400, detail=str(err))
+    except PermissionError as err:
+        raise HTTPException(status_code=403, detail=str(err))
+    except Exception as err:
+        raise HTTPException(status_code=500, detail=str(err))
+
+@app.post("/api/files/uploads")
+async def create_upload(
+    filename: str = Query(..., description="文件名"),
+    size: int = Query(..., ge=0, description="文件大小（字节）"),
+    sha256: Optional[str] = Query(None, description="文件内容的SHA-256，完成时校验"),
+    key: str = Query("", description="客户端标识（如文件修改时间），用于页面刷新后继续上传")
+):
+    """
+    创建断点续传上传会话
+    
+    相同文件的会话已存在时返回已写入的字节数（offset），客户端从该位置继续上传。
+    """
+    try:
+        return uploads.create(filename, size, sha256=sha256, key=key)
+    except ValueError as err:
+        raise HTTPException(status_code=400, detail=str(err))
+    except Exception as err:
+        raise HTTPException(status_code=500, detail=str(err))
+
+@app.get("/api/files/uploads/{upload_id}")
+async def get_upload(upload_id: str):
+    """查询上传会话的已写入字节数（连接中断后从该位置继续上传）"""
+    try:
+        return uploads.status(upload_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="上传会话不存在或已过期")
+    except Exception as err:
+        raise HTTPException(status_code=500, detail=str(err))
+
+@app.put("/api/files/uploads/{upload_id}")
+async def append_upload(upload_id: str, request: Request,
+                        offset: int = Query(..., ge=0, description="本块内容在文件中的起始位置")):
+    """
+    上传一块内容（请求体为原始字节），写满文件大小后保存到Data目录
+    
+    偏移量与已写入的字节数不一致时返回409，响应头 Upload-Offset 为已写入的字节数。
+    """
+    try:
+        result = await uploads.append(upload_id, offset, request.stream())
+        if "upload_id" in result:
+            return result
+        return {"message": f"文件 {result['filename']} 上传成功", **result}
+    except ClientDisconnect:
+        # 客户端已断开：已收到的内容保留在临时文件中，重连后查询偏移量继续上传
+        return Response(status_code=400)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="上传会话不存在或已过期")
+    except UploadConflict as err:
+        raise HTTPException(status_code=409, detail=str(err), headers={"Upload-Offset": str(err.offset)})
+    except ValueError as err:
+        raise HTTPException(status_code=400, detail=str(err))
+    except PermissionError as err:
+        raise HTTPException(status_code=403, detail=str(err))
+    except Exception as err:
+        raise HTTPException(status_code=500, detail=str(err))
+
+@app.delete("/api/files/uploads/{upload_id}")
+async def cancel_upload(upload_id: str):
+    """取消上传会话，删除已上传的内容"""
+    try:
+        uploads.cancel(upload_id)
+        return {"message": "上传已取消"}
+    except KeyError:
+        raise HTTPException(status_code=404, detail="上传会话不存在或已过期")
+    except UploadConflict as err:
+        raise HTTPException(status_code=409, detail=str(err), headers={"Upload-Offset": str(err.offset)})
     except Exception as err:
         raise HTTPException(status_code=500, detail=str(err))
 
@@ -667,87 +1167,187 @@ async def delete_file(filename: str):
         raise HTTPException(status_code=500, detail=str(err))
 
 @app.get("/api/query/overload")
-async def query_overload(start_time: str = Query(..., description="开始时间"), 
-                        end_time: str = Query(..., description="结束时间")):
-    """执行突发高负荷小区查询"""
+def query_overload(request: Request,
+                         response: Response,
+                         start_time: str = Query(..., description="开始时间"),
+                        end_time: str = Query(..., description="结束时间"),
+                        page: int = Query(1, ge=1),
+                        page_size: int = Query(100, ge=1, le=1000),
+                        search_field: Optional[str] = None,
+                        search_value: Optional[str] = None,
+                        filters: Optional[str] = Query(None, description="JSON格式的多字段筛选条件"),
+                        sort_field: Optional[str] = None,
+                        sort_order: Optional[str] = Query(None, pattern="^(asc|desc|ASC|DESC)$"),
+                        compact: bool = Query(False, description="紧凑格式：columns 加值数组 rows")):
+    """执行突发高负荷小区查询（分页），支持多字段筛选和排序（数据未变化时返回304）"""
     try:
         sql_file = SCRIPTS_PATH / "OverLoad.sql"
         if not sql_file.exists():
             raise HTTPException(status_code=404, detail="SQL文件不存在")
         
+        not_modified = check_not_modified(request, response, db.script_version(str(sql_file)))
+        if not_modified:
+            return not_modified
+        
         params = {
             "start_time": start_time,
             "end_time": end_time
         }
         
-        data = db.execute_sql_file(str(sql_file), params)
-        
-        # 统计信息
-        stats = {
-            "4G": {
-                "total": 0,
-                "burst": 0,
-                "total_important": 0,
-                "burst_important": 0
-            },
-            "5G": {
-                "total": 0,
-                "burst": 0,
-                "total_important": 0,
-                "burst_important": 0
-            }
+        # 解析filters JSON字符串
+        filters_dict = None
+        if filters:
+            try:
+                filters_dict = json.loads(filters)
+            except json.JSONDecodeError:
+                filters_dict = None
+        
+        try:
+            result = db.get_script_page(
+                str(sql_file), params, page, page_size,
+                search_field, search_value,
+                filters_dict, sort_field, sort_order,
+                compact=compact
+            )
+        except ValueError as err:
+            raise HTTPException(status_code=400, detail=str(err))
+        
+        # 统计信息在SQLite中按CGI去重计算（基于整个时间窗口，不受筛选影响，仅随第1页返回）
+        if page == 1:
+            summary = db.get_overload_stats(str(sql_file), params)
+            result["stats"] = summary["stats"]
+        
+        return fast_json_response(result, response) if compact else result
+    except HTTPException:
+        raise
+    except Exception as err:
+        raise HTTPException(status_code=500, detail=str(err))
+
+
+@app.get("/api/query/overload/stream")
+async def stream_overload(start_time: str = Query(..., description="开始时间"),
+                          end_time: str = Query(..., description="结束时间"),
+                          search_field: Optional[str] = None,
+                          search_value: Optional[str] = None,
+                          filters: Optional[str] = Query(None, description="JSON格式的多字段筛选条件"),
+                          sort_field: Optional[str] = None,
+                          sort_order: Optional[str] = Query(None, pattern="^(asc|desc|ASC|DESC)$")):
+    """以NDJSON流式返回突发高负荷小区查询结果（每行一个JSON对象）"""
+    try:
+        sql_file = SCRIPTS_PATH / "OverLoad.sql"
+        if not sql_file.exists():
+            raise HTTPException(status_code=404, detail="SQL文件不存在")
+        
+        params = {
+            "start_time": start_time,
+            "end_time": end_time
         }
         
-        # 用于去重的CGI集合
-        cgi_4g_total = set()
-        cgi_4g_burst = set()
-        cgi_5g_total = set()
-        cgi_5g_burst = set()
-        
-        # 重要区域CGI集合
-        cgi_4g_total_important = set()
-        cgi_4g_burst_important = set()
-        cgi_5g_total_important = set()
-        cgi_5g_burst_important = set()
-        
-        for row in data:
-            cgi = row.get("CGI", "")
-            system = row.get("制式", "")
-            is_burst = row.get("是否突发高负荷", "") == "是"
-            important_area = row.get("重要区域", "")
-            is_important = important_area and str(important_area).strip() != ""
-            
-            if system == "4G":
-                cgi_4g_total.add(cgi)
-                if is_important:
-                    cgi_4g_total_important.add(cgi)
-                if is_burst:
-                    cgi_4g_burst.add(cgi)
-                    if is_important:
-                        cgi_4g_burst_important.add(cgi)
-            elif system == "5G":
-                cgi_5g_total.add(cgi)
-                if is_important:
-                    cgi_5g_total_important.add(cgi)
-                if is_burst:
-                    cgi_5g_burst.add(cgi)
-                    if is_important:
-                        cgi_5g_burst_important.add(cgi)
-        
-        stats["4G"]["total"] = len(cgi_4g_total)
-        stats["4G"]["burst"] = len(cgi_4g_burst)
-        stats["4G"]["total_important"] = len(cgi_4g_total_important)
-        stats["4G"]["burst_important"] = len(cgi_4g_burst_important)
-        stats["5G"]["total"] = len(cgi_5g_total)
-        stats["5G"]["burst"] = len(cgi_5g_burst)
-        stats["5G"]["total_important"] = len(cgi_5g_total_important)
-        stats["5G"]["burst_important"] = len(cgi_5g_burst_important)
-        
-        return {
-            "data": data,
-            "stats": stats,
-            "total_count": len(data)
+        # 解析filters JSON字符串
+        filters_dict = None
+        if filters:
+            try:
+                filters_dict = json.loads(filters)
+            except json.JSONDecodeError:
+                filters_dict = None
+        
+        try:
+            _, rows, _ = await run_in_threadpool(
+                db.stream_script_rows,
+                str(sql_file), params,
+                search_field, search_value,
+                filters_dict, sort_field, sort_order
+            )
+        except ValueError as err:
+            raise HTTPException(status_code=400, detail=str(err))
+        
+        def generate():
+            for row in rows:
+                yield json.dumps(row, ensure_ascii=False, default=str) + "\n"
+        
+        return StreamingResponse(generate(), media_type="application/x-ndjson")
+    except HTTPException:
+        raise
+    except Exception as err:
+        raise HTTPException(status_code=500, detail=str(err))
+
+
+@app.get("/api/query/overload/stats")
+def query_overload_stats(request: Request,
+                               response: Response,
+                               start_time: str = Query(..., description="开始时间"),
+                               end_time: str = Query(..., description="结束时间")):
+    """仅查询突发高负荷小区统计（不返回明细数据）"""
+    try:
+        sql_file = SCRIPTS_PATH / "OverLoad.sql"
+        if not sql_file.exists():
+            raise HTTPException(status_code=404, detail="SQL文件不存在")
+        
+        not_modified = check_not_modified(request, response, db.script_version(str(sql_file)))
+        if not_modified:
+            return not_modified
+        
+        params = {
+            "start_time": start_time,
+            "end_time": end_time
         }
+        
+        return db.get_overload_stats(str(sql_file), params)
+    except HTTPException:
+        raise
+    except Exception as err:
+        raise HTTPException(status_code=500, detail=str(err))
+
+
+@app.get("/api/query/top-cells")
+def query_top_cells(
+    start_time: str = Query(..., description="开始时间"),
+    end_time: str = Query(..., description="结束时间"),
+    metric: str = Query("dl_avg", description="排名指标：dl_avg、dl_max、ul_avg、ul_max、users"),
+    n: int = Query(50, ge=1, le=1000, description="返回的小区数"),
+    table: Optional[str] = Query(None, description="表名（如 4G指标），为空表示全部")
+):
+    """按指标查询时间范围内最差的N个小区"""
+    try:
+        return db.get_top_cells(start_time, end_time, metric, n, table)
+    except ValueError as err:
+        raise HTTPException(status_code=400, detail=str(err))
+    except Exception as err:
+        raise HTTPException(status_code=500, detail=str(err))
+
+
+@app.get("/api/query/overload/episodes")
+def query_overload_episodes(
+    start_time: str = Query(..., description="开始时间"),
+    end_time: str = Query(..., description="结束时间"),
+    min_intervals: int = Query(4, ge=1, description="最少连续高负荷时段数"),
+    table: Optional[str] = Query(None, description="表名（如 4G指标），为空表示全部"),
+    cgi: Optional[str] = Query(None, description="小区CGI"),
+    limit: int = Query(1000, ge=1, le=10000)
+):
+    """查询持续高负荷事件（同一小区连续多个时段高负荷），返回起止时间和峰值"""
+    try:
+        return db.get_overload_episodes(start_time, end_time, min_intervals, table, cgi, limit)
+    except ValueError as err:
+        raise HTTPException(status_code=400, detail=str(err))
+    except Exception as err:
+        raise HTTPException(status_code=500, detail=str(err))
+
+
+@app.get("/api/query/overload/bursts")
+def query_overload_bursts(
+    start_time: str = Query(..., description="开始时间"),
+    end_time: str = Query(..., description="结束时间"),
+    threshold: float = Query(3.0, gt=0, description="z值阈值"),
+    min_samples: int = Query(96, ge=2, description="小区基线的最少样本数"),
+    table: Optional[str] = Query(None, description="表名（如 4G指标），为空表示全部"),
+    limit: int = Query(1000, ge=1, le=10000)
+):
+    """查询相对小区自身历史基线突发的高负荷记录（按z值判定）"""
+    try:
+        return db.get_burst_cells(start_time, end_time, threshold, min_samples, table, limit)
+    except ValueError as err:
+        raise HTTPException(status_code=400, detail=str(err))
     except Exception as err:
         raise HTTPException(status_code=500, detail=str(err))
 
@@ -757,10 +1357,13 @@ async def query_overload(start_time: str = Query(..., description="开始时间"
 async def download_overload_data(
     start_time: str = Query(..., description="开始时间"),
     end_time: str = Query(..., description="结束时间"),
-    table_format: str = Query(..., alias="format", pattern="^(csv|xlsx)$")
+    table_format: str = Query(..., alias="format", pattern=r"^(csv|csv\.gz|xlsx|parquet)$")
 ):
-    """下载突发高负荷小区数据为CSV或Excel格式"""
+    """下载突发高负荷小区数据为CSV、csv.gz、Excel或Parquet格式"""
     try:
+        if table_format == 'parquet':
+            require_pyarrow()
+        
         sql_file = SCRIPTS_PATH / "OverLoad.sql"
         if not sql_file.exists():
             raise HTTPException(status_code=404, detail="SQL文件不存在")
@@ -770,76 +1373,229 @@ async def download_overload_data(
             "end_time": end_time
         }
         
-        # 执行SQL查询
+        # 执行SQL查询（与查询接口共用缓存的物化结果）
         try:
-            data = db.execute_sql_file(str(sql_file), params)
+            columns, rows, column_types = await run_in_threadpool(
+                db.stream_script_rows, str(sql_file), params, with_types=table_format == 'parquet'
+            )
         except Exception as err:
             raise HTTPException(status_code=500, detail=f"SQL执行失败: {str(err)}")
         
-        if not data:
+        rows = (tuple(row.values()) for row in rows)
+        first_row = await run_in_threadpool(next, rows, None)
+        if first_row is None:
             raise HTTPException(status_code=404, detail="没有数据可下载")
         
-        # 转换为DataFrame
-        try:
-            df = pd.DataFrame(data)
-        except Exception as err:
-            raise HTTPException(status_code=500, detail=f"数据转换失败: {str(err)}")
-        
         # 生成文件名
         safe_start = start_time.replace(':', '-').replace(' ', '_')
         safe_end = end_time.replace(':', '-').replace(' ', '_')
+        filename = f"突发高负荷小区_{safe_start}_{safe_end}.{table_format}"
         
-        if table_format == 'csv':
-            # 生成CSV
-            try:
-                output = io.StringIO()
-                df.to_csv(output, index=False, encoding='utf-8-sig')
-                output.seek(0)
-                
-                # 生成文件名
-                filename = f"突发高负荷小区_{safe_start}_{safe_end}.csv"
-                filename_encoded = quote(filename.encode('utf-8'))
-                
-                return StreamingResponse(
-                    io.BytesIO(output.getvalue().encode('utf-8-sig')),
-                    media_type="text/csv",
-                    headers={
-                        "Content-Disposition": f"attachment; filename*=UTF-8''{filename_encoded}"
-                    }
-                )
-            except Exception as err:
-                raise HTTPException(status_code=500, detail=f"CSV生成失败: {str(err)}")
+        if table_format in ('csv', 'csv.gz'):
+            return csv_response(columns, rows, first_row, filename, compress=table_format == 'csv.gz')
         
-        elif table_format == 'xlsx':
-            # 生成Excel
+        if table_format == 'parquet':
             try:
-                output = io.BytesIO()
-                safe_sheet_name = "突发高负荷小区"[:31]
-                
-                with pd.ExcelWriter(output, engine='openpyxl') as writer:
-                    df.to_excel(writer, sheet_name=safe_sheet_name, index=False)
-                output.seek(0)
-                
-                # 生成文件名
-                filename = f"突发高负荷小区_{safe_start}_{safe_end}.xlsx"
-                filename_encoded = quote(filename.encode('utf-8'))
-                
-                return StreamingResponse(
-                    output,
-                    media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                    headers={
-                        "Content-Disposition": f"attachment; filename*=UTF-8''{filename_encoded}"
-                    }
-                )
+                return await parquet_response(columns, rows, first_row, filename, column_types)
             except Exception as err:
-                raise HTTPException(status_code=500, detail=f"Excel生成失败: {str(err)}")
-            
+                raise HTTPException(status_code=500, detail=f"Parquet生成失败: {str(err)}")
+        
+        # 生成Excel（只写模式，超过单表行数上限时自动分页）
+        try:
+            return await xlsx_response(columns, rows, first_row, "突发高负荷小区", filename)
+        except Exception as err:
+            raise HTTPException(status_code=500, detail=f"Excel生成失败: {str(err)}")
+    
     except HTTPException:
         raise
+    except ValueError as err:
+        raise HTTPException(status_code=400, detail=str(err))
     except Exception as err:
         import traceback
         error_detail = f"{str(err)}\n{traceback.format_exc()}"
         raise HTTPException(status_code=500, detail=error_detail)
 
+# 脚本运行接口保留的查询参数（其余查询参数作为脚本参数传入）
+SCRIPT_RESERVED_PARAMS = {"page", "page_size", "search_field", "search_value", "filters",
+                          "sort_field", "sort_order", "format", "compact"}
+
+
+def resolve_script(script_name: str) -> Path:
+    """根据脚本名称获取Scripts目录中的SQL文件路径"""
+    # 防止路径遍历攻击：只允许Scripts目录下的文件名
+    if Path(script_name).name != script_name:
+        raise HTTPException(status_code=403, detail="禁止访问该脚本路径")
+    
+    sql_file = SCRIPTS_PATH / f"{script_name}.sql"
+    if not sql_file.is_file():
+        raise HTTPException(status_code=404, detail=f"脚本 {script_name} 不存在")
+    return sql_file
+
+
+def script_params(request: Request) -> dict:
+    """从查询参数中提取脚本参数"""
+    return {
+        key: value for key, value in request.query_params.items()
+        if key not in SCRIPT_RESERVED_PARAMS
+    }
+
+
+@app.get("/api/scripts")
+async def get_scripts():
+    """获取Scripts目录下的所有脚本及其参数声明"""
+    try:
+        if not SCRIPTS_PATH.exists():
+            return {"scripts": []}
+        return {"scripts": [script.describe() for script in db.scripts.list_scripts(str(SCRIPTS_PATH))]}
+    except Exception as err:
+        raise HTTPException(status_code=500, detail=str(err))
+
+
+@app.get("/api/scripts/{script_name}")
+def run_script(
+    script_name: str,
+    request: Request,
+    page: int = Query(1, ge=1),
+    page_size: int = Query(100, ge=1, le=1000),
+    search_field: Optional[str] = None,
+    search_value: Optional[str] = None,
+    filters: Optional[str] = Query(None, description="JSON格式的多字段筛选条件"),
+    sort_field: Optional[str] = None,
+    sort_order: Optional[str] = Query(None, pattern="^(asc|desc|ASC|DESC)$"),
+    compact: bool = Query(False, description="紧凑格式：columns 加值数组 rows，不在每行中重复列名")
+):
+    """运行脚本（分页），脚本参数通过同名查询参数传入，支持多字段筛选和排序"""
+    try:
+        sql_file = resolve_script(script_name)
+        
+        # 解析filters JSON字符串
+        filters_dict = None
+        if filters:
+            try:
+                filters_dict = json.loads(filters)
+            except json.JSONDecodeError:
+                filters_dict = None
+        
+        try:
+            result = db.get_script_page(
+                str(sql_file), script_params(request), page, page_size,
+                search_field, search_value,
+                filters_dict, sort_field, sort_order,
+                compact=compact
+            )
+        except ValueError as err:
+            raise HTTPException(status_code=400, detail=str(err))
+        return fast_json_response(result) if compact else result
+    except HTTPException:
+        raise
+    except Exception as err:
+        raise HTTPException(status_code=500, detail=str(err))
+
+
+@app.get("/api/scripts/{script_name}/stream")
+async def stream_script(
+    script_name: str,
+    request: Request,
+    search_field: Optional[str] = None,
+    search_value: Optional[str] = None,
+    filters: Optional[str] = Query(None, description="JSON格式的多字段筛选条件"),
+    sort_field: Optional[str] = None,
+    sort_order: Optional[str] = Query(None, pattern="^(asc|desc|ASC|DESC)$")
+):
+    """以NDJSON流式返回脚本结果（每行一个JSON对象）"""
+    try:
+        sql_file = resolve_script(script_name)
+        
+        # 解析filters JSON字符串
+        filters_dict = None
+        if filters:
+            try:
+                filters_dict = json.loads(filters)
+            except json.JSONDecodeError:
+                filters_dict = None
+        
+        try:
+            _, rows, _ = await run_in_threadpool(
+                db.stream_script_rows,
+                str(sql_file), script_params(request),
+                search_field, search_value,
+                filters_dict, sort_field, sort_order
+            )
+        except ValueError as err:
+            raise HTTPException(status_code=400, detail=str(err))
+        
+        def generate():
+            for row in rows:
+                yield json.dumps(row, ensure_ascii=False, default=str) + "\n"
+        
+        return StreamingResponse(generate(), media_type="application/x-ndjson")
+    except HTTPException:
+        raise
+    except Exception as err:
+        raise HTTPException(status_code=500, detail=str(err))
+
+
+# noinspection PyTypeChecker
+@app.get("/api/scripts/{script_name}/download")
+async def download_script_data(
+    script_name: str,
+    request: Request,
+    search_field: Optional[str] = None,
+    search_value: Optional[str] = None,
+    filters: Optional[str] = Query(None, description="JSON格式的多字段筛选条件"),
+    sort_field: Optional[str] = None,
+    sort_order: Optional[str] = Query(None, pattern="^(asc|desc|ASC|DESC)$"),
+    table_format: str = Query(..., alias="format", pattern=r"^(csv|csv\.gz|xlsx|parquet)$")
+):
+    """下载脚本结果为CSV、csv.gz、Excel或Parquet格式"""
+    try:
+        if table_format == 'parquet':
+            require_pyarrow()
+        
+        sql_file = resolve_script(script_name)
+        
+        # 解析filters JSON字符串
+        filters_dict = None
+        if filters:
+            try:
+                filters_dict = json.loads(filters)
+            except json.JSONDecodeError:
+                filters_dict = None
+        
+        try:
+            columns, rows, column_types = await run_in_threadpool(
+                db.stream_script_rows,
+                str(sql_file), script_params(request),
+                search_field, search_value,
+                filters_dict, sort_field, sort_order,
+                with_types=table_format == 'parquet'
+            )
+        except ValueError as err:
+            raise HTTPException(status_code=400, detail=str(err))
+        
+        rows = (tuple(row.values()) for row in rows)
+        first_row = await run_in_threadpool(next, rows, None)
+        if first_row is None:
+            raise HTTPException(status_code=404, detail="没有数据可下载")
+        
+        # 标题中不能用于文件名和工作表名的字符替换为下划线
+        title = re.sub(r'[\\/*?:"<>|\[\]]', '_', db.scripts.load(str(sql_file)).title)
+        filename = f"{title}.{table_format}"
+        
+        if table_format in ('csv', 'csv.gz'):
+            return csv_response(columns, rows, first_row, filename, compress=table_format == 'csv.gz')
+        
+        if table_format == 'parquet':
+            return await parquet_response(columns, rows, first_row, filename, column_types)
+        
+        return await xlsx_response(columns, rows, first_row, title, filename)
+    except HTTPException:
+        raise
+    except ValueError as err:
+        raise HTTPException(status_code=400, detail=str(err))
+    except Exception as err:
+        raise HTTPException(status_code=500, detail=str(err))
+
+
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=SERVER_PORT, log_level=LOG_LEVEL)
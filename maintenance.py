@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+后台维护模块 - 按保留策略清理过期数据并增量回收数据库空间
+
+启动时先在维护线程中执行一次表升级（派生列回填），与保留策略清理、汇总构建串行，
+不与它们争用写锁。
+"""
+import threading
+from typing import Callable, Dict, Optional
+from database import DatabaseManager
+
+
+# noinspection PyBroadException
+class MaintenanceWorker:
+    """后台维护线程"""
+    
+    def __init__(self, db: DatabaseManager, retention: Dict[str, int], interval_minutes: int = 60,
+                 batch_size: int = 5000, vacuum_pages: int = 2000, convert_vacuum: bool = False,
+                 prepare: Optional[Callable[[], None]] = None):
+        """
+        初始化后台维护线程
+        
+        Args:
+            db: 数据库管理器
+            retention: 数据保留策略（表名 -> 保留天数）
+            interval_minutes: 维护间隔（分钟）
+            batch_size: 每批删除的行数
+            vacuum_pages: 每次增量回收的最大页数
+            convert_vacuum: 是否允许对已有数据的数据库执行VACUUM切换为增量回收模式
+            prepare: 启动时在维护线程中执行一次的表升级（如按模型配置回填派生列）
+        """
+        self.db = db
+        self.retention = retention
+        self.interval = interval_minutes * 60
+        self.batch_size = batch_size
+        self.vacuum_pages = vacuum_pages
+        self.convert_vacuum = convert_vacuum
+        self.prepare = prepare
+        self._stop_event = threading.Event()
+        self._thread = None
+    
+    def start(self):
+        """启动后台维护线程"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+    
+    def stop(self):
+        """停止后台维护线程"""
+        self._stop_event.set()
+    
+    def run_once(self) -> Dict[str, int]:
+        """
+        执行一次维护：按保留策略清理过期数据，增量回收空闲页，
+        然后重置上次导入未完成的表的派生数据，并构建尚未建立的列统计信息、
+        列草图和汇总（避免在请求中全表扫描）
+        
+        Returns:
+            各表删除的行数
+        """
+        deleted = {}
+        for table_name, keep_days in self.retention.items():
+            if self._stop_event.is_set():
+                break
+            try:
+                count = self.db.apply_retention(table_name, keep_days, batch_size=self.batch_size)
+                if count:
+                    deleted[table_name] = count
+                    print(f"保留策略：表 {table_name} 已清理 {count} 条超过 {keep_days} 天的数据")
+            except Exception as e:
+                print(f"警告: 表 {table_name} 保留策略执行失败: {e}")
+        
+        try:
+            self.db.incremental_vacuum(self.vacuum_pages)
+        except Exception as e:
+            print(f"警告: 增量回收失败: {e}")
+        
+        try:
+            for table_name in self.db.repair_tables():
+                print(f"表 {table_name} 上次导入未完成，派生数据将重新构建")
+        except Exception as e:
+            print(f"警告: 重置未完成导入的表失败: {e}")
+        
+        try:
+            self.db.refresh_stats()
+        except Exception as e:
+            print(f"警告: 构建列统计信息和草图失败: {e}")
+        
+        try:
+            for table_name in self.db.build_summaries():
+                print(f"表 {table_name} 的汇总已建立")
+        except Exception as e:
+            print(f"警告: 构建汇总失败: {e}")
+        
+        return deleted
+    
+    def _run(self):
+        """维护线程主循环"""
+        try:
+            switched = self.db.ensure_incremental_vacuum(allow_vacuum=self.convert_vacuum)
+            if switched:
+                print("数据库已切换为增量回收模式（auto_vacuum=INCREMENTAL）")
+            elif switched is None:
+                print("提示: 数据库未启用增量回收模式，删除数据后不会自动回收空间；"
+                      "可在空闲时将 [Maintenance] ConvertIncrementalVacuum 设为 true 后重启程序进行切换")
+        except Exception as e:
+            print(f"警告: 切换增量回收模式失败: {e}")
+        
+        if self.prepare is not None:
+            try:
+                self.prepare()
+            except Exception as e:
+                print(f"警告: 表升级失败: {e}")
+        
+        while not self._stop_event.is_set():
+            self.run_once()
+            if self._stop_event.wait(self.interval):
+                break
@@ -0,0 +1,324 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+持续高负荷检测模块 - 按小区(CGI)识别连续高负荷的时间段
+
+每个小区连续的高负荷记录（下一条的开始时间等于上一条的结束时间）合并为一段，
+保存在内部表 _mh_overload_runs 中。导入时只处理本批的高负荷记录：
+批内先向量化切分出连续段，再与已保存的重叠或首尾相接的段合并，处理量与批次大小成正比，
+不需要重新扫描历史数据。查询时按最少连续时段数筛选出持续高负荷事件。
+"""
+from typing import Any, Dict, List, Optional
+import pandas as pd
+import table_meta
+
+RUNS_TABLE = '_mh_overload_runs'
+STATE_TABLE = '_mh_overload_state'
+
+CELL_FIELD = 'CGI'
+START_FIELD = '开始时间'
+END_FIELD = '结束时间'
+FLAG_FIELD = '是否高负荷小区'
+FLAG_VALUE = '是'
+USERS_FIELD = '最大用户数'
+UL_FIELD = '上行利用率'
+DL_FIELD = '下行利用率'
+REQUIRED_FIELDS = [CELL_FIELD, START_FIELD, END_FIELD, FLAG_FIELD, USERS_FIELD, UL_FIELD, DL_FIELD]
+
+PEAK_COLUMNS = ['peak_users', 'peak_ul', 'peak_dl']
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def ensure_episode_tables(conn):
+    """创建连续高负荷段表（如果不存在）"""
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {RUNS_TABLE} (
+            table_name TEXT NOT NULL,
+            cgi TEXT NOT NULL,
+            start_time TEXT NOT NULL,
+            end_time TEXT NOT NULL,
+            intervals INTEGER NOT NULL,
+            peak_users REAL,
+            peak_ul REAL,
+            peak_dl REAL,
+            PRIMARY KEY (table_name, cgi, start_time)
+        ) WITHOUT ROWID
+    """)
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx{RUNS_TABLE}_cell_end ON {RUNS_TABLE} (table_name, cgi, end_time)")
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx{RUNS_TABLE}_end ON {RUNS_TABLE} (end_time)")
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {STATE_TABLE} (
+            table_name TEXT PRIMARY KEY,
+            built_at REAL
+        )
+    """)
+
+
+def supports_episodes(columns: List[str]) -> bool:
+    """判断表是否包含持续高负荷检测所需的字段"""
+    return all(field in columns for field in REQUIRED_FIELDS)
+
+
+def _table_columns(conn, table_name: str) -> List[str]:
+    return [row[1] for row in conn.execute(f"PRAGMA table_info([{table_name}])")]
+
+
+def _peak(*values):
+    """取最大值（忽略空值）"""
+    values = [value for value in values if value is not None]
+    return max(values) if values else None
+
+
+def _to_sql_value(value):
+    """numpy数值转为Python数值，NaN转为None"""
+    if pd.isna(value):
+        return None
+    return value.item() if hasattr(value, 'item') else value
+
+
+def _split_runs(rows: pd.DataFrame) -> List[Dict[str, Any]]:
+    """
+    将高负荷记录切分为连续段（向量化）
+    
+    Args:
+        rows: 列为 cgi、start、end、users、ul、dl 的高负荷记录
+    """
+    rows = rows.assign(
+        start=pd.to_datetime(rows['start'], errors='coerce'),
+        end=pd.to_datetime(rows['end'], errors='coerce')
+    ).dropna(subset=['cgi', 'start', 'end'])
+    if rows.empty:
+        return []
+    rows = rows.drop_duplicates(subset=['cgi', 'start']).sort_values(['cgi', 'start'])
+    
+    # 换小区或与上一条不首尾相接时开始新的一段
+    breaks = (rows['cgi'] != rows['cgi'].shift()) | (rows['start'] != rows['end'].shift())
+    runs = rows.groupby(breaks.cumsum().values, sort=False).agg(
+        cgi=('cgi', 'first'),
+        start=('start', 'first'),
+        end=('end', 'last'),
+        intervals=('start', 'size'),
+        peak_users=('users', 'max'),
+        peak_ul=('ul', 'max'),
+        peak_dl=('dl', 'max'),
+    )
+    return [
+        {
+            "cgi": str(run.cgi),
+            "start_time": run.start.strftime(TIME_FORMAT),
+            "end_time": run.end.strftime(TIME_FORMAT),
+            "intervals": int(run.intervals),
+            "peak_users": _to_sql_value(run.peak_users),
+            "peak_ul": _to_sql_value(run.peak_ul),
+            "peak_dl": _to_sql_value(run.peak_dl),
+        }
+        for run in runs.itertuples(index=False)
+    ]
+
+
+def _overlap_intervals(run: Dict[str, Any], stored: Dict[str, Any]) -> int:
+    """两段重叠部分包含的时段数（按段内每个时段的平均时长估算）"""
+    overlap = (
+        pd.Timestamp(min(run["end_time"], stored["end_time"])) -
+        pd.Timestamp(max(run["start_time"], stored["start_time"]))
+    ).total_seconds()
+    if overlap <= 0:
+        return 0
+    candidates = []
+    for item in (run, stored):
+        span = (pd.Timestamp(item["end_time"]) - pd.Timestamp(item["start_time"])).total_seconds()
+        if span > 0 and item["intervals"]:
+            candidates.append(round(overlap / (span / item["intervals"])))
+    return min(candidates) if candidates else 0
+
+
+def _merge_runs(conn, table_name: str, runs: List[Dict[str, Any]]):
+    """
+    保存连续段，与已保存的重叠或首尾相接的段合并为一段
+    
+    重复导入相同时段的数据时，新段与已保存的段重叠：合并后的时间范围取并集，
+    时段数扣除重叠部分，峰值取最大值，较短的段不会覆盖较长的段。
+    """
+    columns = "cgi, start_time, end_time, intervals, " + ", ".join(PEAK_COLUMNS)
+    for run in runs:
+        neighbors = conn.execute(
+            f"SELECT {columns} FROM {RUNS_TABLE} "
+            f"WHERE table_name = ? AND cgi = ? AND start_time <= ? AND end_time >= ? ORDER BY start_time",
+            (table_name, run["cgi"], run["end_time"], run["start_time"])
+        ).fetchall()
+        
+        for neighbor in neighbors:
+            stored = dict(zip(columns.split(", "), neighbor))
+            conn.execute(
+                f"DELETE FROM {RUNS_TABLE} WHERE table_name = ? AND cgi = ? AND start_time = ?",
+                (table_name, stored["cgi"], stored["start_time"])
+            )
+            intervals = run["intervals"] + stored["intervals"] - _overlap_intervals(run, stored)
+            run["intervals"] = max(intervals, run["intervals"], stored["intervals"])
+            run["start_time"] = min(run["start_time"], stored["start_time"])
+            run["end_time"] = max(run["end_time"], stored["end_time"])
+            for column in PEAK_COLUMNS:
+                run[column] = _peak(run[column], stored[column])
+        
+        conn.execute(
+            f"INSERT INTO {RUNS_TABLE} (table_name, {columns}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (table_name, run["cgi"], run["start_time"], run["end_time"], run["intervals"],
+             run["peak_users"], run["peak_ul"], run["peak_dl"])
+        )
+
+
+def _scan(conn, table_name: str, cgi: Optional[str] = None, start_time: Optional[str] = None,
+          end_time: Optional[str] = None, chunk_size: int = 50000):
+    """从原始数据按小区、时间顺序分块读取高负荷记录并合并为连续段"""
+    table_meta.register_functions(conn)
+    conditions = [f"[{FLAG_FIELD}] = ?"]
+    params: List[Any] = [FLAG_VALUE]
+    if cgi is not None:
+        conditions.append(f"[{CELL_FIELD}] = ?")
+        params.append(cgi)
+    if start_time:
+        conditions.append(f"[{START_FIELD}] >= ?")
+        params.append(start_time)
+    if end_time:
+        conditions.append(f"[{START_FIELD}] < ?")
+        params.append(end_time)
+    
+    sql = f"""
+        SELECT [{CELL_FIELD}] AS cgi, [{START_FIELD}] AS start, [{END_FIELD}] AS end,
+               mh_num([{USERS_FIELD}]) AS users, mh_num([{UL_FIELD}]) AS ul, mh_num([{DL_FIELD}]) AS dl
+        FROM [{table_name}]
+        WHERE {" AND ".join(conditions)}
+        ORDER BY [{CELL_FIELD}], [{START_FIELD}]
+    """
+    # 分块边界处被切开的段由合并逻辑重新接上
+    for chunk in pd.read_sql_query(sql, conn, params=params, chunksize=chunk_size):
+        _merge_runs(conn, table_name, _split_runs(chunk))
+
+
+def rebuild(conn, table_name: str):
+    """全表重建连续段"""
+    ensure_episode_tables(conn)
+    conn.execute(f"DELETE FROM {RUNS_TABLE} WHERE table_name = ?", (table_name,))
+    _scan(conn, table_name)
+    conn.execute(
+        f"INSERT OR REPLACE INTO {STATE_TABLE} (table_name, built_at) VALUES (?, strftime('%s', 'now'))",
+        (table_name,)
+    )
+
+
+def is_built(conn, table_name: str) -> bool:
+    """连续段是否已建立"""
+    ensure_episode_tables(conn)
+    return conn.execute(
+        f"SELECT 1 FROM {STATE_TABLE} WHERE table_name = ?", (table_name,)
+    ).fetchone() is not None
+
+
+def ensure_episodes(conn, table_name: str) -> bool:
+    """
+    已有数据的表首次建立连续段（表不包含所需字段时跳过）
+    
+    Returns:
+        是否执行了重建
+    """
+    if not supports_episodes(_table_columns(conn, table_name)) or is_built(conn, table_name):
+        return False
+    rebuild(conn, table_name)
+    return True
+
+
+def on_batch_ingested(conn, table_name: str, df: pd.DataFrame):
+    """数据导入后只处理本批的高负荷记录（在导入所用的同一连接中调用）"""
+    if not supports_episodes(list(df.columns)):
+        return
+    if not is_built(conn, table_name):
+        # 首次建立时直接扫描全表（已包含本批数据）
+        rebuild(conn, table_name)
+        return
+    
+    high = df[df[FLAG_FIELD] == FLAG_VALUE]
+    if high.empty:
+        return
+    rows = pd.DataFrame({
+        'cgi': high[CELL_FIELD],
+        'start': high[START_FIELD],
+        'end': high[END_FIELD],
+        'users': pd.to_numeric(high[USERS_FIELD], errors='coerce'),
+        'ul': pd.to_numeric(high[UL_FIELD], errors='coerce'),
+        'dl': pd.to_numeric(high[DL_FIELD], errors='coerce'),
+    })
+    _merge_runs(conn, table_name, _split_runs(rows))
+
+
+def rebuild_range(conn, table_name: str, start_time: Optional[str] = None, end_time: Optional[str] = None):
+    """
+    按开始时间删除数据后修正受影响的连续段（在删除所用的同一连接中调用）
+    
+    完全落在删除范围内的段直接删除；跨越范围边界的段只重新扫描该小区在段内剩余的记录。
+    """
+    if not is_built(conn, table_name):
+        return
+    conditions = ["table_name = ?"]
+    params: List[Any] = [table_name]
+    if end_time:
+        conditions.append("start_time < ?")
+        params.append(end_time)
+    if start_time:
+        conditions.append("end_time > ?")
+        params.append(start_time)
+    affected = conn.execute(
+        f"SELECT cgi, start_time, end_time FROM {RUNS_TABLE} WHERE {' AND '.join(conditions)}", params
+    ).fetchall()
+    
+    for cgi, run_start, run_end in affected:
+        conn.execute(
+            f"DELETE FROM {RUNS_TABLE} WHERE table_name = ? AND cgi = ? AND start_time = ?",
+            (table_name, cgi, run_start)
+        )
+        inside = (not start_time or run_start >= start_time) and (not end_time or run_end <= end_time)
+        if not inside:
+            _scan(conn, table_name, cgi, run_start, run_end)
+
+
+def reset_table(conn, table_name: str):
+    """删除表的全部连续段（表被清空时调用，在下次导入时重新建立）"""
+    ensure_episode_tables(conn)
+    conn.execute(f"DELETE FROM {RUNS_TABLE} WHERE table_name = ?", (table_name,))
+    conn.execute(f"DELETE FROM {STATE_TABLE} WHERE table_name = ?", (table_name,))
+
+
+def query_episodes(conn, start_time: str, end_time: str, min_intervals: int = 4,
+                   table_name: Optional[str] = None, cgi: Optional[str] = None,
+                   limit: int = 1000) -> Dict[str, Any]:
+    """
+    查询与时间范围相交的持续高负荷事件
+    
+    Args:
+        min_intervals: 最少连续高负荷时段数
+        limit: 最多返回的事件数（按开始时间排序）
+    
+    Returns:
+        {"episodes": [{table, cgi, start_time, end_time, intervals, peak_users, peak_ul, peak_dl}], "total_count"}
+    """
+    ensure_episode_tables(conn)
+    conditions = ["intervals >= ?", "start_time < ?", "end_time > ?"]
+    params: List[Any] = [min_intervals, end_time, start_time]
+    if table_name:
+        conditions.append("table_name = ?")
+        params.append(table_name)
+    if cgi:
+        conditions.append("cgi = ?")
+        params.append(cgi)
+    where_clause = " AND ".join(conditions)
+    
+    total_count = conn.execute(f"SELECT COUNT(*) FROM {RUNS_TABLE} WHERE {where_clause}", params).fetchone()[0]
+    rows = conn.execute(
+        f"SELECT table_name, cgi, start_time, end_time, intervals, {', '.join(PEAK_COLUMNS)} "
+        f"FROM {RUNS_TABLE} WHERE {where_clause} ORDER BY start_time, table_name, cgi LIMIT ?",
+        params + [limit]
+    ).fetchall()
+    keys = ['table', 'cgi', 'start_time', 'end_time', 'intervals'] + PEAK_COLUMNS
+    return {
+        "episodes": [dict(zip(keys, row)) for row in rows],
+        "total_count": total_count
+    }
@@ -0,0 +1,206 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+查询结果缓存模块 - 物化脚本结果并按内存占用和有效期淘汰
+
+脚本结果只执行一次，写入独立的内存SQLite数据库（MaterializedResult），
+之后的分页、筛选、排序、统计和导出都在这份物化结果上执行。
+
+缓存键由调用方生成（包含脚本版本、参数和依赖表的写入代数），
+数据变化后键随之变化；导入或删除数据时也会按依赖表主动失效，及时释放内存。
+"""
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+
+
+class ResultTooLarge(Exception):
+    """物化结果超过内存上限"""
+
+
+# 超过内存上限的结果在缓存中的占位值（有效期内同样的查询不再尝试物化）
+OVERSIZED = object()
+
+
+class MaterializedResult:
+    """物化的查询结果（内存SQLite数据库中的 result 表）"""
+    
+    TABLE = "result"
+    
+    def __init__(self, cursor: sqlite3.Cursor, max_bytes: Optional[int] = None, batch_size: int = 5000):
+        """
+        从游标读取全部结果写入内存数据库
+        
+        Args:
+            cursor: 已执行查询的游标
+            max_bytes: 占用内存上限（字节），超过时抛出 ResultTooLarge
+            batch_size: 每批写入的行数
+        """
+        self.columns = self._unique_columns([desc[0] for desc in cursor.description or []])
+        # 内存数据库可能在不同线程中访问（流式导出），访问由锁串行化
+        self._conn = sqlite3.connect(":memory:", check_same_thread=False)
+        self._lock = threading.Lock()
+        self.created_at = time.time()
+        
+        column_list = ", ".join(f"[{column}]" for column in self.columns)
+        placeholders = ", ".join("?" for _ in self.columns)
+        self.row_count = 0
+        if self.columns:
+            self._conn.execute(f"CREATE TABLE {self.TABLE} ({column_list})")
+            insert_sql = f"INSERT INTO {self.TABLE} VALUES ({placeholders})"
+            while True:
+                batch = cursor.fetchmany(batch_size)
+                if not batch:
+                    break
+                self._conn.executemany(insert_sql, batch)
+                self.row_count += len(batch)
+                if max_bytes is not None and self._size() > max_bytes:
+                    self._conn.close()
+                    raise ResultTooLarge(f"查询结果超过 {max_bytes} 字节")
+            self._conn.commit()
+        
+        self.nbytes = self._size()
+    
+    def _size(self) -> int:
+        """内存数据库当前占用的字节数"""
+        page_count = self._conn.execute("PRAGMA page_count").fetchone()[0]
+        page_size = self._conn.execute("PRAGMA page_size").fetchone()[0]
+        return page_count * page_size
+    
+    @staticmethod
+    def _unique_columns(columns: List[str]) -> List[str]:
+        """重名列追加序号，保证可以建表"""
+        result = []
+        for column in columns:
+            name, index = column, 2
+            while name in result:
+                name = f"{column}_{index}"
+                index += 1
+            result.append(name)
+        return result
+    
+    def fetchall(self, sql: str, params: Iterable = ()) -> List[Tuple]:
+        """在物化结果上执行查询，返回全部行"""
+        with self._lock:
+            return self._conn.execute(sql, list(params)).fetchall()
+    
+    def iter_rows(self, sql: str, params: Iterable = (), batch_size: int = 1000):
+        """在物化结果上执行查询，按批次逐行返回（每批读取时加锁，不阻塞其他查询）"""
+        with self._lock:
+            cursor = self._conn.execute(sql, list(params))
+        while True:
+            with self._lock:
+                batch = cursor.fetchmany(batch_size)
+            if not batch:
+                break
+            for row in batch:
+                yield row
+
+
+class ResultCache:
+    """物化结果缓存（按内存占用和有效期淘汰，LRU顺序）"""
+    
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024, ttl: float = 600):
+        """
+        初始化结果缓存
+        
+        Args:
+            max_bytes: 缓存结果占用的最大内存（字节），0表示不缓存
+            ttl: 缓存结果的有效期（秒）
+        """
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        # 正在计算的键，同一结果并发请求时只计算一次
+        self._pending: Dict[Hashable, threading.Event] = {}
+    
+    def get(self, key: Hashable) -> Optional[Any]:
+        """获取缓存结果（未命中或已过期时返回None）"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, size, tags, expires = entry
+            if expires < time.time():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return value
+    
+    def put(self, key: Hashable, value: Any, size: int, tags: Iterable[str] = ()):
+        """写入缓存结果，超出内存上限时淘汰最久未使用的结果（单个结果超过上限时不缓存）"""
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, size, set(tags), time.time() + self.ttl)
+            self._total_bytes += size
+            self._evict()
+    
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Tuple[Any, int]],
+                       tags: Iterable[str] = ()) -> Any:
+        """
+        获取缓存结果，未命中时计算并写入缓存
+        
+        Args:
+            compute: 计算函数，返回 (结果, 占用字节数)
+            tags: 结果依赖的表，用于按表失效
+        """
+        while True:
+            value = self.get(key)
+            if value is not None:
+                return value
+            with self._lock:
+                pending = self._pending.get(key)
+                if pending is None:
+                    self._pending[key] = threading.Event()
+                    break
+            # 其他请求正在计算同一结果，等待完成后重新读取
+            pending.wait()
+        
+        try:
+            value, size = compute()
+            self.put(key, value, size, tags)
+            return value
+        finally:
+            with self._lock:
+                self._pending.pop(key).set()
+    
+    def invalidate(self, tag: Optional[str] = None):
+        """使依赖指定表的结果失效（不指定表时清空缓存）"""
+        with self._lock:
+            keys = [key for key, entry in self._entries.items() if tag is None or tag in entry[2]]
+            for key in keys:
+                self._remove(key)
+    
+    def clear(self):
+        """清空缓存"""
+        self.invalidate()
+    
+    def stats(self) -> Dict[str, Any]:
+        """缓存使用情况"""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "ttl": self.ttl
+            }
+    
+    def _remove(self, key: Hashable):
+        """移除缓存项（调用方需持有锁）"""
+        _, size, _, _ = self._entries.pop(key)
+        self._total_bytes -= size
+    
+    def _evict(self):
+        """淘汰过期结果和超出内存上限的结果（调用方需持有锁）"""
+        now = time.time()
+        for key in [key for key, entry in self._entries.items() if entry[3] < now]:
+            self._remove(key)
+        while self._total_bytes > self.max_bytes and self._entries:
+            self._remove(next(iter(self._entries)))
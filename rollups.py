@@ -0,0 +1,412 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+汇总表模块 - 按小区(CGI)和小时/天维护指标汇总
+
+汇总保存在内部表 _mh_rollup_hour / _mh_rollup_day 中，每次导入按批次增量合并，
+删除数据时只重算受影响的时间桶。趋势查询按请求的粒度选择能满足要求的最粗汇总表，
+避免扫描15分钟粒度的原始数据。
+"""
+import re
+from typing import Any, Dict, List, Optional, Tuple
+import pandas as pd
+import table_meta
+
+HOUR_TABLE = '_mh_rollup_hour'
+DAY_TABLE = '_mh_rollup_day'
+STATE_TABLE = '_mh_rollup_state'
+
+CELL_FIELD = 'CGI'
+TIME_FIELD = '开始时间'
+USERS_FIELD = '最大用户数'
+UL_FIELD = '上行利用率'
+DL_FIELD = '下行利用率'
+REQUIRED_FIELDS = [CELL_FIELD, TIME_FIELD, USERS_FIELD, UL_FIELD, DL_FIELD]
+
+# 汇总粒度：汇总表、时间桶长度（秒）、时间桶字符串长度、时间桶后缀
+LEVELS = {
+    'hour': (HOUR_TABLE, 3600, 13, ':00:00'),
+    'day': (DAY_TABLE, 86400, 10, ''),
+}
+
+VALUE_COLUMNS = ['samples', 'max_users', 'ul_sum', 'ul_count', 'ul_max', 'dl_sum', 'dl_count', 'dl_max']
+
+
+def ensure_rollup_tables(conn):
+    """创建汇总表（如果不存在）"""
+    for rollup_table, _, _, _ in LEVELS.values():
+        conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {rollup_table} (
+                table_name TEXT NOT NULL,
+                cgi TEXT NOT NULL,
+                bucket TEXT NOT NULL,
+                samples INTEGER NOT NULL DEFAULT 0,
+                max_users REAL,
+                ul_sum REAL NOT NULL DEFAULT 0,
+                ul_count INTEGER NOT NULL DEFAULT 0,
+                ul_max REAL,
+                dl_sum REAL NOT NULL DEFAULT 0,
+                dl_count INTEGER NOT NULL DEFAULT 0,
+                dl_max REAL,
+                PRIMARY KEY (table_name, cgi, bucket)
+            ) WITHOUT ROWID
+        """)
+        conn.execute(
+            f"CREATE INDEX IF NOT EXISTS idx{rollup_table}_bucket ON {rollup_table} (table_name, bucket)"
+        )
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {STATE_TABLE} (
+            table_name TEXT PRIMARY KEY,
+            built_at REAL
+        )
+    """)
+
+
+def supports_rollup(columns: List[str]) -> bool:
+    """判断表是否包含汇总所需的字段"""
+    return all(field in columns for field in REQUIRED_FIELDS)
+
+
+def _table_columns(conn, table_name: str) -> List[str]:
+    return [row[1] for row in conn.execute(f"PRAGMA table_info([{table_name}])")]
+
+
+def _bucket_sql(level: str) -> str:
+    """原始数据时间字段对应的时间桶表达式（时间字段为 YYYY-MM-DD HH:MM:SS 文本）"""
+    _, _, length, suffix = LEVELS[level]
+    expression = f"substr([{TIME_FIELD}], 1, {length})"
+    return f"{expression} || '{suffix}'" if suffix else expression
+
+
+def _bucket_bound(value: Optional[str], level: str, ceil: bool = False) -> Optional[str]:
+    """时间对齐到时间桶起点（ceil为True时向上对齐）"""
+    if not value:
+        return None
+    _, seconds, _, _ = LEVELS[level]
+    timestamp = pd.Timestamp(value)
+    aligned = timestamp.floor(f"{seconds}s")
+    if ceil and aligned != timestamp:
+        aligned += pd.Timedelta(seconds=seconds)
+    return aligned.strftime('%Y-%m-%d %H:00:00' if level == 'hour' else '%Y-%m-%d')
+
+
+def _greatest(column: str) -> str:
+    """合并最大值（忽略空值）"""
+    return (
+        f"{column} = CASE WHEN {column} IS NULL OR excluded.{column} > {column} "
+        f"THEN excluded.{column} ELSE {column} END"
+    )
+
+
+# 原始数据上与 VALUE_COLUMNS 对应的聚合表达式
+RAW_AGGREGATES = f"""
+    COUNT(*),
+    MAX(mh_num([{USERS_FIELD}])),
+    TOTAL(mh_num([{UL_FIELD}])), COUNT(mh_num([{UL_FIELD}])), MAX(mh_num([{UL_FIELD}])),
+    TOTAL(mh_num([{DL_FIELD}])), COUNT(mh_num([{DL_FIELD}])), MAX(mh_num([{DL_FIELD}]))
+"""
+
+
+def _raw_conditions(lower: Optional[str], upper: Optional[str]):
+    """原始数据的时间范围条件（可使用开始时间索引）"""
+    conditions = [f"[{CELL_FIELD}] IS NOT NULL", f"[{TIME_FIELD}] IS NOT NULL"]
+    params: List[Any] = []
+    if lower:
+        conditions.append(f"[{TIME_FIELD}] >= ?")
+        params.append(lower)
+    if upper:
+        conditions.append(f"[{TIME_FIELD}] < ?")
+        params.append(upper)
+    return " AND ".join(conditions), params
+
+
+def _aggregate_into(conn, table_name: str, level: str, lower: Optional[str] = None, upper: Optional[str] = None):
+    """从原始数据聚合指定时间范围的汇总（范围按时间桶对齐）"""
+    rollup_table = LEVELS[level][0]
+    where_clause, params = _raw_conditions(lower, upper)
+    
+    table_meta.register_functions(conn)
+    bucket = _bucket_sql(level)
+    conn.execute(f"""
+        INSERT INTO {rollup_table} (table_name, cgi, bucket, {", ".join(VALUE_COLUMNS)})
+        SELECT ?, [{CELL_FIELD}], {bucket}, {RAW_AGGREGATES}
+        FROM [{table_name}]
+        WHERE {where_clause}
+        GROUP BY [{CELL_FIELD}], {bucket}
+    """, [table_name] + params)
+
+
+def rebuild(conn, table_name: str):
+    """全表重建汇总"""
+    ensure_rollup_tables(conn)
+    for level, (rollup_table, _, _, _) in LEVELS.items():
+        conn.execute(f"DELETE FROM {rollup_table} WHERE table_name = ?", (table_name,))
+        _aggregate_into(conn, table_name, level)
+    conn.execute(
+        f"INSERT OR REPLACE INTO {STATE_TABLE} (table_name, built_at) VALUES (?, strftime('%s', 'now'))",
+        (table_name,)
+    )
+
+
+def is_built(conn, table_name: str) -> bool:
+    """汇总是否已建立"""
+    ensure_rollup_tables(conn)
+    return conn.execute(
+        f"SELECT 1 FROM {STATE_TABLE} WHERE table_name = ?", (table_name,)
+    ).fetchone() is not None
+
+
+def ensure_rollups(conn, table_name: str) -> bool:
+    """
+    已有数据的表首次建立汇总（表不包含汇总字段时跳过）
+    
+    Returns:
+        是否执行了重建
+    """
+    if not supports_rollup(_table_columns(conn, table_name)) or is_built(conn, table_name):
+        return False
+    rebuild(conn, table_name)
+    return True
+
+
+def on_batch_ingested(conn, table_name: str, df: pd.DataFrame):
+    """数据导入后按批次增量合并汇总（在导入所用的同一连接中调用）"""
+    if not supports_rollup(list(df.columns)):
+        return
+    if not is_built(conn, table_name):
+        # 首次建立汇总时直接全表聚合（已包含本批数据）
+        rebuild(conn, table_name)
+        return
+    
+    batch = pd.DataFrame({
+        'cgi': df[CELL_FIELD],
+        'time': _time_text(df[TIME_FIELD]),
+        'users': pd.to_numeric(df[USERS_FIELD], errors='coerce'),
+        'ul': pd.to_numeric(df[UL_FIELD], errors='coerce'),
+        'dl': pd.to_numeric(df[DL_FIELD], errors='coerce'),
+    }).dropna(subset=['cgi', 'time'])
+    if batch.empty:
+        return
+    
+    for level, (rollup_table, _, length, suffix) in LEVELS.items():
+        batch['bucket'] = batch['time'].str[:length] + suffix
+        grouped = batch.groupby(['cgi', 'bucket'], sort=False).agg(
+            samples=('time', 'size'),
+            max_users=('users', 'max'),
+            ul_sum=('ul', 'sum'), ul_count=('ul', 'count'), ul_max=('ul', 'max'),
+            dl_sum=('dl', 'sum'), dl_count=('dl', 'count'), dl_max=('dl', 'max'),
+        ).reset_index()
+        rows = [
+            (table_name, str(row[0]), row[1]) + tuple(_to_sql_value(value) for value in row[2:])
+            for row in grouped.itertuples(index=False, name=None)
+        ]
+        conn.executemany(f"""
+            INSERT INTO {rollup_table} (table_name, cgi, bucket, {", ".join(VALUE_COLUMNS)})
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(table_name, cgi, bucket) DO UPDATE SET
+                samples = samples + excluded.samples,
+                {_greatest('max_users')},
+                ul_sum = ul_sum + excluded.ul_sum,
+                ul_count = ul_count + excluded.ul_count,
+                {_greatest('ul_max')},
+                dl_sum = dl_sum + excluded.dl_sum,
+                dl_count = dl_count + excluded.dl_count,
+                {_greatest('dl_max')}
+        """, rows)
+
+
+def _time_text(series: pd.Series) -> pd.Series:
+    """时间字段转为与数据库中一致的 YYYY-MM-DD HH:MM:SS 文本"""
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series.dt.strftime('%Y-%m-%d %H:%M:%S')
+    return series.where(series.isna(), series.astype(str))
+
+
+def _to_sql_value(value):
+    """numpy数值转为Python数值，NaN转为None"""
+    if pd.isna(value):
+        return None
+    return value.item() if hasattr(value, 'item') else value
+
+
+def rebuild_range(conn, table_name: str, start_time: Optional[str] = None, end_time: Optional[str] = None):
+    """删除数据后重算受影响的时间桶（在删除所用的同一连接中调用）"""
+    if not is_built(conn, table_name):
+        return
+    for level, (rollup_table, _, _, _) in LEVELS.items():
+        lower = _bucket_bound(start_time, level)
+        upper = _bucket_bound(end_time, level, ceil=True)
+        conditions = ["table_name = ?"]
+        params: List[Any] = [table_name]
+        if lower:
+            conditions.append("bucket >= ?")
+            params.append(lower)
+        if upper:
+            conditions.append("bucket < ?")
+            params.append(upper)
+        conn.execute(f"DELETE FROM {rollup_table} WHERE {' AND '.join(conditions)}", params)
+        _aggregate_into(conn, table_name, level, lower, upper)
+
+
+def reset_table(conn, table_name: str):
+    """删除表的全部汇总（表被清空时调用，汇总在下次导入时重新建立）"""
+    ensure_rollup_tables(conn)
+    for rollup_table, _, _, _ in LEVELS.values():
+        conn.execute(f"DELETE FROM {rollup_table} WHERE table_name = ?", (table_name,))
+    conn.execute(f"DELETE FROM {STATE_TABLE} WHERE table_name = ?", (table_name,))
+
+
+def parse_resolution(resolution: str) -> int:
+    """
+    解析时间粒度（如 15m、1h、6h、1d、7d），返回秒数
+    
+    Raises:
+        ValueError: 格式无效
+    """
+    match = re.fullmatch(r"\s*(\d+)\s*([mhd])\s*", resolution or "")
+    if not match or int(match.group(1)) <= 0:
+        raise ValueError(f"无效的时间粒度 {resolution}，格式如 15m、1h、1d")
+    return int(match.group(1)) * {'m': 60, 'h': 3600, 'd': 86400}[match.group(2)]
+
+
+def select_source(seconds: int) -> str:
+    """选择能满足粒度要求的最粗数据源：day、hour 或 raw"""
+    for level in ('day', 'hour'):
+        if seconds % LEVELS[level][1] == 0:
+            return level
+    return 'raw'
+
+
+def query_timeseries(conn, table_name: str, cgi: str, start_time: str, end_time: str,
+                     resolution: str = '1h') -> Dict[str, Any]:
+    """
+    查询单个小区的指标趋势
+    
+    按原始数据查询时严格限定在 [start_time, end_time) 内；按小时/天汇总查询时
+    返回与时间范围有重叠的时间桶（起止时间不在桶边界上时，首尾的桶包含范围外的数据）。
+    汇总尚未建立时（由后台维护线程构建）按原始数据查询单个小区，不在请求中全表重建。
+    
+    Returns:
+        {"resolution", "source", "points": [{time, samples, max_users, ul_avg, ul_max, dl_avg, dl_max}]}
+    """
+    seconds = parse_resolution(resolution)
+    columns = _table_columns(conn, table_name)
+    if not columns:
+        raise ValueError(f"表 {table_name} 不存在")
+    if not supports_rollup(columns):
+        raise ValueError(f"表 {table_name} 缺少趋势查询所需的字段: {', '.join(f for f in REQUIRED_FIELDS if f not in columns)}")
+    
+    source = select_source(seconds)
+    if source != 'raw' and not is_built(conn, table_name):
+        source = 'raw'
+    
+    if source == 'raw':
+        table_meta.register_functions(conn)
+        time_column = f"[{TIME_FIELD}]"
+        from_clause = f"FROM [{table_name}] WHERE [{CELL_FIELD}] = ? AND {time_column} >= ? AND {time_column} < ?"
+        params = [cgi, start_time, end_time]
+        aggregates = f"""
+            COUNT(*),
+            MAX(mh_num([{USERS_FIELD}])),
+            AVG(mh_num([{UL_FIELD}])), MAX(mh_num([{UL_FIELD}])),
+            AVG(mh_num([{DL_FIELD}])), MAX(mh_num([{DL_FIELD}]))
+        """
+    else:
+        time_column = "bucket"
+        from_clause = (
+            f"FROM {LEVELS[source][0]} WHERE table_name = ? AND cgi = ? AND bucket >= ? AND bucket < ?"
+        )
+        params = [table_name, cgi, _bucket_bound(start_time, source), _bucket_bound(end_time, source, ceil=True)]
+        aggregates = """
+            SUM(samples),
+            MAX(max_users),
+            SUM(ul_sum) / NULLIF(SUM(ul_count), 0), MAX(ul_max),
+            SUM(dl_sum) / NULLIF(SUM(dl_count), 0), MAX(dl_max)
+        """
+    
+    # 按粒度对齐到时间桶（以UTC纪元为起点，与数据中的本地时间文本一致）
+    bucket = f"datetime((CAST(strftime('%s', {time_column}) AS INTEGER) / {seconds}) * {seconds}, 'unixepoch')"
+    rows = conn.execute(
+        f"SELECT {bucket} AS t, {aggregates} {from_clause} GROUP BY t ORDER BY t", params
+    ).fetchall()
+    
+    keys = ['time', 'samples', 'max_users', 'ul_avg', 'ul_max', 'dl_avg', 'dl_max']
+    return {
+        "table": table_name,
+        "cgi": cgi,
+        "resolution": resolution,
+        "source": source,
+        "points": [dict(zip(keys, row)) for row in rows]
+    }
+
+
+# 排名指标：名称 -> (说明, 由按小区合并后的汇总值计算指标的函数)
+TOP_METRICS = {
+    'dl_avg': ('下行利用率均值', lambda v: v['dl_sum'] / v['dl_count'] if v['dl_count'] else None),
+    'dl_max': ('下行利用率最大值', lambda v: v['dl_max']),
+    'ul_avg': ('上行利用率均值', lambda v: v['ul_sum'] / v['ul_count'] if v['ul_count'] else None),
+    'ul_max': ('上行利用率最大值', lambda v: v['ul_max']),
+    'users': ('最大用户数', lambda v: v['max_users']),
+}
+
+
+def _combine(total: Dict[str, Any], values: Tuple) -> Dict[str, Any]:
+    """合并同一小区的两份汇总值（求和字段相加，最大值字段取较大者）"""
+    for column, value in zip(VALUE_COLUMNS, values):
+        if column in ('max_users', 'ul_max', 'dl_max'):
+            if value is not None and (total.get(column) is None or value > total[column]):
+                total[column] = value
+            else:
+                total.setdefault(column, None)
+        else:
+            total[column] = total.get(column, 0) + (value or 0)
+    return total
+
+
+def cell_aggregates(conn, table_name: str, start_time: str, end_time: str) -> Optional[Dict[str, Dict[str, Any]]]:
+    """
+    按小区汇总时间范围内的指标
+    
+    整小时部分读取小时汇总表，首尾不足一小时的部分按开始时间索引读取原始数据。
+    
+    Returns:
+        {cgi: {samples, max_users, ul_sum, ul_count, ul_max, dl_sum, dl_count, dl_max}}；
+        汇总尚未建立时返回None（由后台维护线程构建，不在请求中全表重建）
+    """
+    start_time = pd.Timestamp(start_time).strftime('%Y-%m-%d %H:%M:%S')
+    end_time = pd.Timestamp(end_time).strftime('%Y-%m-%d %H:%M:%S')
+    if not is_built(conn, table_name):
+        return None
+    
+    hour_start = _bucket_bound(start_time, 'hour', ceil=True)
+    hour_end = _bucket_bound(end_time, 'hour')
+    if hour_start >= hour_end:
+        raw_ranges = [(start_time, end_time)]
+        hour_start = hour_end = None
+    else:
+        raw_ranges = [(start_time, hour_start), (hour_end, end_time)]
+    
+    cells: Dict[str, Dict[str, Any]] = {}
+    if hour_start:
+        cursor = conn.execute(f"""
+            SELECT cgi, SUM(samples), MAX(max_users), SUM(ul_sum), SUM(ul_count), MAX(ul_max),
+                   SUM(dl_sum), SUM(dl_count), MAX(dl_max)
+            FROM {HOUR_TABLE}
+            WHERE table_name = ? AND bucket >= ? AND bucket < ?
+            GROUP BY cgi
+        """, (table_name, hour_start, hour_end))
+        for row in cursor:
+            cells[row[0]] = _combine({}, row[1:])
+    
+    table_meta.register_functions(conn)
+    for lower, upper in raw_ranges:
+        if lower >= upper:
+            continue
+        where_clause, params = _raw_conditions(lower, upper)
+        cursor = conn.execute(
+            f"SELECT [{CELL_FIELD}], {RAW_AGGREGATES} FROM [{table_name}] WHERE {where_clause} GROUP BY [{CELL_FIELD}]",
+            params
+        )
+        for row in cursor:
+            cells[str(row[0])] = _combine(cells.get(str(row[0]), {}), row[1:])
+    return cells
@@ -0,0 +1,206 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+SQL脚本引擎 - 加载 Scripts 目录中的SQL脚本并以绑定参数方式执行
+
+- 脚本按文件路径缓存，文件修改时间或大小变化时自动重新加载
+- {{param}} 占位符编译为SQLite命名参数（:param），参数值不再拼接进SQL文本
+- 每个线程复用一个数据库连接，同一SQL文本的预编译语句由连接的语句缓存复用
+
+脚本开头的注释块可以声明脚本信息（均为可选）：
+    
+    -- @title 突发高负荷小区
+    -- @param start_time 开始时间
+    -- @param end_time 结束时间
+    -- @tables 4G指标, 5G指标
+"""
+import os
+import re
+import sqlite3
+import threading
+from typing import Any, Dict, List, Tuple
+
+# 字符串字面量或占位符（字面量内的占位符需要拆分为拼接表达式）
+_TOKEN_PATTERN = re.compile(r"'(?:[^']|'')*'|\{\{\s*(\w+)\s*\}\}")
+_PLACEHOLDER_PATTERN = re.compile(r"\{\{\s*(\w+)\s*\}\}")
+_HEADER_PATTERN = re.compile(r"^--\s*@(\w+)\s*(.*)$")
+
+
+def parse_header(text: str) -> Dict[str, Any]:
+    """
+    解析脚本开头注释块中的声明
+    
+    Returns:
+        {"title": str, "params": {参数名: 描述}, "tables": 表名列表（未声明时为None）}
+    """
+    header = {"title": "", "params": {}, "tables": None}
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if not line.startswith('--'):
+            break
+        match = _HEADER_PATTERN.match(line)
+        if not match:
+            continue
+        key, value = match.group(1).lower(), match.group(2).strip()
+        if key == 'title':
+            header["title"] = value
+        elif key == 'param' and value:
+            name, _, description = value.partition(' ')
+            header["params"][name] = description.strip()
+        elif key == 'tables':
+            header["tables"] = [name.strip() for name in value.split(',') if name.strip()]
+    return header
+
+
+def compile_sql(text: str) -> Tuple[str, List[str]]:
+    """
+    将带 {{param}} 占位符的SQL编译为命名参数形式
+    
+    '{{start_time}}' 编译为 :start_time；'%{{keyword}}%' 这类部分占位的字面量
+    编译为 ('%' || :keyword || '%')。
+    
+    Returns:
+        tuple: (编译后的SQL, 参数名列表)
+    """
+    names = []
+    
+    def bind(name: str) -> str:
+        if name not in names:
+            names.append(name)
+        return f":{name}"
+    
+    def replace(match) -> str:
+        if match.group(1) is not None:
+            return bind(match.group(1))
+        
+        literal = match.group(0)
+        body = literal[1:-1]
+        if not _PLACEHOLDER_PATTERN.search(body):
+            return literal
+        
+        parts = []
+        position = 0
+        for placeholder in _PLACEHOLDER_PATTERN.finditer(body):
+            if placeholder.start() > position:
+                parts.append(f"'{body[position:placeholder.start()]}'")
+            parts.append(bind(placeholder.group(1)))
+            position = placeholder.end()
+        if position < len(body):
+            parts.append(f"'{body[position:]}'")
+        return parts[0] if len(parts) == 1 else "(" + " || ".join(parts) + ")"
+    
+    sql = _TOKEN_PATTERN.sub(replace, text)
+    # 去掉末尾分号，便于作为子查询嵌套
+    return sql.strip().rstrip(';').rstrip(), names
+
+
+class CompiledScript:
+    """已编译的SQL脚本"""
+    
+    def __init__(self, path: str, sql: str, params: List[str], version: Tuple = None,
+                 header: Dict[str, Any] = None):
+        header = header or {}
+        self.path = path
+        self.name = os.path.splitext(os.path.basename(path))[0]
+        self.sql = sql
+        self.params = params
+        self.version = version
+        self.title = header.get("title") or self.name
+        self.param_descriptions = header.get("params", {})
+        self.tables = header.get("tables")
+    
+    def describe(self) -> Dict[str, Any]:
+        """脚本信息（名称、标题、参数及说明、依赖表）"""
+        return {
+            "name": self.name,
+            "title": self.title,
+            "params": [
+                {"name": name, "description": self.param_descriptions.get(name, "")}
+                for name in self.params
+            ],
+            "tables": self.tables
+        }
+    
+    def bind(self, values: Dict[str, Any] = None) -> Dict[str, Any]:
+        """
+        生成绑定参数
+        
+        Raises:
+            ValueError: 缺少脚本需要的参数
+        """
+        values = values or {}
+        missing = [name for name in self.params if name not in values]
+        if missing:
+            raise ValueError(f"脚本 {os.path.basename(self.path)} 缺少参数: {', '.join(missing)}")
+        return {name: values[name] for name in self.params}
+
+
+class ScriptEngine:
+    """SQL脚本引擎"""
+    
+    def __init__(self, db_path: str, cached_statements: int = 256):
+        """
+        初始化脚本引擎
+        
+        Args:
+            db_path: 数据库文件完整路径
+            cached_statements: 每个连接缓存的预编译语句数
+        """
+        self.db_path = db_path
+        self.cached_statements = cached_statements
+        self._scripts = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+    
+    def load(self, script_path: str) -> CompiledScript:
+        """加载并编译脚本（文件未修改时直接返回缓存）"""
+        path = os.path.abspath(script_path)
+        stat = os.stat(path)
+        version = (stat.st_mtime_ns, stat.st_size)
+        
+        with self._lock:
+            cached = self._scripts.get(path)
+            if cached and cached[0] == version:
+                return cached[1]
+        
+        with open(path, 'r', encoding='utf-8') as f:
+            text = f.read()
+        sql, params = compile_sql(text)
+        script = CompiledScript(path, sql, params, version, parse_header(text))
+        
+        with self._lock:
+            self._scripts[path] = (version, script)
+        return script
+    
+    def list_scripts(self, scripts_dir: str) -> List[CompiledScript]:
+        """加载目录下的所有脚本（按文件名排序，无法读取的脚本跳过）"""
+        scripts = []
+        for filename in sorted(os.listdir(scripts_dir)):
+            if not filename.lower().endswith('.sql'):
+                continue
+            try:
+                scripts.append(self.load(os.path.join(scripts_dir, filename)))
+            except (OSError, UnicodeDecodeError) as e:
+                print(f"警告: 无法加载脚本 {filename}: {e}")
+        return scripts
+    
+    def connection(self) -> sqlite3.Connection:
+        """获取当前线程的持久连接（保留预编译语句缓存）"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, cached_statements=self.cached_statements)
+            self._local.conn = conn
+        return conn
+    
+    def run(self, sql: str, params: Dict[str, Any] = None) -> sqlite3.Cursor:
+        """在当前线程的连接上执行已编译的SQL"""
+        return self.connection().execute(sql, params or {})
+    
+    def close(self):
+        """关闭当前线程的连接"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
@@ -182,9 +182,9 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     });
     
-    // 页面离开时清理轮询
+    // 页面离开时停止订阅任务进度
     window.addEventListener('beforeunload', function() {
-        stopTaskPolling();
+        stopTaskUpdates();
     });
     
     // 文件上传拖拽功能
@@ -302,7 +302,8 @@ async function loadTableData(page = 1) {
     try {
         const params = {
             page: page,
-            page_size: 50
+            page_size: 50,
+            compact: true  // 紧凑格式：rows 为与 columns 顺序一致的值数组
         };
         
         // 兼容旧的单字段查询方式
@@ -423,11 +424,11 @@ function renderTable(data) {
     
     // 渲染数据
     body.innerHTML = '';
-    data.data.forEach((row, index) => {
+    data.rows.forEach(row => {
         const tr = document.createElement('tr');
         tr.className = 'border-b border-gray-200 hover:bg-gray-50';
         
-        data.columns.forEach(column => {
+        data.columns.forEach((column, columnIndex) => {
             const td = document.createElement('td');
             td.className = 'px-3 py-2 text-sm text-gray-900';
             td.style.minWidth = '100px';
@@ -435,8 +436,8 @@ function renderTable(data) {
             td.style.overflow = 'hidden';
             td.style.textOverflow = 'ellipsis';
             td.style.whiteSpace = 'nowrap';
-            td.title = row[column] || ''; // 添加tooltip显示完整内容
-            td.textContent = row[column] || '';
+            td.title = row[columnIndex] || ''; // 添加tooltip显示完整内容
+            td.textContent = row[columnIndex] || '';
             tr.appendChild(td);
         });
         
@@ -528,6 +529,13 @@ function toggleFilterMenu(column, button, thElement) {
     valueInput.style.width = '100%';
     valueInput.value = currentFilter.value || '';
     
+    // 常用取值列表（点击填入筛选值）
+    const facetList = document.createElement('div');
+    facetList.className = 'w-full border border-gray-200 rounded text-xs';
+    facetList.style.maxHeight = '160px';
+    facetList.style.overflowY = 'auto';
+    facetList.innerHTML = '<div class="px-2 py-1 text-gray-400">加载常用取值...</div>';
+    
     // 按钮容器（下面）
     const btnContainer = document.createElement('div');
     btnContainer.className = 'flex space-x-2';
@@ -570,6 +578,7 @@ function toggleFilterMenu(column, button, thElement) {
     
     menu.appendChild(ruleSelect);
     menu.appendChild(valueInput);
+    menu.appendChild(facetList);
     menu.appendChild(btnContainer);
     
     // 将菜单添加到th元素
@@ -591,6 +600,68 @@ function toggleFilterMenu(column, button, thElement) {
     
     // 聚焦输入框
     valueInput.focus();
+    
+    // 异步加载常用取值
+    loadFilterFacets(column, facetList, valueInput, ruleSelect);
+}
+
+// 加载列的常用取值（当前其他筛选条件下）
+async function loadFilterFacets(column, container, valueInput, ruleSelect) {
+    try {
+        const params = { limit: 20 };
+        
+        if (searchField && searchValue) {
+            params.search_field = searchField;
+            params.search_value = searchValue;
+        }
+        
+        // 只带上其他列的筛选条件
+        const otherFilters = {};
+        for (const [field, filter] of Object.entries(columnFilters)) {
+            if (field !== column && filter && filter.value && String(filter.value).trim()) {
+                otherFilters[field] = filter;
+            }
+        }
+        if (Object.keys(otherFilters).length > 0) {
+            params.filters = JSON.stringify(otherFilters);
+        }
+        
+        const response = await axios.get(
+            `/api/tables/${currentTable}/facets/${encodeURIComponent(column)}`, { params }
+        );
+        const values = response.data.values;
+        
+        container.innerHTML = '';
+        if (values.length === 0) {
+            container.innerHTML = '<div class="px-2 py-1 text-gray-400">无可选取值</div>';
+            return;
+        }
+        
+        values.forEach(item => {
+            const option = document.createElement('div');
+            option.className = 'flex justify-between px-2 py-1 cursor-pointer hover:bg-blue-50';
+            
+            const valueSpan = document.createElement('span');
+            valueSpan.className = 'truncate';
+            valueSpan.textContent = item.value;
+            valueSpan.title = item.value;
+            
+            const countSpan = document.createElement('span');
+            countSpan.className = 'ml-2 text-gray-400';
+            countSpan.textContent = response.data.exact ? item.count : `≈${item.count}`;
+            
+            option.appendChild(valueSpan);
+            option.appendChild(countSpan);
+            option.onclick = (e) => {
+                e.stopPropagation();
+                valueInput.value = item.value;
+                ruleSelect.value = 'equals';
+            };
+            container.appendChild(option);
+        });
+    } catch (error) {
+        container.innerHTML = '<div class="px-2 py-1 text-gray-400">常用取值加载失败</div>';
+    }
 }
 
 // 关闭筛选菜单
@@ -929,7 +1000,56 @@ function clearModelSelection() {
 
 // 当前执行任务ID
 let currentTaskId = null;
-let taskPollingInterval = null;
+let taskWatcher = null;
+
+// 订阅任务进度：优先使用SSE由服务端推送，浏览器不支持或连接中断时改为每秒轮询状态接口
+// 返回 { done, close }，done 在任务结束（完成或失败）时以最终状态完成
+function watchTask(taskId, statusUrl, onUpdate) {
+    let source = null;
+    let timer = null;
+    let closed = false;
+    const close = () => {
+        closed = true;
+        if (source) source.close();
+        if (timer) clearTimeout(timer);
+    };
+    
+    const done = new Promise((resolve, reject) => {
+        const handle = status => {
+            onUpdate(status);
+            if (status.status !== 'running') {
+                close();
+                resolve(status);
+            }
+        };
+        
+        const poll = async () => {
+            if (closed) return;
+            try {
+                const response = await axios.get(statusUrl);
+                handle(response.data);
+                if (!closed) timer = setTimeout(poll, 1000);
+            } catch (error) {
+                close();
+                reject(error);
+            }
+        };
+        
+        if (!window.EventSource) {
+            poll();
+            return;
+        }
+        source = new EventSource(`/api/tasks/${taskId}/events`);
+        source.onmessage = event => handle(JSON.parse(event.data));
+        source.onerror = () => {
+            // 服务端在任务结束后关闭连接；未收到最终状态时改为轮询
+            source.close();
+            source = null;
+            poll();
+        };
+    });
+    return { done, close };
+}
 
 // 执行选中的模型
 async function executeSelectedModels() {
@@ -955,8 +1075,8 @@ async function executeSelectedModels() {
         const response = await axios.post('/api/models/execute', modelPaths);
         currentTaskId = response.data.task_id;
         
-        // 开始轮询任务状态
-        startTaskPolling();
+        // 订阅任务进度
+        startTaskUpdates();
         
     } catch (error) {
         hideExecutionLoading();
@@ -993,35 +1113,26 @@ function hideExecutionLoading() {
     executeBtn.innerHTML = '<i class="fas fa-play mr-1"></i>执行选中';
 }
 
-// 开始轮询任务状态
-function startTaskPolling() {
-    taskPollingInterval = setInterval(async () => {
-        try {
-            const response = await axios.get(`/api/models/execute/${currentTaskId}`);
-            const status = response.data;
-            
-            updateTaskProgress(status);
-            
-            // 任务完成或失败时停止轮询
-            if (status.status === 'completed' || status.status === 'failed') {
-                stopTaskPolling();
-                handleTaskCompletion(status);
-            }
-            
-        } catch (error) {
-            console.error('获取任务状态失败:', error);
-            stopTaskPolling();
-            hideExecutionLoading();
-            await showAlert('获取任务状态失败', '错误');
-        }
-    }, 1000); // 每秒轮询一次
+// 订阅任务进度，任务结束后显示结果
+async function startTaskUpdates() {
+    taskWatcher = watchTask(currentTaskId, `/api/models/execute/${currentTaskId}`, updateTaskProgress);
+    try {
+        const status = await taskWatcher.done;
+        stopTaskUpdates();
+        handleTaskCompletion(status);
+    } catch (error) {
+        console.error('获取任务状态失败:', error);
+        stopTaskUpdates();
+        hideExecutionLoading();
+        await showAlert('获取任务状态失败', '错误');
+    }
 }
 
-// 停止轮询任务状态
-function stopTaskPolling() {
-    if (taskPollingInterval) {
-        clearInterval(taskPollingInterval);
-        taskPollingInterval = null;
+// 停止订阅任务进度
+function stopTaskUpdates() {
+    if (taskWatcher) {
+        taskWatcher.close();
+        taskWatcher = null;
     }
     currentTaskId = null;
 }
@@ -1116,7 +1227,7 @@ async function downloadTableData(format) {
         downloadMenu.classList.add('hidden');
         
         // 构建下载URL
-        let url = `/api/tables/${currentTable}/download?table_format=${format}`;
+        let url = `/api/tables/${currentTable}/export?table_format=${format}`;
         
         // 兼容旧的单字段查询方式
         if (searchField && searchValue) {
@@ -1134,40 +1245,33 @@ async function downloadTableData(format) {
             url += `&filters=${encodeURIComponent(JSON.stringify(activeFilters))}`;
         }
         
-        // 使用fetch检查下载状态
-        const response = await fetch(url);
-        
+        // 提交后台导出任务（相同条件且数据未变化时直接复用已生成的文件）
+        const response = await fetch(url, { method: 'POST' });
         if (!response.ok) {
-            throw new Error(`下载失败: ${response.status} ${response.statusText}`);
+            const errorData = await response.json().catch(() => ({}));
+            throw new Error(errorData.detail || `${response.status} ${response.statusText}`);
         }
-        
-        // 创建blob并下载
-        const blob = await response.blob();
-        const downloadUrl = window.URL.createObjectURL(blob);
-        
+        const { task_id: taskId } = await response.json();
+        
+        // 订阅导出进度
+        const status = await watchTask(taskId, `/api/exports/${taskId}`, update => {
+            if (update.status !== 'running') return;
+            const progressText = update.total
+                ? `${Math.floor(update.progress / update.total * 100)}%（共 ${Number(update.total).toLocaleString()} 行）`
+                : '准备中';
+            downloadBtn.innerHTML = `<i class="fas fa-spinner fa-spin mr-1"></i>导出${format.toUpperCase()} ${progressText}`;
+        }).done;
+        if (status.status === 'failed') throw new Error(status.error || '导出失败');
+        
+        // 由浏览器直接下载导出文件（支持断点续传，不在页面内存中缓存整个文件）
         const link = document.createElement('a');
-        link.href = downloadUrl;
-        
-        // 从响应头获取文件名
-        const contentDisposition = response.headers.get('Content-Disposition');
-        let filename = `${currentTable}_${new Date().toISOString().slice(0, 19).replace(/:/g, '-')}.${format}`;
-        
-        if (contentDisposition) {
-            const filenameMatch = contentDisposition.match(/filename\*?=['"]?([^'";]+)['"]?/);
-            if (filenameMatch) {
-                filename = decodeURIComponent(filenameMatch[1]);
-            }
-        }
-        
-        link.download = filename;
+        link.href = status.result.download_url;
+        link.download = status.result.filename;
         link.style.display = 'none';
         document.body.appendChild(link);
         link.click();
         document.body.removeChild(link);
         
-        // 清理blob URL
-        window.URL.revokeObjectURL(downloadUrl);
-        
     } catch (error) {
         await showAlert('下载失败: ' + error.message, '下载失败');
     } finally {
@@ -1296,6 +1400,66 @@ async function loadFiles() {
     }
 }
 
+// 分块上传的块大小和网络中断后的最大重试次数
+const UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024;
+const UPLOAD_MAX_RETRIES = 5;
+
+// 分块上传单个文件（断点续传）：网络中断时查询服务端已写入的字节数后继续，
+// 页面刷新后重新选择同一文件也会从已上传的位置继续
+async function uploadFileInChunks(file, onProgress) {
+    const params = new URLSearchParams({ filename: file.name, size: file.size, key: String(file.lastModified) });
+    const createResponse = await fetch(`/api/files/uploads?${params}`, { method: 'POST' });
+    const session = await createResponse.json();
+    if (!createResponse.ok) {
+        throw new Error(session.detail || '上传失败');
+    }
+    
+    const uploadUrl = `/api/files/uploads/${session.upload_id}`;
+    let offset = session.offset;
+    let retries = 0;
+    while (true) {
+        onProgress(offset);
+        const end = Math.min(offset + UPLOAD_CHUNK_SIZE, file.size);
+        let response;
+        try {
+            response = await fetch(`${uploadUrl}?offset=${offset}`, {
+                method: 'PUT',
+                headers: { 'Content-Type': 'application/octet-stream' },
+                body: file.slice(offset, end)
+            });
+        } catch (e) {
+            // 网络中断：等待后查询已写入的字节数，从该位置继续
+            if (++retries > UPLOAD_MAX_RETRIES) {
+                throw new Error('网络连接中断，已上传的部分会保留，重新上传该文件即可继续');
+            }
+            await new Promise(resolve => setTimeout(resolve, 1000 * retries));
+            try {
+                const status = await (await fetch(uploadUrl)).json();
+                if (typeof status.offset === 'number') offset = status.offset;
+            } catch (statusError) {
+                // 仍然无法连接，下次重试时再查询
+            }
+            continue;
+        }
+        
+        const result = await response.json();
+        if (response.status === 409 && ++retries <= UPLOAD_MAX_RETRIES) {
+            // 偏移量不一致：从服务端已写入的位置继续
+            offset = Number(response.headers.get('Upload-Offset'));
+            await new Promise(resolve => setTimeout(resolve, 1000));
+            continue;
+        }
+        if (!response.ok) {
+            throw new Error(result.detail || '上传失败');
+        }
+        if (!result.upload_id) {
+            return result;
+        }
+        offset = result.offset;
+        retries = 0;
+    }
+}
+
 // 上传文件（支持多文件）
 async function uploadFile() {
     const fileInput = document.getElementById('fileInput');
@@ -1325,19 +1489,11 @@ async function uploadFile() {
                 continue;
             }
             
-            const formData = new FormData();
-            formData.append('file', file);
-            
             try {
-                const response = await fetch('/api/files/upload', {
-                    method: 'POST',
-                    body: formData
+                await uploadFileInChunks(file, offset => {
+                    const percent = file.size ? Math.floor(offset / file.size * 100) : 0;
+                    uploadBtn.innerHTML = `<i class="fas fa-spinner fa-spin mr-2"></i>上传中 ${percent}%`;
                 });
-                const result = await response.json();
-                
-                if (!response.ok) {
-                    throw new Error(result.detail || '上传失败');
-                }
                 successCount += 1;
             } catch (e) {
                 failMessages.push(`${file.name}: ${e.message}`);
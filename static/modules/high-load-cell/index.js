@@ -1,6 +1,18 @@
 // 高负荷小区监控相关功能
 // noinspection ExceptionCaughtLocallyJS
 
+// 查询结果分页状态（数据按页从服务端加载，排序在服务端完成）
+const overloadState = {
+    params: null,
+    currentPage: 0,
+    totalPages: 0,
+    pageSize: 100,
+    sortField: null,
+    sortOrder: 'asc',
+    loadedCount: 0,
+    totalCount: 0
+};
+
 // 显示高负荷小区监控面板
 function showHighLoadCellPanel() {
     hideAllPanels();
@@ -31,6 +43,9 @@ function showHighLoadCellPanel() {
     if (startTimeInput && endTimeInput) {
         startTimeInput.value = formatDateTimeLocal(startTime);
         endTimeInput.value = formatDateTimeLocal(endTime);
+        
+        // 先刷新统计卡片（仅统计，不加载明细）
+        refreshOverloadStats();
     }
 }
 
@@ -71,96 +86,177 @@ async function queryOverloadData() {
     const startTimeFormatted = startTime.replace('T', ' ') + ':00';
     const endTimeFormatted = endTime.replace('T', ' ') + ':00';
     
+    overloadState.params = {
+        start_time: startTimeFormatted,
+        end_time: endTimeFormatted
+    };
+    await loadOverloadPage(1);
+}
+
+// 加载指定页（第1页替换表格，后续页追加到表格末尾）
+async function loadOverloadPage(page) {
     const loadingDiv = document.getElementById('overloadLoading');
     const noDataDiv = document.getElementById('overloadNoData');
     const dataTableDiv = document.getElementById('overloadDataTable');
+    const loadMoreBtn = document.getElementById('overloadLoadMore');
     
     try {
-        // 显示加载状态
-        loadingDiv.classList.remove('hidden');
-        noDataDiv.classList.add('hidden');
-        dataTableDiv.classList.add('hidden');
+        if (page === 1) {
+            // 显示加载状态
+            loadingDiv.classList.remove('hidden');
+            noDataDiv.classList.add('hidden');
+            dataTableDiv.classList.add('hidden');
+        } else {
+            loadMoreBtn.disabled = true;
+        }
         
-        const response = await axios.get('/api/query/overload', {
-            params: {
-                start_time: startTimeFormatted,
-                end_time: endTimeFormatted
-            }
-        });
+        const params = {
+            ...overloadState.params,
+            page: page,
+            page_size: overloadState.pageSize,
+            compact: true  // 紧凑格式：rows 为与 columns 顺序一致的值数组
+        };
+        if (overloadState.sortField) {
+            params.sort_field = overloadState.sortField;
+            params.sort_order = overloadState.sortOrder;
+        }
         
+        const response = await axios.get('/api/query/overload', { params });
         const result = response.data;
         
-        // 更新统计信息
-        document.getElementById('stat-4g-total').textContent = result.stats['4G'].total;
-        document.getElementById('stat-4g-burst').textContent = result.stats['4G'].burst;
-        document.getElementById('stat-5g-total').textContent = result.stats['5G'].total;
-        document.getElementById('stat-5g-burst').textContent = result.stats['5G'].burst;
+        overloadState.currentPage = result.current_page;
+        overloadState.totalPages = result.total_pages;
+        overloadState.totalCount = result.total_count;
+        overloadState.loadedCount = (page === 1 ? 0 : overloadState.loadedCount) + result.rows.length;
         
-        // 更新重要区域统计
-        document.getElementById('stat-4g-total-important').textContent = result.stats['4G'].total_important || 0;
-        document.getElementById('stat-4g-burst-important').textContent = result.stats['4G'].burst_important || 0;
-        document.getElementById('stat-5g-total-important').textContent = result.stats['5G'].total_important || 0;
-        document.getElementById('stat-5g-burst-important').textContent = result.stats['5G'].burst_important || 0;
+        // 更新统计信息（仅第1页返回统计）
+        if (result.stats) {
+            updateOverloadStats(result.stats);
+        }
         
         // 更新总记录数
         document.getElementById('overloadTotalCount').textContent = result.total_count;
+        document.getElementById('overloadLoadedCount').textContent = overloadState.loadedCount;
+        loadMoreBtn.classList.toggle('hidden', overloadState.currentPage >= overloadState.totalPages);
+        loadMoreBtn.disabled = false;
         
-        if (result.data.length === 0) {
-            loadingDiv.classList.add('hidden');
+        loadingDiv.classList.add('hidden');
+        if (result.total_count === 0) {
             noDataDiv.classList.remove('hidden');
         } else {
-            loadingDiv.classList.add('hidden');
             dataTableDiv.classList.remove('hidden');
-            renderOverloadTable(result.data);
+            renderOverloadTable(result.rows, result.columns, page > 1);
         }
         
     } catch (error) {
         loadingDiv.classList.add('hidden');
-        await showAlert('查询失败: ' + error.message, '错误');
+        loadMoreBtn.disabled = false;
+        const detail = error.response && error.response.data && error.response.data.detail;
+        await showAlert('查询失败: ' + (detail || error.message), '错误');
     }
 }
 
-// 渲染突发高负荷数据表格
-function renderOverloadTable(data) {
-    const header = document.getElementById('overloadTableHeader');
-    const body = document.getElementById('overloadTableBody');
+// 加载下一页
+async function loadMoreOverloadData() {
+    if (!overloadState.params || overloadState.currentPage >= overloadState.totalPages) {
+        return;
+    }
+    await loadOverloadPage(overloadState.currentPage + 1);
+}
+
+// 按列排序（在服务端排序后重新加载第1页）
+async function sortOverloadData(column) {
+    if (!overloadState.params) {
+        return;
+    }
+    if (overloadState.sortField === column) {
+        overloadState.sortOrder = overloadState.sortOrder === 'asc' ? 'desc' : 'asc';
+    } else {
+        overloadState.sortField = column;
+        overloadState.sortOrder = 'asc';
+    }
+    await loadOverloadPage(1);
+}
+
+// 更新统计卡片
+function updateOverloadStats(stats) {
+    document.getElementById('stat-4g-total').textContent = stats['4G'].total;
+    document.getElementById('stat-4g-burst').textContent = stats['4G'].burst;
+    document.getElementById('stat-5g-total').textContent = stats['5G'].total;
+    document.getElementById('stat-5g-burst').textContent = stats['5G'].burst;
     
-    if (data.length === 0) {
+    // 更新重要区域统计
+    document.getElementById('stat-4g-total-important').textContent = stats['4G'].total_important || 0;
+    document.getElementById('stat-4g-burst-important').textContent = stats['4G'].burst_important || 0;
+    document.getElementById('stat-5g-total-important').textContent = stats['5G'].total_important || 0;
+    document.getElementById('stat-5g-burst-important').textContent = stats['5G'].burst_important || 0;
+}
+
+// 仅刷新统计卡片（统计在服务端聚合，不传输明细数据）
+async function refreshOverloadStats() {
+    const startTimeInput = document.getElementById('overloadStartTime');
+    const endTimeInput = document.getElementById('overloadEndTime');
+    
+    if (!startTimeInput || !endTimeInput || !startTimeInput.value || !endTimeInput.value) {
         return;
     }
     
-    // 获取列名
-    const columns = Object.keys(data[0]);
+    try {
+        const response = await axios.get('/api/query/overload/stats', {
+            params: {
+                start_time: startTimeInput.value.replace('T', ' ') + ':00',
+                end_time: endTimeInput.value.replace('T', ' ') + ':00'
+            }
+        });
+        updateOverloadStats(response.data.stats);
+    } catch (error) {
+        console.error('刷新统计失败:', error);
+    }
+}
+
+// 渲染突发高负荷数据表格（rows 为值数组，append为true时追加到已有行之后）
+function renderOverloadTable(rows, columns, append = false) {
+    const header = document.getElementById('overloadTableHeader');
+    const body = document.getElementById('overloadTableBody');
     
-    // 渲染表头
-    header.innerHTML = '';
-    const headerRow = document.createElement('tr');
-    columns.forEach(column => {
-        const th = document.createElement('th');
-        th.className = 'px-3 py-2 text-left text-xs font-medium text-gray-500 uppercase tracking-wider border-b border-gray-300';
-        th.style.backgroundColor = '#f9fafb';
-        th.style.position = 'sticky';
-        th.style.top = '0';
-        th.style.zIndex = '20';
-        th.style.minWidth = '100px';
-        th.style.whiteSpace = 'nowrap';
-        th.textContent = column;
-        headerRow.appendChild(th);
-    });
-    header.appendChild(headerRow);
+    if (!append) {
+        // 渲染表头（点击表头按该列排序）
+        header.innerHTML = '';
+        const headerRow = document.createElement('tr');
+        columns.forEach(column => {
+            const th = document.createElement('th');
+            th.className = 'px-3 py-2 text-left text-xs font-medium text-gray-500 uppercase tracking-wider border-b border-gray-300 cursor-pointer hover:bg-gray-100';
+            th.style.backgroundColor = '#f9fafb';
+            th.style.position = 'sticky';
+            th.style.top = '0';
+            th.style.zIndex = '20';
+            th.style.minWidth = '100px';
+            th.style.whiteSpace = 'nowrap';
+            th.textContent = column;
+            if (overloadState.sortField === column) {
+                const icon = document.createElement('i');
+                icon.className = `fas fa-sort-${overloadState.sortOrder === 'asc' ? 'up' : 'down'} ml-1`;
+                th.appendChild(icon);
+            }
+            th.onclick = () => sortOverloadData(column);
+            headerRow.appendChild(th);
+        });
+        header.appendChild(headerRow);
+        body.innerHTML = '';
+    }
     
     // 渲染数据
-    body.innerHTML = '';
-    data.forEach((row) => {
+    const burstIndex = columns.indexOf('是否突发高负荷');
+    rows.forEach((row) => {
         const tr = document.createElement('tr');
         tr.className = 'border-b border-gray-200 hover:bg-gray-50';
         
         // 根据是否突发高负荷设置行背景色
-        if (row['是否突发高负荷'] === '是') {
+        if (burstIndex >= 0 && row[burstIndex] === '是') {
             tr.classList.add('bg-red-50');
         }
         
-        columns.forEach(column => {
+        columns.forEach((column, columnIndex) => {
             const td = document.createElement('td');
             td.className = 'px-3 py-2 text-sm text-gray-900';
             td.style.minWidth = '100px';
@@ -169,7 +265,7 @@ function renderOverloadTable(data) {
             td.style.textOverflow = 'ellipsis';
             td.style.whiteSpace = 'nowrap';
             
-            let cellValue = row[column] || '';
+            let cellValue = row[columnIndex] || '';
             
             // 格式化数值显示
             if (column === '上行利用率' || column === '下行利用率') {
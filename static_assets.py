@@ -0,0 +1,178 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+静态资源模块 - 为前端资源生成带内容哈希的地址，支持长期缓存和预压缩
+
+- 每个静态文件按内容计算哈希，地址形如 /assets/libs/all.min.<哈希>.css；
+  内容变化后地址随之变化，因此可以设置 immutable 长期缓存
+- CSS 中 url(...) 引用的字体等资源改写为带哈希的地址（被引用的文件先计算哈希）
+- index.html 中引用 static/ 下文件的地址改写为带哈希的地址，首页本身不缓存
+- 文本类资源首次请求时生成 gzip/brotli 压缩版本并保存在内存中，按浏览器的
+  Accept-Encoding 直接返回压缩版本（brotli 为可选依赖）
+- 文件修改时间或大小变化时（开发环境修改前端文件）重新生成清单
+"""
+import gzip
+import hashlib
+import mimetypes
+import posixpath
+import re
+import threading
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+from compression import COMPRESSIBLE_TYPES, brotli, choose_encoding
+
+ASSETS_PREFIX = "/assets/"
+INDEX_FILE = "index.html"
+# 哈希长度（十六进制字符数）
+HASH_LENGTH = 12
+
+# 常用资源的内容类型（Windows 注册表中的类型可能不正确，不依赖 mimetypes）
+MEDIA_TYPES = {
+    ".html": "text/html; charset=utf-8",
+    ".css": "text/css; charset=utf-8",
+    ".js": "text/javascript; charset=utf-8",
+    ".svg": "image/svg+xml",
+    ".woff": "font/woff",
+    ".woff2": "font/woff2",
+}
+
+# CSS 中的 url(...) 引用
+CSS_URL_RE = re.compile(r"url\(\s*(['\"]?)([^'\")]+)\1\s*\)")
+# index.html 中引用 static/ 下文件的带引号地址（属性和脚本中的字符串）
+INDEX_URL_RE = re.compile(r"(['\"])/?static/([^'\"?#]+)\1")
+
+
+class Asset:
+    """单个静态资源（原始内容及按需生成的压缩版本）"""
+    
+    def __init__(self, path: str, content: bytes, digest: str):
+        self.path = path
+        self.content = content
+        self.digest = digest
+        self.media_type = (
+            MEDIA_TYPES.get(posixpath.splitext(path)[1].lower())
+            or mimetypes.guess_type(path)[0]
+            or "application/octet-stream"
+        )
+        self.compressible = self.media_type.startswith(COMPRESSIBLE_TYPES)
+        self._encoded: Dict[str, bytes] = {}
+        self._lock = threading.Lock()
+    
+    def etag(self, encoding: Optional[str] = None) -> str:
+        """各编码版本内容不同，ETag带上编码后缀以免互相命中"""
+        return f'"{self.digest}-{encoding}"' if encoding else f'"{self.digest}"'
+    
+    def encoded(self, encoding: str) -> bytes:
+        """获取压缩版本（首次调用时生成）"""
+        with self._lock:
+            data = self._encoded.get(encoding)
+            if data is None:
+                if encoding == 'br':
+                    data = brotli.compress(self.content, quality=9)
+                else:
+                    data = gzip.compress(self.content, compresslevel=9, mtime=0)
+                self._encoded[encoding] = data
+            return data
+
+
+def fingerprinted_name(path: str, digest: str) -> str:
+    """在扩展名前插入哈希：libs/all.min.css -> libs/all.min.<哈希>.css"""
+    directory, filename = posixpath.split(path)
+    stem, dot, extension = filename.rpartition('.')
+    name = f"{stem}.{digest}.{extension}" if dot else f"{filename}.{digest}"
+    return posixpath.join(directory, name)
+
+
+class StaticAssets:
+    """静态资源清单（原始路径 -> 带哈希地址）"""
+    
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+        self._signature = None
+        self._urls: Dict[str, str] = {}
+        self._assets: Dict[str, Asset] = {}
+        self._index: Optional[bytes] = None
+        self._lock = threading.Lock()
+        self.refresh()
+    
+    def _scan(self) -> Tuple:
+        """目录中所有文件的 (相对路径, 修改时间, 大小)"""
+        entries = []
+        for path in sorted(self.directory.rglob("*")):
+            if path.is_file():
+                stat = path.stat()
+                entries.append((path.relative_to(self.directory).as_posix(), stat.st_mtime_ns, stat.st_size))
+        return tuple(entries)
+    
+    def refresh(self):
+        """文件变化时重新生成清单"""
+        signature = self._scan()
+        if signature == self._signature:
+            return
+        with self._lock:
+            if signature == self._signature:
+                return
+            self._build([entry[0] for entry in signature])
+            self._signature = signature
+    
+    def _build(self, paths):
+        """计算哈希并改写引用：先处理非CSS文件，CSS中的引用改写后再计算CSS自身的哈希"""
+        urls: Dict[str, str] = {}
+        assets: Dict[str, Asset] = {}
+        
+        def add(path: str, content: bytes):
+            digest = hashlib.sha256(content).hexdigest()[:HASH_LENGTH]
+            name = fingerprinted_name(path, digest)
+            urls[path] = ASSETS_PREFIX + name
+            assets[name] = Asset(path, content, digest)
+        
+        stylesheets = []
+        for path in paths:
+            if path == INDEX_FILE:
+                continue
+            if path.endswith(".css"):
+                stylesheets.append(path)
+                continue
+            add(path, (self.directory / path).read_bytes())
+        
+        for path in stylesheets:
+            base = posixpath.dirname(path)
+            
+            def replace(match):
+                target = match.group(2).strip()
+                resolved = posixpath.normpath(posixpath.join(base, target.split('?')[0].split('#')[0]))
+                url = urls.get(resolved)
+                return f"url({url})" if url else match.group(0)
+            
+            text = (self.directory / path).read_text(encoding='utf-8')
+            add(path, CSS_URL_RE.sub(replace, text).encode('utf-8'))
+        
+        index_path = self.directory / INDEX_FILE
+        index = None
+        if index_path.exists():
+            def replace_index(match):
+                url = urls.get(match.group(2))
+                return f"{match.group(1)}{url}{match.group(1)}" if url else match.group(0)
+            index = INDEX_URL_RE.sub(replace_index, index_path.read_text(encoding='utf-8')).encode('utf-8')
+        
+        self._urls = urls
+        self._assets = assets
+        self._index = index
+    
+    def index(self) -> Optional[bytes]:
+        """获取改写了资源地址的首页内容"""
+        self.refresh()
+        return self._index
+    
+    def lookup(self, name: str, accept_encoding: str) -> Optional[Tuple[Asset, Optional[str]]]:
+        """
+        按带哈希的地址查找资源，并按 Accept-Encoding 选择压缩方式
+        
+        Returns:
+            (资源, 压缩方式或None)；地址不存在时返回None
+        """
+        asset = self._assets.get(name)
+        if asset is None:
+            return None
+        encoding = choose_encoding(accept_encoding) if asset.compressible else None
+        return asset, encoding
@@ -0,0 +1,563 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+表元数据模块 - 维护数据表的写入代数、列取值草图和列统计信息
+
+元数据保存在数据库内以 _mh_ 开头的内部表中，数据导入时按批次增量更新，
+删除数据时按删除范围扣减，供筛选下拉、统计接口和查询选择性估计直接读取，
+避免临时扫描大表。
+"""
+from typing import Dict, List, Any, Optional, Tuple
+import pandas as pd
+
+# 内部表前缀（不在数据库管理界面中展示）
+INTERNAL_TABLE_PREFIX = '_mh_'
+
+GENERATION_TABLE = '_mh_table_generation'
+SKETCH_TABLE = '_mh_column_sketch'
+SKETCH_STATE_TABLE = '_mh_column_sketch_state'
+STATS_TABLE = '_mh_column_stats'
+DIRTY_TABLE = '_mh_dirty_tables'
+
+# 每列最多保留的高频取值个数
+SKETCH_CAPACITY = 200
+
+
+def is_internal_table(table_name: str) -> bool:
+    """判断是否为内部元数据表"""
+    return table_name.startswith(INTERNAL_TABLE_PREFIX)
+
+
+def _to_number(value) -> Optional[float]:
+    """标量数值转换，与 pandas.to_numeric(errors='coerce') 保持一致，无法转换时返回None"""
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        number = float(value)
+    else:
+        try:
+            number = float(str(value).strip())
+        except ValueError:
+            return None
+    return None if number != number else number
+
+
+def to_numeric(series: pd.Series) -> pd.Series:
+    """按 mh_num 的规则把列转换为数值（无法转换的值为NaN），使导入时的计算与SQL中的口径一致"""
+    if pd.api.types.is_numeric_dtype(series):
+        return series.astype(float)
+    return pd.to_numeric(series.map(_to_number), errors='coerce')
+
+
+def register_functions(conn):
+    """在连接上注册元数据计算所需的SQL函数"""
+    conn.create_function('mh_num', 1, _to_number, deterministic=True)
+
+
+def ensure_meta_tables(conn):
+    """创建元数据表（如果不存在）"""
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {GENERATION_TABLE} (
+            table_name TEXT PRIMARY KEY,
+            generation INTEGER NOT NULL DEFAULT 0,
+            updated_at REAL
+        )
+    """)
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {SKETCH_TABLE} (
+            table_name TEXT NOT NULL,
+            column_name TEXT NOT NULL,
+            value TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            error INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (table_name, column_name, value)
+        )
+    """)
+    # floor: 未保留在草图中的取值，其计数不会超过该值；exact: 草图是否包含全部取值
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {SKETCH_STATE_TABLE} (
+            table_name TEXT NOT NULL,
+            column_name TEXT NOT NULL,
+            floor INTEGER NOT NULL DEFAULT 0,
+            exact INTEGER NOT NULL DEFAULT 1,
+            PRIMARY KEY (table_name, column_name)
+        )
+    """)
+    # 导入过程中标记，数据和派生数据全部写入后清除；残留的标记表示派生数据缺少部分导入的数据
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {DIRTY_TABLE} (
+            table_name TEXT PRIMARY KEY,
+            marked_at REAL
+        )
+    """)
+    # bounds_stale: 删除数据后最值可能失效，需要在读取时重新计算
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {STATS_TABLE} (
+            table_name TEXT NOT NULL,
+            column_name TEXT NOT NULL,
+            row_count INTEGER NOT NULL DEFAULT 0,
+            null_count INTEGER NOT NULL DEFAULT 0,
+            numeric_count INTEGER NOT NULL DEFAULT 0,
+            numeric_sum REAL NOT NULL DEFAULT 0,
+            min_value REAL,
+            max_value REAL,
+            bounds_stale INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (table_name, column_name)
+        )
+    """)
+
+
+def get_generation(conn, table_name: str) -> int:
+    """获取表的写入代数（每次导入或删除数据后递增）"""
+    row = conn.execute(
+        f"SELECT generation FROM {GENERATION_TABLE} WHERE table_name = ?", (table_name,)
+    ).fetchone()
+    return row[0] if row else 0
+
+
+def bump_generation(conn, table_name: str):
+    """递增表的写入代数"""
+    conn.execute(f"""
+        INSERT INTO {GENERATION_TABLE} (table_name, generation, updated_at)
+        VALUES (?, 1, strftime('%s', 'now'))
+        ON CONFLICT(table_name) DO UPDATE SET
+            generation = generation + 1,
+            updated_at = excluded.updated_at
+    """, (table_name,))
+
+
+def mark_dirty(conn, table_name: str):
+    """标记表正在导入（派生数据可能与表中数据不一致）"""
+    conn.execute(
+        f"INSERT OR REPLACE INTO {DIRTY_TABLE} (table_name, marked_at) VALUES (?, strftime('%s', 'now'))",
+        (table_name,)
+    )
+
+
+def clear_dirty(conn, table_name: str):
+    """清除导入标记（与派生数据的更新在同一事务中调用）"""
+    conn.execute(f"DELETE FROM {DIRTY_TABLE} WHERE table_name = ?", (table_name,))
+
+
+def dirty_tables(conn) -> List[str]:
+    """获取带有导入标记的表"""
+    return [row[0] for row in conn.execute(f"SELECT table_name FROM {DIRTY_TABLE}")]
+
+
+def _merge_counts(conn, table_name: str, column_name: str, counts: Dict[str, int], sign: int = 1):
+    """
+    将一批取值计数合并到列草图中（sign=-1 表示扣减）
+    
+    合并后只保留计数最高的 SKETCH_CAPACITY 个取值，被淘汰取值的最大计数
+    记入 floor，作为草图外取值计数的上界。
+    """
+    state = conn.execute(
+        f"SELECT floor, exact FROM {SKETCH_STATE_TABLE} WHERE table_name = ? AND column_name = ?",
+        (table_name, column_name)
+    ).fetchone()
+    floor, exact = state if state else (0, 1)
+    
+    merged = {
+        value: [count, error]
+        for value, count, error in conn.execute(
+            f"SELECT value, count, error FROM {SKETCH_TABLE} WHERE table_name = ? AND column_name = ?",
+            (table_name, column_name)
+        )
+    }
+    for value, count in counts.items():
+        if value in merged:
+            merged[value][0] += sign * count
+        elif sign > 0:
+            # 该取值之前可能被淘汰过，真实计数最多再多 floor
+            merged[value] = [count, floor]
+    
+    entries = sorted(
+        ((value, count, error) for value, (count, error) in merged.items() if count > 0),
+        key=lambda item: item[1],
+        reverse=True
+    )
+    if len(entries) > SKETCH_CAPACITY:
+        evicted = entries[SKETCH_CAPACITY:]
+        entries = entries[:SKETCH_CAPACITY]
+        floor = max(floor, max(count + error for _, count, error in evicted))
+        exact = 0
+    
+    conn.execute(
+        f"DELETE FROM {SKETCH_TABLE} WHERE table_name = ? AND column_name = ?",
+        (table_name, column_name)
+    )
+    conn.executemany(
+        f"INSERT INTO {SKETCH_TABLE} (table_name, column_name, value, count, error) VALUES (?, ?, ?, ?, ?)",
+        [(table_name, column_name, value, count, error) for value, count, error in entries]
+    )
+    conn.execute(f"""
+        INSERT INTO {SKETCH_STATE_TABLE} (table_name, column_name, floor, exact) VALUES (?, ?, ?, ?)
+        ON CONFLICT(table_name, column_name) DO UPDATE SET floor = excluded.floor, exact = excluded.exact
+    """, (table_name, column_name, floor, exact))
+
+
+def _sketched_columns(conn, table_name: str) -> List[str]:
+    """获取已建立草图的列"""
+    return [
+        row[0] for row in conn.execute(
+            f"SELECT column_name FROM {SKETCH_STATE_TABLE} WHERE table_name = ?", (table_name,)
+        )
+    ]
+
+
+def _batch_is_whole_table(conn, table_name: str, batch_rows: int) -> bool:
+    """判断表中是否只有刚导入的这一批数据（有界计数，不扫描全表）"""
+    existing = conn.execute(
+        f"SELECT COUNT(*) FROM (SELECT 1 FROM [{table_name}] LIMIT ?)", (batch_rows + 1,)
+    ).fetchone()[0]
+    return existing == batch_rows
+
+
+def update_sketches(conn, table_name: str, df: pd.DataFrame):
+    """
+    用新导入的一批数据增量更新列草图
+    
+    只更新已经覆盖全表的草图；如果表在本批之前已有数据但尚未建立草图，
+    则跳过，由后台维护线程统一全表构建。
+    """
+    sketched = set(_sketched_columns(conn, table_name))
+    if not sketched:
+        # 表中只有本批数据时可以直接从本批建立草图
+        if not _batch_is_whole_table(conn, table_name, len(df)):
+            return
+        sketched = set(df.columns)
+    
+    for column_name in df.columns:
+        if column_name not in sketched:
+            continue
+        counts = df[column_name].dropna().astype(str).value_counts()
+        _merge_counts(conn, table_name, column_name, counts.to_dict())
+
+
+def _stats_columns(conn, table_name: str) -> List[str]:
+    """获取已建立统计信息的列"""
+    return [
+        row[0] for row in conn.execute(
+            f"SELECT column_name FROM {STATS_TABLE} WHERE table_name = ?", (table_name,)
+        )
+    ]
+
+
+def get_row_count(conn, table_name: str) -> Optional[int]:
+    """从列统计信息读取表的行数（尚未建立统计信息时返回None）"""
+    row = conn.execute(
+        f"SELECT MAX(row_count) FROM {STATS_TABLE} WHERE table_name = ?", (table_name,)
+    ).fetchone()
+    return row[0] if row and row[0] is not None else None
+
+
+def _upsert_stats(conn, table_name: str, column_name: str, row_count: int, null_count: int,
+                  numeric_count: int, numeric_sum: float, min_value, max_value, sign: int = 1):
+    """
+    将一批数据的统计量合并到列统计信息中（sign=-1 表示扣减）
+    
+    计数与求和可以直接加减；扣减时如果删除的数据触及当前最值，
+    标记最值失效，读取时再重新计算。
+    """
+    current = conn.execute(
+        f"SELECT min_value, max_value FROM {STATS_TABLE} WHERE table_name = ? AND column_name = ?",
+        (table_name, column_name)
+    ).fetchone()
+    
+    if current is None:
+        if sign < 0:
+            return
+        conn.execute(f"""
+            INSERT INTO {STATS_TABLE} (table_name, column_name, row_count, null_count,
+                                       numeric_count, numeric_sum, min_value, max_value)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, (table_name, column_name, row_count, null_count, numeric_count, numeric_sum, min_value, max_value))
+        return
+    
+    current_min, current_max = current
+    if sign > 0:
+        new_min = min_value if current_min is None else (current_min if min_value is None else min(current_min, min_value))
+        new_max = max_value if current_max is None else (current_max if max_value is None else max(current_max, max_value))
+        conn.execute(f"""
+            UPDATE {STATS_TABLE} SET
+                row_count = row_count + ?, null_count = null_count + ?,
+                numeric_count = numeric_count + ?, numeric_sum = numeric_sum + ?,
+                min_value = ?, max_value = ?
+            WHERE table_name = ? AND column_name = ?
+        """, (row_count, null_count, numeric_count, numeric_sum, new_min, new_max, table_name, column_name))
+    else:
+        touches_bounds = (
+            (min_value is not None and current_min is not None and min_value <= current_min) or
+            (max_value is not None and current_max is not None and max_value >= current_max)
+        )
+        conn.execute(f"""
+            UPDATE {STATS_TABLE} SET
+                row_count = MAX(row_count - ?, 0), null_count = MAX(null_count - ?, 0),
+                numeric_count = MAX(numeric_count - ?, 0), numeric_sum = numeric_sum - ?,
+                bounds_stale = MAX(bounds_stale, ?)
+            WHERE table_name = ? AND column_name = ?
+        """, (row_count, null_count, numeric_count, numeric_sum, 1 if touches_bounds else 0,
+              table_name, column_name))
+
+
+def update_stats(conn, table_name: str, df: pd.DataFrame):
+    """
+    用新导入的一批数据增量更新列统计信息（不重新扫描已有数据）
+    
+    与草图相同，表在本批之前已有数据但尚未建立统计信息时跳过，由首次读取时全表构建。
+    """
+    if not _stats_columns(conn, table_name) and not _batch_is_whole_table(conn, table_name, len(df)):
+        return
+    
+    row_count = len(df)
+    for column_name in df.columns:
+        series = df[column_name]
+        if pd.api.types.is_datetime64_any_dtype(series):
+            # 时间列入库后为文本，不参与数值统计
+            numeric = pd.Series([], dtype=float)
+        elif pd.api.types.is_bool_dtype(series):
+            numeric = series.astype(float)
+        else:
+            numeric = pd.to_numeric(series, errors='coerce')
+        numeric = numeric.dropna()
+        has_numeric = len(numeric) > 0
+        _upsert_stats(
+            conn, table_name, column_name,
+            row_count=row_count,
+            null_count=int(series.isna().sum()),
+            numeric_count=int(len(numeric)),
+            numeric_sum=float(numeric.sum()) if has_numeric else 0.0,
+            min_value=float(numeric.min()) if has_numeric else None,
+            max_value=float(numeric.max()) if has_numeric else None
+        )
+
+
+def _aggregate_stats(conn, table_name: str, columns: List[str], where_clause: str = "", params: List[Any] = None):
+    """一次扫描计算多列的统计量"""
+    register_functions(conn)
+    select_parts = ["COUNT(*)"]
+    for column_name in columns:
+        select_parts.extend([
+            f"SUM([{column_name}] IS NULL)",
+            f"COUNT(mh_num([{column_name}]))",
+            f"TOTAL(mh_num([{column_name}]))",
+            f"MIN(mh_num([{column_name}]))",
+            f"MAX(mh_num([{column_name}]))",
+        ])
+    where_sql = f" WHERE {where_clause}" if where_clause else ""
+    row = conn.execute(f"SELECT {', '.join(select_parts)} FROM [{table_name}]{where_sql}", params or []).fetchone()
+    row_count = row[0]
+    result = {}
+    for i, column_name in enumerate(columns):
+        null_count, numeric_count, numeric_sum, min_value, max_value = row[1 + i * 5: 6 + i * 5]
+        result[column_name] = (row_count, null_count or 0, numeric_count, numeric_sum, min_value, max_value)
+    return result
+
+
+def rebuild_stats(conn, table_name: str):
+    """全表扫描重建列统计信息"""
+    columns = [row[1] for row in conn.execute(f"PRAGMA table_info([{table_name}])")]
+    conn.execute(f"DELETE FROM {STATS_TABLE} WHERE table_name = ?", (table_name,))
+    for column_name, values in _aggregate_stats(conn, table_name, columns).items():
+        _upsert_stats(conn, table_name, column_name, *values)
+
+
+def refresh_stats(conn, table_name: str) -> bool:
+    """
+    全表构建尚未建立的统计信息，并重新计算删除数据后失效的最值
+    
+    Returns:
+        是否执行了扫描
+    """
+    if not _stats_columns(conn, table_name):
+        rebuild_stats(conn, table_name)
+        return True
+    
+    stale_columns = [
+        row[0] for row in conn.execute(
+            f"SELECT column_name FROM {STATS_TABLE} WHERE table_name = ? AND bounds_stale = 1", (table_name,)
+        )
+    ]
+    if stale_columns:
+        register_functions(conn)
+        select_parts = []
+        for column_name in stale_columns:
+            select_parts.extend([f"MIN(mh_num([{column_name}]))", f"MAX(mh_num([{column_name}]))"])
+        row = conn.execute(f"SELECT {', '.join(select_parts)} FROM [{table_name}]").fetchone()
+        for i, column_name in enumerate(stale_columns):
+            conn.execute(
+                f"UPDATE {STATS_TABLE} SET min_value = ?, max_value = ?, bounds_stale = 0 "
+                f"WHERE table_name = ? AND column_name = ?",
+                (row[i * 2], row[i * 2 + 1], table_name, column_name)
+            )
+        return True
+    return False
+
+
+def get_stats(conn, table_name: str) -> List[Dict[str, Any]]:
+    """
+    读取列统计信息，必要时全表构建或重新计算失效的最值
+    
+    后台维护线程会提前完成构建，读取时通常不需要扫描表。
+    
+    Returns:
+        每列的统计信息列表
+    """
+    refresh_stats(conn, table_name)
+    
+    stats = []
+    for column_name, row_count, null_count, numeric_count, numeric_sum, min_value, max_value in conn.execute(f"""
+        SELECT column_name, row_count, null_count, numeric_count, numeric_sum, min_value, max_value
+        FROM {STATS_TABLE} WHERE table_name = ?
+    """, (table_name,)):
+        stats.append({
+            "column": column_name,
+            "row_count": row_count,
+            "null_count": null_count,
+            "numeric_count": numeric_count,
+            "min": min_value,
+            "max": max_value,
+            "avg": numeric_sum / numeric_count if numeric_count else None
+        })
+    return stats
+
+
+def estimate_selectivity(conn, table_name: str, column_name: str, rule: str, value: str) -> Optional[float]:
+    """
+    根据已维护的统计信息和草图估计筛选条件的选择性（满足条件的行占比）
+    
+    只读取已有元数据，不触发构建；无法估计时返回None。
+    """
+    row = conn.execute(
+        f"SELECT row_count, min_value, max_value, bounds_stale FROM {STATS_TABLE} "
+        f"WHERE table_name = ? AND column_name = ?",
+        (table_name, column_name)
+    ).fetchone()
+    if row is None or not row[0]:
+        return None
+    row_count, min_value, max_value, bounds_stale = row
+    
+    if rule == 'equals':
+        hit = conn.execute(
+            f"SELECT count FROM {SKETCH_TABLE} WHERE table_name = ? AND column_name = ? AND value = ?",
+            (table_name, column_name, value)
+        ).fetchone()
+        if hit:
+            return min(1.0, hit[0] / row_count)
+        state = conn.execute(
+            f"SELECT floor, exact FROM {SKETCH_STATE_TABLE} WHERE table_name = ? AND column_name = ?",
+            (table_name, column_name)
+        ).fetchone()
+        if state is None:
+            return None
+        floor, exact = state
+        return 0.0 if exact else min(1.0, floor / row_count)
+    
+    if rule in ('greater', 'greater_equal', 'less', 'less_equal'):
+        if bounds_stale or min_value is None or max_value is None:
+            return None
+        try:
+            number = float(value)
+        except ValueError:
+            return None
+        if max_value == min_value:
+            below = 1.0 if number > min_value else 0.0
+        else:
+            below = min(1.0, max(0.0, (number - min_value) / (max_value - min_value)))
+        return 1.0 - below if rule in ('greater', 'greater_equal') else below
+    
+    return None
+
+
+def subtract_range(conn, table_name: str, where_clause: str, params: List[Any]):
+    """在删除数据前（与删除在同一事务中），从列草图和统计信息中扣减将被删除的记录"""
+    stats_columns = _stats_columns(conn, table_name)
+    if stats_columns:
+        for column_name, values in _aggregate_stats(conn, table_name, stats_columns, where_clause, params).items():
+            if values[0]:
+                _upsert_stats(conn, table_name, column_name, *values, sign=-1)
+    
+    for column_name in _sketched_columns(conn, table_name):
+        counts = {
+            str(value): count
+            for value, count in conn.execute(
+                f"SELECT [{column_name}], COUNT(*) FROM [{table_name}] "
+                f"WHERE {where_clause} AND [{column_name}] IS NOT NULL GROUP BY [{column_name}]",
+                params
+            )
+        }
+        if counts:
+            _merge_counts(conn, table_name, column_name, counts, sign=-1)
+
+
+def reset_table(conn, table_name: str):
+    """删除表的全部草图和统计信息（表被清空或结构变化时调用）"""
+    conn.execute(f"DELETE FROM {SKETCH_TABLE} WHERE table_name = ?", (table_name,))
+    conn.execute(f"DELETE FROM {SKETCH_STATE_TABLE} WHERE table_name = ?", (table_name,))
+    conn.execute(f"DELETE FROM {STATS_TABLE} WHERE table_name = ?", (table_name,))
+
+
+def rebuild_sketch(conn, table_name: str, column_name: str):
+    """全表扫描重建单列草图"""
+    counts = {
+        str(value): count
+        for value, count in conn.execute(
+            f"SELECT [{column_name}], COUNT(*) FROM [{table_name}] "
+            f"WHERE [{column_name}] IS NOT NULL GROUP BY [{column_name}]"
+        )
+    }
+    conn.execute(
+        f"DELETE FROM {SKETCH_TABLE} WHERE table_name = ? AND column_name = ?",
+        (table_name, column_name)
+    )
+    conn.execute(
+        f"DELETE FROM {SKETCH_STATE_TABLE} WHERE table_name = ? AND column_name = ?",
+        (table_name, column_name)
+    )
+    _merge_counts(conn, table_name, column_name, counts)
+
+
+def build_sketches(conn, table_name: str) -> bool:
+    """
+    为尚未建立草图的列全表构建草图（由后台维护线程调用）
+    
+    Returns:
+        是否执行了扫描
+    """
+    sketched = set(_sketched_columns(conn, table_name))
+    missing = [
+        row[1] for row in conn.execute(f"PRAGMA table_info([{table_name}])")
+        if row[1] not in sketched
+    ]
+    for column_name in missing:
+        rebuild_sketch(conn, table_name, column_name)
+    return bool(missing)
+
+
+def get_sketch(conn, table_name: str, column_name: str, limit: int) -> Optional[Tuple[List[Tuple[str, int]], bool]]:
+    """
+    读取列草图中计数最高的取值
+    
+    Returns:
+        (取值计数列表, 是否精确)；草图不存在时返回None
+    """
+    state = conn.execute(
+        f"SELECT exact FROM {SKETCH_STATE_TABLE} WHERE table_name = ? AND column_name = ?",
+        (table_name, column_name)
+    ).fetchone()
+    if state is None:
+        return None
+    rows = conn.execute(
+        f"SELECT value, count FROM {SKETCH_TABLE} WHERE table_name = ? AND column_name = ? "
+        f"ORDER BY count DESC LIMIT ?",
+        (table_name, column_name, limit)
+    ).fetchall()
+    return rows, bool(state[0])
+
+
+def on_batch_ingested(conn, table_name: str, df: pd.DataFrame):
+    """数据导入后更新元数据（在导入所用的同一连接中调用）"""
+    ensure_meta_tables(conn)
+    update_sketches(conn, table_name, df)
+    update_stats(conn, table_name, df)
+    bump_generation(conn, table_name)
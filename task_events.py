@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+任务事件模块 - 任务状态变化时通知等待中的订阅者（用于SSE推送任务进度）
+
+任务状态字典 TaskStore 中的每个任务状态在修改任意字段时递增该任务的版本号，
+并唤醒等待该任务的协程；后台线程照常修改状态字典，无需额外调用通知函数。
+订阅者记录已发送的版本号，等待时版本号已变化则立即返回，不会漏掉更新。
+"""
+import asyncio
+import threading
+from typing import Any, Dict, Set
+
+
+class TaskState(dict):
+    """单个任务的状态（修改字段时通知所属的 TaskStore）"""
+    
+    def __init__(self, store: "TaskStore", task_id: str, status: Dict[str, Any]):
+        super().__init__(status)
+        self._store = store
+        self._task_id = task_id
+    
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self._store.publish(self._task_id)
+    
+    def update(self, *args, **kwargs):
+        super().update(*args, **kwargs)
+        self._store.publish(self._task_id)
+    
+    def copy(self) -> Dict[str, Any]:
+        return dict(self)
+
+
+class TaskStore(dict):
+    """任务状态字典（task_id -> 任务状态），任务状态变化时唤醒订阅者"""
+    
+    def __init__(self):
+        super().__init__()
+        self._lock = threading.Lock()
+        self._versions: Dict[str, int] = {}
+        self._waiters: Dict[str, Set[asyncio.Future]] = {}
+    
+    def __setitem__(self, task_id: str, status: Dict[str, Any]):
+        super().__setitem__(task_id, TaskState(self, task_id, status))
+        self.publish(task_id)
+    
+    def __delitem__(self, task_id: str):
+        super().__delitem__(task_id)
+        self.publish(task_id)
+    
+    def version(self, task_id: str) -> int:
+        """任务状态的当前版本号"""
+        with self._lock:
+            return self._versions.get(task_id, 0)
+    
+    def publish(self, task_id: str):
+        """递增版本号并唤醒等待该任务的协程（可在任意线程中调用）"""
+        with self._lock:
+            self._versions[task_id] = self._versions.get(task_id, 0) + 1
+            waiters = self._waiters.pop(task_id, set())
+        for future in waiters:
+            try:
+                future.get_loop().call_soon_threadsafe(_resolve, future)
+            except RuntimeError:
+                # 订阅者所在的事件循环已关闭
+                pass
+    
+    async def wait(self, task_id: str, seen_version: int, timeout: float) -> int:
+        """
+        等待任务状态在 seen_version 之后发生变化
+        
+        Returns:
+            当前版本号（超时返回时可能与 seen_version 相同）
+        """
+        future = asyncio.get_running_loop().create_future()
+        with self._lock:
+            current = self._versions.get(task_id, 0)
+            if current != seen_version:
+                return current
+            self._waiters.setdefault(task_id, set()).add(future)
+        try:
+            await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            with self._lock:
+                waiters = self._waiters.get(task_id)
+                if waiters is not None:
+                    waiters.discard(future)
+                    if not waiters:
+                        del self._waiters[task_id]
+        return self.version(task_id)
+
+
+def _resolve(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
@@ -0,0 +1,304 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+文件上传模块 - 上传内容分块写入磁盘，支持断点续传
+
+- 上传内容按块写入数据目录下 .uploads 文件夹中的临时文件，同时计算SHA-256，
+  不在内存中保存完整文件；写完后原子重命名到数据目录，不会出现写了一半的数据文件
+- 断点续传：先创建上传会话，再按偏移量分块追加内容；连接中断后查询已写入的
+  字节数，从该位置继续上传。相同文件名、大小和客户端标识的会话复用同一个ID，
+  页面刷新后重新选择同一文件也能继续上传
+- 创建会话时提供了SHA-256的，完成时校验内容，不一致则丢弃已上传的内容
+- 超过保留时间未完成的上传会话在创建新会话时清理
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Optional
+from starlette.concurrency import run_in_threadpool
+
+# 支持上传的文件类型
+ALLOWED_EXTENSIONS = ('.xlsx', '.xls', '.csv')
+# 计算完整文件哈希时每次读取的字节数
+READ_SIZE = 1024 * 1024
+
+
+class UploadConflict(Exception):
+    """上传偏移量与已写入的字节数不一致，或同一会话正在上传"""
+    
+    def __init__(self, message: str, offset: int):
+        super().__init__(message)
+        self.offset = offset
+
+
+def safe_filename(filename: Optional[str]) -> str:
+    """
+    检查上传文件名：只保留文件名部分（防止路径遍历），并检查文件类型
+    
+    Raises:
+        ValueError: 文件名为空、无效或文件类型不支持
+    """
+    if not filename:
+        raise ValueError("文件名不能为空")
+    # 同时按 / 和 \ 截取文件名部分（浏览器在Windows上可能提交完整路径）
+    # 注意：这里不删除中文字符，因为用户可能需要上传中文文件名的文件
+    name = re.split(r'[\\/]', filename)[-1].strip()
+    if not name or name in ('.', '..'):
+        raise ValueError("文件名无效")
+    if Path(name).suffix.lower() not in ALLOWED_EXTENSIONS:
+        raise ValueError(f"不支持的文件类型。仅支持: {', '.join(ALLOWED_EXTENSIONS)}")
+    return name
+
+
+def file_sha256(path: Path) -> str:
+    """分块读取计算文件的SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(READ_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _write(f, digest, chunk: bytes):
+    """写入一块数据并更新哈希（在线程池中执行）"""
+    f.write(chunk)
+    digest.update(chunk)
+
+
+class Uploads:
+    """文件上传管理"""
+    
+    def __init__(self, data_dir: Path, keep_seconds: float = 24 * 3600):
+        """
+        初始化文件上传管理
+        
+        Args:
+            data_dir: 数据目录（上传完成的文件保存位置）
+            keep_seconds: 未完成的上传会话的保留时间（秒）
+        """
+        self.data_dir = Path(data_dir)
+        self.upload_dir = self.data_dir / ".uploads"
+        self.keep_seconds = keep_seconds
+        self._lock = threading.Lock()
+        # 正在写入的会话ID
+        self._active = set()
+        # 会话ID -> (哈希对象, 已计算哈希的字节数)；服务重启后丢失，完成时重新计算
+        self._digests: Dict[str, Any] = {}
+    
+    def _paths(self, upload_id: str):
+        """会话描述文件和临时文件的路径"""
+        return self.upload_dir / f"{upload_id}.json", self.upload_dir / f"{upload_id}.part"
+    
+    def _load(self, upload_id: str) -> Dict[str, Any]:
+        """读取会话描述"""
+        if not re.fullmatch(r'[0-9a-f]{40}', upload_id):
+            raise KeyError(upload_id)
+        meta_path, _ = self._paths(upload_id)
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            raise KeyError(upload_id)
+    
+    def _status(self, upload_id: str, meta: Dict[str, Any]) -> Dict[str, Any]:
+        _, part_path = self._paths(upload_id)
+        offset = part_path.stat().st_size if part_path.exists() else 0
+        return {
+            "upload_id": upload_id,
+            "filename": meta["filename"],
+            "size": meta["size"],
+            "offset": offset
+        }
+    
+    def create(self, filename: str, size: int, sha256: Optional[str] = None, key: str = "") -> Dict[str, Any]:
+        """
+        创建上传会话（相同文件名、大小、SHA-256和客户端标识时返回已有会话及已写入的字节数）
+        
+        Args:
+            filename: 文件名
+            size: 文件大小（字节）
+            sha256: 文件内容的SHA-256（可选，完成时校验）
+            key: 客户端标识（如文件修改时间），区分同名同大小的不同文件
+        """
+        name = safe_filename(filename)
+        if size < 0:
+            raise ValueError("文件大小无效")
+        if sha256 is not None:
+            sha256 = sha256.lower()
+            if not re.fullmatch(r'[0-9a-f]{64}', sha256):
+                raise ValueError("SHA-256 格式无效")
+        
+        identity = json.dumps([name, size, sha256, key], ensure_ascii=False)
+        upload_id = hashlib.sha1(identity.encode('utf-8')).hexdigest()
+        
+        with self._lock:
+            self.upload_dir.mkdir(parents=True, exist_ok=True)
+            self.cleanup()
+            meta_path, part_path = self._paths(upload_id)
+            if not meta_path.exists():
+                meta = {"filename": name, "size": size, "sha256": sha256, "created": time.time()}
+                with open(meta_path, 'w', encoding='utf-8') as f:
+                    json.dump(meta, f, ensure_ascii=False)
+                part_path.touch()
+            else:
+                meta = self._load(upload_id)
+            return self._status(upload_id, meta)
+    
+    def status(self, upload_id: str) -> Dict[str, Any]:
+        """查询会话的已写入字节数（会话不存在时抛出 KeyError）"""
+        return self._status(upload_id, self._load(upload_id))
+    
+    async def append(self, upload_id: str, offset: int, chunks: AsyncIterator[bytes]) -> Dict[str, Any]:
+        """
+        从偏移量处追加上传内容，写满文件大小后完成上传
+        
+        连接中断时已收到的内容保留在临时文件中，客户端查询偏移量后继续上传。
+        
+        Returns:
+            未完成时返回会话状态；完成时返回保存结果（filename、size、sha256）
+        
+        Raises:
+            KeyError: 会话不存在
+            UploadConflict: 偏移量与已写入的字节数不一致，或同一会话正在上传
+            ValueError: 上传内容超过文件大小，或SHA-256校验失败
+        """
+        meta = self._load(upload_id)
+        _, part_path = self._paths(upload_id)
+        with self._lock:
+            current = part_path.stat().st_size if part_path.exists() else 0
+            if upload_id in self._active:
+                raise UploadConflict("该文件正在上传", current)
+            if offset != current:
+                raise UploadConflict(f"偏移量不一致，已写入 {current} 字节", current)
+            self._active.add(upload_id)
+        
+        try:
+            digest, hashed = self._digests.get(upload_id, (None, -1))
+            if hashed != offset:
+                # 服务重启或哈希进度与文件不一致，完成时重新计算
+                digest = hashlib.sha256() if offset == 0 else None
+            written = offset
+            with open(part_path, 'ab') as f:
+                try:
+                    async for chunk in chunks:
+                        if not chunk:
+                            continue
+                        if written + len(chunk) > meta["size"]:
+                            raise ValueError("上传内容超过文件大小")
+                        if digest is not None:
+                            await run_in_threadpool(_write, f, digest, chunk)
+                        else:
+                            await run_in_threadpool(f.write, chunk)
+                        written += len(chunk)
+                finally:
+                    if digest is not None:
+                        self._digests[upload_id] = (digest, written)
+            
+            if written < meta["size"]:
+                return self._status(upload_id, meta)
+            
+            if digest is None:
+                sha256 = await run_in_threadpool(file_sha256, part_path)
+            else:
+                sha256 = digest.hexdigest()
+            if meta["sha256"] and sha256 != meta["sha256"]:
+                self._discard(upload_id, part_path)
+                raise ValueError("文件校验失败（SHA-256 不一致），请重新上传")
+            file_path = self._commit(part_path, meta["filename"])
+            self._forget(upload_id)
+            return {"filename": file_path.name, "size": written, "sha256": sha256}
+        finally:
+            with self._lock:
+                self._active.discard(upload_id)
+    
+    async def save(self, filename: str, chunks: AsyncIterator[bytes]) -> Dict[str, Any]:
+        """
+        一次性上传：分块写入临时文件并计算SHA-256，完成后重命名到数据目录
+        
+        Returns:
+            保存结果（filename、size、sha256）
+        """
+        name = safe_filename(filename)
+        self.upload_dir.mkdir(parents=True, exist_ok=True)
+        part_path = self.upload_dir / f"{uuid.uuid4().hex}.part"
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            with open(part_path, 'wb') as f:
+                async for chunk in chunks:
+                    await run_in_threadpool(_write, f, digest, chunk)
+                    size += len(chunk)
+            file_path = self._commit(part_path, name)
+        except BaseException:
+            if part_path.exists():
+                part_path.unlink()
+            raise
+        return {"filename": file_path.name, "size": size, "sha256": digest.hexdigest()}
+    
+    def _commit(self, part_path: Path, filename: str) -> Path:
+        """把临时文件原子重命名到数据目录（文件名冲突时追加序号）"""
+        with self._lock:
+            file_path = self.data_dir / filename
+            stem, extension = file_path.stem, file_path.suffix
+            counter = 1
+            while file_path.exists():
+                file_path = self.data_dir / f"{stem}_{counter}{extension}"
+                counter += 1
+            
+            # 确保最终路径在数据目录内（双重检查）
+            if file_path.resolve().parent != self.data_dir.resolve():
+                raise PermissionError("禁止访问该文件路径")
+            os.replace(part_path, file_path)
+        return file_path
+    
+    def _forget(self, upload_id: str):
+        """删除会话描述和哈希进度"""
+        meta_path, _ = self._paths(upload_id)
+        self._digests.pop(upload_id, None)
+        if meta_path.exists():
+            meta_path.unlink()
+    
+    def _discard(self, upload_id: str, part_path: Path):
+        """删除已上传的内容和会话"""
+        if part_path.exists():
+            part_path.unlink()
+        self._forget(upload_id)
+    
+    def cancel(self, upload_id: str):
+        """
+        取消上传会话，删除已上传的内容
+        
+        Raises:
+            KeyError: 会话不存在
+            UploadConflict: 该会话正在上传
+        """
+        self._load(upload_id)
+        with self._lock:
+            _, part_path = self._paths(upload_id)
+            if upload_id in self._active:
+                raise UploadConflict("该文件正在上传", part_path.stat().st_size)
+            self._discard(upload_id, part_path)
+    
+    def cleanup(self):
+        """删除超过保留时间没有写入的上传会话和遗留的临时文件（正在上传的除外）"""
+        if not self.upload_dir.exists():
+            return
+        cutoff = time.time() - self.keep_seconds
+        for path in self.upload_dir.iterdir():
+            upload_id = path.name.split('.', 1)[0]
+            if upload_id in self._active:
+                continue
+            _, part_path = self._paths(upload_id)
+            try:
+                # 以临时文件的最后写入时间判断会话是否过期
+                modified = (part_path if part_path.exists() else path).stat().st_mtime
+                if modified < cutoff:
+                    path.unlink()
+                    self._digests.pop(upload_id, None)
+            except OSError:
+                pass